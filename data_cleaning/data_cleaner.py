@@ -1,5 +1,119 @@
 import pandas as pd 
+import numpy as np
 import os 
+from data_cleaning.file_importer import SelectionFile
+from data_cleaning.data_normalizer import ColumnStatistics
+from models.m_knn import KNNClassifier
+
+class StreamingDeduplicator:
+    """
+    Rimozione dei duplicati in streaming: ogni riga numerica viene ridotta a un'impronta (fingerprint) a 64 bit
+    e le impronte già viste sono conservate in blocchi ordinati di uint64 (8 byte per riga distinta), cercati
+    con una ricerca binaria vettoriale. Lo stato resta valido tra blocchi e tra file diversi.
+    Due righe diverse con la stessa impronta sono improbabili (circa n**2 / 2**65) ma possibili: con
+    verify=True vengono conservate anche le righe, e un'impronta già vista conta come duplicato solo se la riga
+    coincide esattamente (al costo di 8 byte in più per valore).
+    Come drop_duplicates, i NaN sono uguali tra loro e 0.0 è uguale a -0.0.
+    """
+    SEED = np.uint64(0x9E3779B97F4A7C15)
+
+    def __init__(self, verify: bool = False):
+        self.verify = verify
+        self.runs = []  # Blocchi (impronte ordinate, righe nello stesso ordine o None)
+
+    @staticmethod
+    def _canonical(block) -> np.ndarray:
+        # Rappresentazione unica di ogni valore: float64, + 0.0 per lo zero negativo e NaN canonico
+        block = np.array(block, dtype=np.float64) + 0.0
+        block[np.isnan(block)] = np.nan
+        return block.reshape(len(block), -1)
+
+    @staticmethod
+    def _mix(values: np.ndarray) -> np.ndarray:
+        # Finalizzatore di splitmix64 (biiettivo sugli interi a 64 bit)
+        values = (values ^ (values >> np.uint64(30))) * np.uint64(0xBF58476D1CE4E5B9)
+        values = (values ^ (values >> np.uint64(27))) * np.uint64(0x94D049BB133111EB)
+        return values ^ (values >> np.uint64(31))
+
+    @staticmethod
+    def fingerprints(block) -> np.ndarray:
+        """
+        Impronta a 64 bit di ogni riga di una matrice numerica.
+        """
+        words = np.ascontiguousarray(StreamingDeduplicator._canonical(block)).view(np.uint64)
+        hashes = np.full(len(words), StreamingDeduplicator.SEED, dtype=np.uint64)
+        with np.errstate(over="ignore"):
+            for column in words.T:
+                hashes = StreamingDeduplicator._mix(hashes ^ column)
+        return hashes
+
+    def keep_mask(self, block) -> np.ndarray:
+        """
+        Maschera delle righe del blocco non ancora viste (la prima occorrenza di ogni riga),
+        che vengono aggiunte alle righe viste.
+        """
+        block = self._canonical(block)
+        hashes = self.fingerprints(block)
+
+        # Prima occorrenza all'interno del blocco, in ordine di impronta: la ricerca binaria
+        # su chiavi ordinate scorre i blocchi salvati in modo sequenziale
+        if self.verify:
+            candidates = np.flatnonzero(~pd.DataFrame(block).duplicated().to_numpy())
+            candidates = candidates[np.argsort(hashes[candidates], kind="stable")]
+        else:
+            candidates = np.unique(hashes, return_index=True)[1]
+
+        new = candidates[~self._contains(hashes[candidates], block[candidates])]
+        self._add(hashes[new], block[new])
+
+        keep = np.zeros(len(block), dtype=bool)
+        keep[new] = True
+        return keep
+
+    def drop_duplicates(self, data: pd.DataFrame) -> pd.DataFrame:
+        """
+        Rimuove dal DataFrame (numerico) le righe già viste in questo o nei blocchi precedenti.
+        """
+        return data[self.keep_mask(data.to_numpy())]
+
+    def _contains(self, hashes: np.ndarray, rows: np.ndarray) -> np.ndarray:
+        found = np.zeros(len(hashes), dtype=bool)
+        for run_hashes, run_rows in self.runs:
+            left = np.searchsorted(run_hashes, hashes, side="left")
+            if not self.verify:
+                found |= run_hashes[np.minimum(left, len(run_hashes) - 1)] == hashes
+                continue
+
+            right = np.searchsorted(run_hashes, hashes, side="right")
+            hit = np.flatnonzero(right > left)
+
+            # Verifica esatta delle righe con un'impronta già vista
+            stored = run_rows[left[hit]]
+            equal = ((stored == rows[hit]) | (np.isnan(stored) & np.isnan(rows[hit]))).all(axis=1)
+            found[hit[equal]] = True
+            for i in hit[~equal]:
+                # Collisione con la prima riga: si controllano le altre righe con la stessa impronta
+                stored = run_rows[left[i] + 1:right[i]]
+                equal = ((stored == rows[i]) | (np.isnan(stored) & np.isnan(rows[i]))).all(axis=1)
+                found[i] |= equal.any()
+        return found
+
+    def _add(self, hashes: np.ndarray, rows: np.ndarray):
+        if len(hashes) == 0:
+            return
+        order = np.argsort(hashes, kind="stable")  # Già ordinate da keep_mask: l'ordinamento è quasi gratuito
+        self.runs.append((hashes[order], rows[order] if self.verify else None))
+        # I blocchi vengono uniti quando l'ultimo raggiunge la metà del precedente: restano O(log n) blocchi
+        while len(self.runs) > 1 and 2 * len(self.runs[-1][0]) >= len(self.runs[-2][0]):
+            (older_hashes, older_rows), (newer_hashes, newer_rows) = self.runs.pop(-2), self.runs.pop()
+            hashes = np.concatenate([older_hashes, newer_hashes])
+            order = np.argsort(hashes, kind="stable")  # Unione di due sequenze ordinate (timsort/radix)
+            rows = np.concatenate([older_rows, newer_rows])[order] if self.verify else None
+            self.runs.append((hashes[order], rows))
+
+    def __len__(self):
+        return sum(len(run_hashes) for run_hashes, _ in self.runs)
+
 
 class RimuoviDuplicati:
     """
@@ -10,6 +124,32 @@ class RimuoviDuplicati:
         data_cleaned = data.drop_duplicates()
         return data_cleaned
 
+    @staticmethod
+    def dup_remove_streaming(chunks, verify: bool = False):
+        """
+        Rimuove le righe duplicate da una sequenza di blocchi numerici (anche di file diversi),
+        restituendo i blocchi senza duplicati uno alla volta.
+        """
+        deduplicator = StreamingDeduplicator(verify)
+        for chunk in chunks:
+            yield deduplicator.drop_duplicates(chunk)
+
+    @staticmethod
+    def dup_remove_files(file_paths: list, output_path: str, include_id: bool = False, chunksize: int = 100_000,
+                         verify: bool = False) -> int:
+        """
+        Unisce più file (ad esempio version_1 ... version_5) in un unico CSV senza righe duplicate,
+        leggendoli a blocchi. Le colonne vengono convertite in numerico; con include_id=False la colonna
+        'Sample code number' viene rimossa prima del confronto, altrimenti fa parte della chiave.
+        Restituisce il numero di righe scritte.
+        """
+        chunks = StreamingCleaner(chunksize, include_id=include_id)._numeric_chunks(file_paths)
+        rows = 0
+        for chunk in RimuoviDuplicati.dup_remove_streaming(chunks, verify):
+            chunk.to_csv(output_path, mode="w" if rows == 0 else "a", header=rows == 0, index=False)
+            rows += len(chunk)
+        return rows
+
 class ValoriMancanti:
     """
      Questa Classe permette di gestire i valori mancanti in un DataFrame a seconda di una modalità scelta dall'utente
@@ -50,16 +190,70 @@ class ValoriMancanti:
         Sostituisce i valori mancanti con la deviazione standard della colonna.
         """
         return data.fillna(data.median())
+
+    @staticmethod
+    def sostituisci_con_knn(data: pd.DataFrame, k: int = 5, exclude_col: list = None) -> pd.DataFrame:
+        """
+        Sostituisce i valori mancanti con la media dei k vicini più vicini tra le righe complete, con la
+        distanza misurata sulle sole feature osservate della riga. Le righe con lo stesso insieme di feature
+        mancanti vengono elaborate insieme, con un'unica ricerca vettoriale dei vicini di KNNClassifier.
+        Per le distanze le feature sono standardizzate con media e deviazione standard delle righe complete,
+        così nessuna colonna prevale per la sua scala. Le colonne escluse (default: 'classtype_v1') non
+        entrano nelle distanze e non vengono riempite.
+        """
+        exclude_col = ['classtype_v1'] if exclude_col is None else exclude_col
+        columns = [column for column in data.columns if column not in exclude_col]
+        values = data[columns].to_numpy(dtype=float)
+        missing = np.isnan(values)
+        complete = ~missing.any(axis=1)
+        incomplete = np.flatnonzero(~complete)
+        if len(incomplete) == 0:
+            return data.copy()
+
+        donors = values[complete]
+        if len(donors) == 0:
+            raise ValueError("Nessuna riga completa da cui stimare i valori mancanti con la modalità knn.")
+        statistics = ColumnStatistics.from_array(donors)
+        scale = statistics.std()
+        scale = np.where(np.isfinite(scale) & (scale > 0), scale, 1.0)
+        scaled = (values - statistics.mean) / scale
+        scaled_donors = scaled[complete]
+
+        filled = values.copy()
+        patterns, pattern_of_row = np.unique(missing[incomplete], axis=0, return_inverse=True)
+        pattern_of_row = pattern_of_row.ravel()
+        for p, pattern in enumerate(patterns):
+            rows = incomplete[pattern_of_row == p]
+            observed = ~pattern
+            if not observed.any():
+                # Nessuna feature osservata: la distanza non è definita, si usa la media delle righe complete
+                filled[np.ix_(rows, pattern)] = statistics.mean[pattern]
+                continue
+            knn = KNNClassifier(k=k)
+            knn.fit(scaled_donors[:, observed], np.zeros(len(donors)))
+            _, neighbors = knn.kneighbors(scaled[rows][:, observed])
+            filled[np.ix_(rows, pattern)] = donors[neighbors][:, :, pattern].mean(axis=1)
+
+        data_filled = data.copy()
+        filled_columns = [column for column, has_missing in zip(columns, missing.any(axis=0)) if has_missing]
+        data_filled[filled_columns] = filled[:, missing.any(axis=0)]
+        return data_filled
     
 class SaveDB:
     @staticmethod
-    def save_dataset(data: pd.DataFrame):
-        save_option = input("\nVuoi salvare il dataset pulito? (s/n): ").strip().lower()
-        if save_option == 's':
+    def save_dataset(data: pd.DataFrame, save: bool = None, output_filename: str = None):
+        """
+        Salva il dataset pulito in 'data/cleaned'. Se save e output_filename non vengono passati
+        come argomenti, vengono chiesti all'utente.
+        """
+        if save is None:
+            save = input("\nVuoi salvare il dataset pulito? (s/n): ").strip().lower() == 's'
+        if save:
             default_folder = "data/cleaned"  # Cartella di default
             os.makedirs(default_folder, exist_ok=True)  # Crea la cartella se non esiste
 
-            output_filename = input(f"Inserisci il nome del file di output (lascia vuoto per 'cleaned_data.csv'): ").strip()
+            if output_filename is None:
+                output_filename = input(f"Inserisci il nome del file di output (lascia vuoto per 'cleaned_data.csv'): ").strip()
 
             # Se non viene specificato un nome, usa "cleaned_data.csv"
             if not output_filename:
@@ -81,15 +275,21 @@ class GestioneValMancanti:
     """
 
     @staticmethod
-    def get_mode(mode: str, data: pd.DataFrame) -> pd.DataFrame:
+    def get_mode(mode: str, data: pd.DataFrame, include_id: bool = False, n_neighbors: int = 5) -> pd.DataFrame:
         """
-        Funzione per gestire i valori nulli di un DataFrame
+        Funzione per gestire i valori nulli di un DataFrame.
+        Con include_id=True i duplicati vengono cercati prima di rimuovere 'Sample code number':
+        righe uguali di pazienti diversi restano distinte. n_neighbors è il numero di vicini della modalità knn.
         """
         data = data.apply(pd.to_numeric, errors='coerce')
 
+        if include_id:
+            data = RimuoviDuplicati.dup_remove(data)
+
         data = data.drop(columns=['Sample code number']) # Rimuove la colonna 'Sample code number'
 
-        data = RimuoviDuplicati.dup_remove(data)
+        if not include_id:
+            data = RimuoviDuplicati.dup_remove(data)
 
         data = ValoriMancanti.rimuovi_righe_classtype_v1(data)
         
@@ -101,30 +301,40 @@ class GestioneValMancanti:
             return ValoriMancanti.sostituisci_con_moda(data)
         elif mode == "mediana":
             return ValoriMancanti.sostituisci_con_mediana(data)  
+        elif mode == "knn":
+            return ValoriMancanti.sostituisci_con_knn(data, n_neighbors)
         else:
-            raise ValueError("Modalità non supportata. Usare una modalità tra: ['rimozione', 'media', 'moda', 'mediana']")  
+            raise ValueError("Modalità non supportata. Usare una modalità tra: ['rimozione', 'media', 'moda', 'mediana', 'knn']")  
         
 class DataCleaner:
     """
     Classe per gestire i valori mancanti e salvare il dataset pulito.
     """
     @staticmethod
-    def clean_and_save(data: pd.DataFrame):
+    def clean_and_save(data: pd.DataFrame, mode: str = None, save: bool = None, output_filename: str = None,
+                       include_id: bool = False, raise_errors: bool = False):
         """
         Chiede all'utente la modalità di gestione dei valori mancanti,
         applica la pulizia e salva il dataset.
+        La modalità e le opzioni di salvataggio possono essere passate come argomenti
+        per un'esecuzione non interattiva.
+        Con raise_errors=True un errore della pulizia viene propagato invece di proseguire con i dati originali.
         """
-        print("Scegliere come gestire i valori mancanti attraverso le modalità sviluppate.")
-        print("Modalità disponibili: ['rimozione', 'media', 'moda', 'mediana']")
-        mode = input("Inserisci la modalità di gestione dei valori mancanti che vuoi usare: ").strip().lower()
+        if mode is None:
+            print("Scegliere come gestire i valori mancanti attraverso le modalità sviluppate.")
+            print("Modalità disponibili: ['rimozione', 'media', 'moda', 'mediana', 'knn']")
+            mode = input("Inserisci la modalità di gestione dei valori mancanti che vuoi usare: ")
+        mode = mode.strip().lower()
 
-        if mode not in ['rimozione', 'media', 'moda', 'mediana']:  # Modalità di default: 'media'
+        if mode not in ['rimozione', 'media', 'moda', 'mediana', 'knn']:  # Modalità di default: 'media'
             print("Modalità non supportata. Verrà utilizzata la modalità di default: media")
             mode = 'media'
         
         try:
-            data = GestioneValMancanti.get_mode(mode, data)  # Applica la pulizia
+            data = GestioneValMancanti.get_mode(mode, data, include_id)  # Applica la pulizia
         except Exception as e:
+            if raise_errors:
+                raise
             print(f"Errore durante la gestione dei valori mancanti: {e}. Procedo con i dati originali.")
 
         print("Dati dopo la gestione dei valori mancanti:")
@@ -132,7 +342,271 @@ class DataCleaner:
         print(f"\nControllo se il dataset contiene ancora valori nulli:\n{data.isnull().sum()}")
 
         # Salvataggio del dataset pulito
-        SaveDB.save_dataset(data)
+        SaveDB.save_dataset(data, save, output_filename)
         print("Dataset pulito salvato correttamente in 'data/cleaned'.")
 
-        return data
\ No newline at end of file
+        return data
+
+
+class QuantileSketch:
+    """
+    Sketch combinabile dei quantili di una colonna, per la mediana in streaming.
+    Finché i valori distinti sono al più max_distinct conserva il conteggio esatto di ogni valore (mediana
+    esatta, come per le colonne discrete del dataset); oltre, passa a uno sketch KLL: livelli di campioni
+    in cui un valore al livello h rappresenta 2**h valori, dimezzati quando superano capacity.
+    L'errore sul rango è dell'ordine di (numero di livelli) / capacity.
+    """
+    def __init__(self, capacity: int = 2048, max_distinct: int = 4096, seed: int = 0):
+        self.capacity = capacity
+        self.max_distinct = max_distinct
+        self.rng = np.random.default_rng(seed)
+        self.values = np.empty(0)
+        self.counts = np.empty(0, dtype=np.int64)
+        self.levels = None  # None finché i conteggi sono esatti
+
+    @property
+    def exact(self) -> bool:
+        return self.levels is None
+
+    def update(self, values) -> "QuantileSketch":
+        """
+        Aggiunge i valori di un blocco (i NaN vengono ignorati).
+        """
+        values = np.asarray(values, dtype=float)
+        values = values[~np.isnan(values)]
+        if self.exact:
+            self._add_counts(*np.unique(values, return_counts=True))
+        else:
+            self.levels[0] = np.concatenate([self.levels[0], values])
+            self._compress()
+        return self
+
+    def merge(self, other: "QuantileSketch") -> "QuantileSketch":
+        """
+        Unisce gli sketch di due blocchi di righe disgiunti.
+        """
+        merged = QuantileSketch(self.capacity, self.max_distinct)
+        merged.rng = self.rng
+        if self.exact and other.exact:
+            merged.values, merged.counts = self.values, self.counts
+            merged._add_counts(other.values, other.counts)
+            return merged
+
+        levels, other_levels = self._as_levels(), other._as_levels()
+        size = max(len(levels), len(other_levels))
+        levels += [np.empty(0)] * (size - len(levels))
+        other_levels += [np.empty(0)] * (size - len(other_levels))
+        merged.levels = [np.concatenate(pair) for pair in zip(levels, other_levels)]
+        merged._compress()
+        return merged
+
+    def _add_counts(self, values, counts):
+        self.values, inverse = np.unique(np.concatenate([self.values, values]), return_inverse=True)
+        self.counts = np.bincount(inverse, weights=np.concatenate([self.counts, counts]),
+                                  minlength=len(self.values)).astype(np.int64)
+        if len(self.values) > self.max_distinct:
+            self.levels = self._as_levels()
+            self.values, self.counts = np.empty(0), np.empty(0, dtype=np.int64)
+            self._compress()
+
+    def _as_levels(self) -> list:
+        # Un conteggio esatto si scompone in potenze di due: il valore entra al livello h per ogni bit h acceso
+        if not self.exact:
+            return list(self.levels)
+        levels, counts = [], self.counts.copy()
+        while counts.any():
+            levels.append(self.values[(counts & 1).astype(bool)])
+            counts >>= 1
+        return levels or [np.empty(0)]
+
+    def _compress(self):
+        h = 0
+        while h < len(self.levels):
+            level = self.levels[h]
+            if len(level) > self.capacity:
+                level = np.sort(level)
+                even = len(level) - len(level) % 2
+                # Metà dei valori ordinati (pari o dispari, a caso) sale di livello con peso doppio
+                promoted = level[:even][self.rng.integers(2)::2]
+                self.levels[h] = level[even:]
+                if h + 1 == len(self.levels):
+                    self.levels.append(np.empty(0))
+                self.levels[h + 1] = np.concatenate([self.levels[h + 1], promoted])
+            h += 1
+
+    def median(self) -> float:
+        """
+        Mediana dei valori visti (media dei due valori centrali se il loro numero è pari, come pandas).
+        """
+        if self.exact:
+            values, weights = self.values, self.counts
+        else:
+            values = np.concatenate(self.levels)
+            weights = np.concatenate([np.full(len(level), 2 ** h) for h, level in enumerate(self.levels)])
+            order = np.argsort(values, kind="stable")
+            values, weights = values[order], weights[order]
+
+        total = int(weights.sum())
+        if total == 0:
+            return np.nan
+        cumulative = np.cumsum(weights)
+        lower = values[np.searchsorted(cumulative, (total - 1) // 2, side="right")]
+        upper = values[np.searchsorted(cumulative, total // 2, side="right")]
+        return (lower + upper) / 2
+
+
+class ModeSketch:
+    """
+    Sketch combinabile dei valori più frequenti (Misra-Gries), per la moda in streaming.
+    Conserva al più capacity contatori: finché i valori distinti non li superano i conteggi sono esatti e la
+    moda coincide con quella di pandas (a parità di frequenza il valore più piccolo). Oltre, ogni contatore
+    sottostima la frequenza vera di al più n / (capacity + 1): un valore più frequente di così resta tra i candidati.
+    """
+    def __init__(self, capacity: int = 4096):
+        self.capacity = capacity
+        self.values = np.empty(0)
+        self.counts = np.empty(0, dtype=np.int64)
+        self.exact = True
+
+    def update(self, values) -> "ModeSketch":
+        """
+        Aggiunge i valori di un blocco (i NaN vengono ignorati).
+        """
+        values = np.asarray(values, dtype=float)
+        self._add_counts(*np.unique(values[~np.isnan(values)], return_counts=True))
+        return self
+
+    def merge(self, other: "ModeSketch") -> "ModeSketch":
+        """
+        Unisce gli sketch di due blocchi di righe disgiunti.
+        """
+        merged = ModeSketch(self.capacity)
+        merged.values, merged.counts = self.values, self.counts
+        merged.exact = self.exact and other.exact
+        merged._add_counts(other.values, other.counts)
+        return merged
+
+    def _add_counts(self, values, counts):
+        self.values, inverse = np.unique(np.concatenate([self.values, values]), return_inverse=True)
+        self.counts = np.bincount(inverse, weights=np.concatenate([self.counts, counts]),
+                                  minlength=len(self.values)).astype(np.int64)
+        if len(self.values) > self.capacity:
+            # Si sottrae a tutti il (capacity + 1)-esimo conteggio più alto e si scartano i contatori non positivi
+            threshold = np.partition(self.counts, len(self.counts) - self.capacity - 1)[-self.capacity - 1]
+            keep = self.counts > threshold
+            self.values, self.counts = self.values[keep], self.counts[keep] - threshold
+            self.exact = False
+
+    def mode(self) -> float:
+        """
+        Valore più frequente (il più piccolo a parità di frequenza).
+        """
+        if len(self.counts) == 0:
+            return np.nan
+        return self.values[np.argmax(self.counts)]
+
+
+class StreamingCleaner:
+    """
+    Pulizia a blocchi dei dataset più grandi della memoria, con lo stesso risultato di GestioneValMancanti.get_mode.
+    Il file viene letto a blocchi di chunksize righe; ogni blocco viene convertito in numerico con un tipo compatto
+    (float_dtype) e pulito appena letto. Le modalità di sostituzione leggono il file due volte: la prima passata
+    raccoglie statistiche combinabili dei blocchi (media esatta con ColumnStatistics, QuantileSketch per la
+    mediana, ModeSketch per la moda), la seconda riempie i valori mancanti.
+    I duplicati tra blocchi (e tra più file, se file_path è una lista) vengono rimossi con StreamingDeduplicator.
+    """
+    MODES = ['rimozione', 'media', 'moda', 'mediana']
+    SKETCHES = {"mediana": QuantileSketch, "moda": ModeSketch}
+
+    def __init__(self, chunksize: int = 100_000, dtype=None, float_dtype: str = "float32", include_id: bool = False,
+                 verify: bool = False):
+        """
+        dtype viene passato al parser del file; float_dtype è il tipo delle colonne dopo la conversione.
+        include_id e verify hanno lo stesso significato che in get_mode e in StreamingDeduplicator.
+        """
+        self.chunksize = chunksize
+        self.dtype = dtype
+        self.float_dtype = float_dtype
+        self.include_id = include_id
+        self.verify = verify
+
+    def _numeric_chunks(self, file_paths):
+        # Blocchi di uno o più file convertiti in numerico, con le colonne nell'ordine del primo file
+        columns = None
+        for file_path in [file_paths] if isinstance(file_paths, str) else file_paths:
+            for chunk in SelectionFile.iter_chunks(file_path, self.chunksize, self.dtype):
+                if columns is None:
+                    columns = [column for column in chunk.columns
+                               if self.include_id or column != 'Sample code number']
+                chunk = chunk.apply(pd.to_numeric, errors='coerce')[columns]
+                # Il codice del campione resta in float64: in float32 codici diversi oltre 2**24 coinciderebbero
+                yield chunk.astype({column: self.float_dtype for column in columns if column != 'Sample code number'})
+
+    def _prepared_chunks(self, file_paths):
+        # Stessi passaggi di get_mode prima della gestione dei valori mancanti, blocco per blocco
+        deduplicator = StreamingDeduplicator(self.verify)
+        for chunk in self._numeric_chunks(file_paths):
+            chunk = deduplicator.drop_duplicates(chunk)
+            if self.include_id:
+                chunk = chunk.drop(columns=['Sample code number'])
+            yield ValoriMancanti.rimuovi_righe_classtype_v1(chunk)
+
+    def fill_values(self, file_path, mode: str) -> pd.Series:
+        """
+        Prima passata: valore di sostituzione di ogni colonna (media, mediana o moda).
+        """
+        columns, statistics, sketches = None, None, None
+        for chunk in self._prepared_chunks(file_path):
+            if columns is None:
+                columns = list(chunk.columns)
+                if mode in self.SKETCHES:
+                    sketches = [self.SKETCHES[mode]() for _ in columns]
+            if mode == "media":
+                block_statistics = ColumnStatistics.from_array(chunk.to_numpy(dtype=float))
+                statistics = block_statistics if statistics is None else statistics.merge(block_statistics)
+            else:
+                for sketch, column in zip(sketches, columns):
+                    sketch.update(chunk[column].to_numpy())
+
+        if mode == "media":
+            values = statistics.mean
+        elif mode == "mediana":
+            values = [sketch.median() for sketch in sketches]
+        else:
+            values = [sketch.mode() for sketch in sketches]
+        return pd.Series(values, index=columns, dtype=float)
+
+    def iter_clean(self, file_path, mode: str):
+        """
+        Restituisce i blocchi puliti del file, uno alla volta.
+        """
+        if mode == "knn":
+            raise ValueError("La modalità knn cerca i vicini tra tutte le righe complete e richiede il dataset in memoria.")
+        if mode not in self.MODES:
+            raise ValueError("Modalità non supportata. Usare una modalità tra: ['rimozione', 'media', 'moda', 'mediana']")
+
+        fill_values = None
+        if mode != "rimozione":
+            fill_values = self.fill_values(file_path, mode).astype(self.float_dtype)
+        for chunk in self._prepared_chunks(file_path):
+            if fill_values is None:
+                yield ValoriMancanti.rimuovi_righe_con_nan(chunk)
+            else:
+                yield chunk.fillna(fill_values)
+
+    def clean(self, file_path, mode: str) -> pd.DataFrame:
+        """
+        Pulisce il file e restituisce il dataset pulito in un unico DataFrame (con i tipi compatti).
+        """
+        return pd.concat(list(self.iter_clean(file_path, mode)))
+
+    def clean_to_file(self, file_path, mode: str, output_path: str) -> int:
+        """
+        Pulisce il file scrivendo i blocchi puliti in un CSV man mano che vengono prodotti.
+        Restituisce il numero di righe scritte.
+        """
+        rows = 0
+        for chunk in self.iter_clean(file_path, mode):
+            chunk.to_csv(output_path, mode="w" if rows == 0 else "a", header=rows == 0, index=False)
+            rows += len(chunk)
+        return rows
@@ -1,49 +1,195 @@
-import pandas as pd
+import json
 import os
+import numpy as np
+import pandas as pd
 
-class MinMaxNormalizer:
+class ColumnStatistics:
+    """
+    Statistiche per colonna (conteggio, media, somma dei quadrati degli scarti, minimo e massimo)
+    calcolate in un'unica operazione vettoriale sull'intero blocco numerico e combinabili tra loro:
+    le statistiche di più blocchi di righe si uniscono senza rileggere i dati. I valori NaN vengono ignorati.
+    """
+    def __init__(self, count, mean, m2, minimum, maximum):
+        self.count = np.asarray(count, dtype=float)
+        self.mean = np.asarray(mean, dtype=float)
+        self.m2 = np.asarray(m2, dtype=float)
+        self.minimum = np.asarray(minimum, dtype=float)
+        self.maximum = np.asarray(maximum, dtype=float)
+
+    @staticmethod
+    def from_array(block) -> "ColumnStatistics":
+        """
+        Calcola le statistiche delle colonne di una matrice (righe x colonne).
+        """
+        block = np.asarray(block, dtype=float)
+        valid = ~np.isnan(block)
+        count = valid.sum(axis=0)
+        with np.errstate(invalid="ignore", divide="ignore"):
+            mean = np.where(valid, block, 0.0).sum(axis=0) / count
+        m2 = np.where(valid, (block - mean) ** 2, 0.0).sum(axis=0)
+        minimum = np.fmin.reduce(block, axis=0, initial=np.nan)
+        maximum = np.fmax.reduce(block, axis=0, initial=np.nan)
+        return ColumnStatistics(count, mean, m2, minimum, maximum)
+
+    def merge(self, other: "ColumnStatistics") -> "ColumnStatistics":
+        """
+        Unisce le statistiche di due blocchi di righe disgiunti (formula di Chan per media e varianza).
+        """
+        count = self.count + other.count
+        delta = other.mean - self.mean
+        with np.errstate(invalid="ignore", divide="ignore"):
+            mean = np.where(other.count == 0, self.mean, self.mean + delta * other.count / count)
+            mean = np.where(self.count == 0, other.mean, mean)
+            m2 = self.m2 + other.m2 + np.nan_to_num(delta ** 2 * self.count * other.count / count)
+        return ColumnStatistics(count, mean, m2, np.fmin(self.minimum, other.minimum),
+                                np.fmax(self.maximum, other.maximum))
+
+    def std(self):
+        """
+        Deviazione standard campionaria (ddof=1, come pandas).
+        """
+        with np.errstate(invalid="ignore", divide="ignore"):
+            return np.sqrt(self.m2 / (self.count - 1))
+
+    def to_dict(self) -> dict:
+        return {"count": self.count.tolist(), "mean": self.mean.tolist(), "m2": self.m2.tolist(),
+                "minimum": self.minimum.tolist(), "maximum": self.maximum.tolist()}
+
+    @staticmethod
+    def from_dict(values: dict) -> "ColumnStatistics":
+        return ColumnStatistics(values["count"], values["mean"], values["m2"], values["minimum"], values["maximum"])
+
+
+class Normalizer:
+    """
+    Base dei normalizzatori con stato: fit calcola le statistiche di tutte le colonne numeriche in un'unica
+    operazione vettoriale, transform le applica a nuovi dati senza ricalcolarle.
+    I dati possono essere un DataFrame (vengono normalizzate le colonne numeriche non escluse)
+    o una matrice NumPy (vengono normalizzate tutte le colonne).
+    """
+    METHOD = None
+
+    def __init__(self):
+        self.columns = None  # Colonne normalizzate di un DataFrame (None per le matrici NumPy)
+        self.statistics = None
+
+    @staticmethod
+    def _numeric_columns(data: pd.DataFrame, exclude_col: list) -> list:
+        exclude_col = exclude_col or []
+        return [column for column in data.columns
+                if column not in exclude_col and pd.api.types.is_numeric_dtype(data[column])]
+
+    def fit(self, data, exclude_col: list = None) -> "Normalizer":
+        """
+        Calcola e memorizza le statistiche dei dati.
+        """
+        if isinstance(data, pd.DataFrame):
+            self.columns = self._numeric_columns(data, exclude_col)
+            block = data[self.columns].to_numpy(dtype=float)
+        else:
+            self.columns = None
+            block = data
+        self.statistics = ColumnStatistics.from_array(block)
+        return self
+
+    def fit_statistics(self, statistics: ColumnStatistics, columns: list = None) -> "Normalizer":
+        """
+        Imposta statistiche già calcolate (ad esempio unite da più blocchi di righe).
+        """
+        self.statistics = statistics
+        self.columns = columns
+        return self
+
+    def transform(self, data):
+        """
+        Applica le statistiche memorizzate a nuovi dati.
+        """
+        if self.statistics is None:
+            raise ValueError("Il normalizzatore deve essere addestrato con fit prima di transform.")
+
+        if isinstance(data, pd.DataFrame):
+            if self.columns is None:
+                raise ValueError("Il normalizzatore è stato addestrato su una matrice, non su un DataFrame.")
+            data_normalized = data.copy()
+            data_normalized[self.columns] = self._apply(data[self.columns].to_numpy(dtype=float))
+            return data_normalized
+        return self._apply(np.asarray(data, dtype=float))
+
+    def fit_transform(self, data, exclude_col: list = None):
+        return self.fit(data, exclude_col).transform(data)
+
+    def _apply(self, block: np.ndarray) -> np.ndarray:
+        raise NotImplementedError
+
+    def to_dict(self) -> dict:
+        """
+        Parametri del normalizzatore (metodo, colonne e statistiche) serializzabili in JSON.
+        """
+        return {"method": self.METHOD, "columns": self.columns, "statistics": self.statistics.to_dict()}
+
+    @staticmethod
+    def from_dict(params: dict) -> "Normalizer":
+        """
+        Ricostruisce un normalizzatore dai parametri restituiti da to_dict.
+        """
+        normalizers = {cls.METHOD: cls for cls in (MinMaxNormalizer, StandardNormalizer)}
+        if params.get("method") not in normalizers:
+            raise ValueError(f"Metodo di normalizzazione sconosciuto: {params.get('method')}")
+        return normalizers[params["method"]]().fit_statistics(ColumnStatistics.from_dict(params["statistics"]),
+                                                               params["columns"])
+
+    def save(self, file_path: str):
+        """
+        Salva metodo, colonne e statistiche in un piccolo file JSON.
+        """
+        with open(file_path, "w", encoding="utf-8") as file:
+            json.dump(self.to_dict(), file)
+
+    @staticmethod
+    def load(file_path: str) -> "Normalizer":
+        """
+        Carica un normalizzatore salvato con save.
+        """
+        with open(file_path, encoding="utf-8") as file:
+            return Normalizer.from_dict(json.load(file))
+
+
+class MinMaxNormalizer(Normalizer):
     """
     Questa classe permette di normalizzare i dati in un DataFrame utilizzando la normalizzazione Min-Max 
     """
+    METHOD = "normalizzazione min-max"
+
+    def _apply(self, block: np.ndarray) -> np.ndarray:
+        minimum, maximum = self.statistics.minimum, self.statistics.maximum
+        with np.errstate(invalid="ignore", divide="ignore"):
+            return (block - minimum) / (maximum - minimum)
+
     @staticmethod
     def normalize(data: pd.DataFrame, exclude_col: list) -> pd.DataFrame:
         """
         Normalizza i dati, nel range [0,1], in un DataFrame utilizzando la formula:
         x = (x - min) / (max - min)
         """
-        #definisco le colonne da normalizzare
-        if exclude_col is None:
-            exclude_col = []
-
-        data_normalized = data.copy()
-        for column in data.columns:
-            if column not in exclude_col and pd.api.types.is_numeric_dtype(data[column]):
-                min_val = data[column].min()
-                max_val = data[column].max()
-                data_normalized[column] = (data[column] - min_val) / (max_val - min_val)
-        return data_normalized
+        return MinMaxNormalizer().fit_transform(data, exclude_col)
     
-class StandardNormalizer:
+class StandardNormalizer(Normalizer):
     """
     Questa classe permette di normalizzare i dati in un DataFrame utilizzando la standardizzazione (z-score)
     """
+    METHOD = "standardizzazione"
+
+    def _apply(self, block: np.ndarray) -> np.ndarray:
+        with np.errstate(invalid="ignore", divide="ignore"):
+            return (block - self.statistics.mean) / self.statistics.std()
+
     @staticmethod
     def standardize(data: pd.DataFrame, exclude_col: list) -> pd.DataFrame:
         """
         Normalizza i dati, nel range [0,1], in un DataFrame utilizzando la formula:
         x = (x - mean) / std
         """
-        #definisco le colonne da normalizzare
-        if exclude_col is None:
-            exclude_col = []
-
-        data_normalized = data.copy()
-        for column in data.columns:
-            if column not in exclude_col and pd.api.types.is_numeric_dtype(data[column]):
-                mean_val = data[column].mean()
-                std_val = data[column].std()
-                data_normalized[column] = (data[column] - mean_val) / std_val
-        return data_normalized
+        return StandardNormalizer().fit_transform(data, exclude_col)
 
 class Preprocessing:
     """
@@ -53,13 +199,16 @@ class Preprocessing:
     - Separazione delle feature dal target
     """
     @staticmethod
-    def choose_normalization_method():
+    def choose_normalization_method(method: str = None):
         """
-        Chiede all'utente di scegliere il metodo di normalizzazione.
+        Chiede all'utente di scegliere il metodo di normalizzazione,
+        a meno che non venga passato come argomento.
         """
-        print("Scegli come normalizzare i dati:")
-        print("Modalità disponibili: ['normalizzazione min-max', 'standardizzazione']")
-        method = input("Inserisci la modalità di normalizzazione: ").strip().lower()
+        if method is None:
+            print("Scegli come normalizzare i dati:")
+            print("Modalità disponibili: ['normalizzazione min-max', 'standardizzazione']")
+            method = input("Inserisci la modalità di normalizzazione: ")
+        method = method.strip().lower()
 
         if method not in ['normalizzazione min-max', 'standardizzazione']:
             print("Modalità non supportata. Verrà utilizzata la modalità di default: normalizzazione min-max.")
@@ -72,11 +221,11 @@ class Preprocessing:
         return method
 
     @staticmethod
-    def get_normalizer(data: pd.DataFrame, exclude_col: list) -> pd.DataFrame:
+    def get_normalizer(data: pd.DataFrame, exclude_col: list, method: str = None) -> pd.DataFrame:
         """
         Normalizza i dati utilizzando Min-Max o Standardizzazione (Z-score).
         """
-        method = Preprocessing.choose_normalization_method()
+        method = Preprocessing.choose_normalization_method(method)
 
         if exclude_col is None:
             exclude_col = []
@@ -89,13 +238,19 @@ class Preprocessing:
             raise ValueError("Normalizzazione non supportata. Usare 'minmax' o 'standard'")
         
     @staticmethod
-    def save_dataset(data: pd.DataFrame):
-        save_option = input("\nVuoi salvare il dataset normalizzato? (s/n): ").strip().lower()
-        if save_option == 's':
+    def save_dataset(data: pd.DataFrame, save: bool = None, output_filename: str = None):
+        """
+        Salva il dataset normalizzato in 'data/scaled'. Se save e output_filename non vengono passati
+        come argomenti, vengono chiesti all'utente.
+        """
+        if save is None:
+            save = input("\nVuoi salvare il dataset normalizzato? (s/n): ").strip().lower() == 's'
+        if save:
             default_folder = "data/scaled"  # Cartella di default
             os.makedirs(default_folder, exist_ok=True)  # Crea la cartella se non esiste
 
-            output_filename = input(f"Inserisci il nome del file di output (lascia vuoto per 'scaled_data.csv'): ").strip()
+            if output_filename is None:
+                output_filename = input(f"Inserisci il nome del file di output (lascia vuoto per 'scaled_data.csv'): ").strip()
 
             # Se non viene specificato un nome, usa "scaled_data.csv"
             if not output_filename:
@@ -113,13 +268,16 @@ class Preprocessing:
         return data
     
     @staticmethod
-    def split_features_target(data: pd.DataFrame, target_col: str):
+    def split_features_target(data: pd.DataFrame, target_col: str, dtype=None):
         """
         Separa le features dalla colonna target.
+        Se dtype è indicato (ad esempio 'float32') le feature vengono convertite in quel tipo.
         """
         if target_col not in data.columns:
             raise ValueError(f"La colonna target '{target_col}' non è presente nel dataset.")
         
         X = data.drop(columns=[target_col])
+        if dtype is not None:
+            X = X.astype(dtype)
         y = data[target_col]
         return X, y
\ No newline at end of file
@@ -1,4 +1,10 @@
 from abc import ABC, abstractmethod
+import hashlib
+import json
+import os
+import shutil
+import time
+import numpy as np
 import pandas as pd
 
 class Fileimporter(ABC):
@@ -8,6 +14,24 @@ class Fileimporter(ABC):
     @abstractmethod
     def importer(self, file_path: str) -> pd.DataFrame:
         pass
+
+    def chunks(self, file_path: str, chunksize: int, dtype=None):
+        """
+        Legge il file a blocchi di chunksize righe. I formati che non si possono leggere a blocchi
+        vengono importati interamente e poi restituiti in blocchi della dimensione richiesta.
+        """
+        data = self.importer(file_path)
+        if dtype is not None:
+            data = data.astype(dtype)
+        for start in range(0, len(data), chunksize):
+            yield data.iloc[start:start + chunksize]
+
+
+def _read_csv_chunks(file_path: str, chunksize: int, dtype=None):
+    # Lettura a blocchi con il parser di pd.read_csv: in memoria resta un solo blocco alla volta
+    print(f"Import a blocchi del file: {file_path}")
+    with pd.read_csv(file_path, chunksize=chunksize, dtype=dtype) as reader:
+        yield from reader
     
 #CSV
 class FileCSV(Fileimporter):
@@ -19,6 +43,9 @@ class FileCSV(Fileimporter):
         df = pd.read_csv(file_path)
         return df 
 
+    def chunks(self, file_path: str, chunksize: int, dtype=None):
+        return _read_csv_chunks(file_path, chunksize, dtype)
+
 #EXCEL
 class FileExcel(Fileimporter):
     """
@@ -38,6 +65,9 @@ class FileTSV(Fileimporter):
         print(f"Import del file: {file_path}")
         df = pd.read_csv(file_path)
         return df 
+
+    def chunks(self, file_path: str, chunksize: int, dtype=None):
+        return _read_csv_chunks(file_path, chunksize, dtype)
     
 #TXT
 class FileTXT(Fileimporter):
@@ -49,6 +79,9 @@ class FileTXT(Fileimporter):
         df = pd.read_csv(file_path)
         return df 
 
+    def chunks(self, file_path: str, chunksize: int, dtype=None):
+        return _read_csv_chunks(file_path, chunksize, dtype)
+
 #JSON
 class FileJSON(Fileimporter):
     """
@@ -60,10 +93,216 @@ class FileJSON(Fileimporter):
         return df 
 
 
+class ImportCache:
+    """
+    Cache su disco dei dataset già importati, in formato colonnare binario.
+    Ogni voce è identificata dall'hash del contenuto del file e dal suo formato; l'indice associa inoltre
+    a ogni percorso la dimensione e la data di modifica viste all'ultima importazione, così un file invariato
+    viene riconosciuto senza rileggerlo. Se dimensione o data cambiano il contenuto viene confrontato tramite
+    hash: un file solo "toccato" riusa la voce esistente, un file modificato viene reimportato.
+    Il DataFrame viene salvato in Parquet se è installato pyarrow, altrimenti come un file .npy per colonna.
+    Oltre max_entries vengono eliminate le voci usate meno di recente e quelle dei file non più esistenti.
+    """
+    INDEX_FILE = "index.json"
+
+    def __init__(self, cache_dir: str = "data/.import_cache", max_entries: int = 16):
+        self.cache_dir = cache_dir
+        self.max_entries = max_entries
+
+    @staticmethod
+    def _content_hash(file_path: str) -> str:
+        digest = hashlib.sha1()
+        with open(file_path, "rb") as file:
+            for chunk in iter(lambda: file.read(2**20), b""):
+                digest.update(chunk)
+        return digest.hexdigest()
+
+    def _read_index(self) -> dict:
+        try:
+            with open(os.path.join(self.cache_dir, self.INDEX_FILE), encoding="utf-8") as file:
+                return json.load(file)
+        except (OSError, ValueError):
+            return {"sources": {}, "entries": {}}
+
+    def _write_index(self, index: dict):
+        # Scrittura atomica: un'interruzione non lascia mai un indice a metà
+        path = os.path.join(self.cache_dir, self.INDEX_FILE)
+        with open(path + ".tmp", "w", encoding="utf-8") as file:
+            json.dump(index, file)
+        os.replace(path + ".tmp", path)
+
+    def load(self, file_path: str):
+        """
+        Restituisce la coppia (DataFrame, chiave): il DataFrame è None se il file non è in cache o la voce
+        non è più valida. La chiave va passata a store, così il contenuto del file viene letto una sola volta.
+        """
+        index = self._read_index()
+        source = os.path.abspath(file_path)
+        stat = os.stat(file_path)
+        known = index["sources"].get(source)
+
+        if known is not None and known["size"] == stat.st_size and known["mtime_ns"] == stat.st_mtime_ns:
+            key = known["key"]
+        else:
+            key = self._entry_key(file_path, self._content_hash(file_path))
+        if key not in index["entries"]:
+            return None, key
+
+        try:
+            data = self._read_entry(key, index["entries"][key])
+        except (OSError, ValueError, KeyError):
+            self._remove_entry(index, key)
+            self._write_index(index)
+            return None, key
+
+        index["sources"][source] = {"size": stat.st_size, "mtime_ns": stat.st_mtime_ns, "key": key}
+        index["entries"][key]["last_used"] = time.time()
+        self._write_index(index)
+        return data, key
+
+    def store(self, file_path: str, data: pd.DataFrame, key: str = None):
+        """
+        Memorizza il DataFrame importato dal file. I DataFrame con tipi non rappresentabili non vengono memorizzati.
+        key è la chiave restituita da load; se manca viene calcolata dal contenuto del file.
+        """
+        os.makedirs(self.cache_dir, exist_ok=True)
+        stat = os.stat(file_path)
+        if key is None:
+            key = self._entry_key(file_path, self._content_hash(file_path))
+
+        entry_dir = os.path.join(self.cache_dir, key)
+        shutil.rmtree(entry_dir, ignore_errors=True)
+        os.makedirs(entry_dir)
+        try:
+            entry = self._write_entry(entry_dir, data)
+        except Exception as e:
+            # La cache è facoltativa: un errore di scrittura non deve far fallire l'importazione
+            print(f"Dataset non memorizzato nella cache di import: {e}")
+            entry = None
+        if entry is None:
+            shutil.rmtree(entry_dir, ignore_errors=True)
+            return
+
+        index = self._read_index()
+        entry["last_used"] = time.time()
+        index["entries"][key] = entry
+        index["sources"][os.path.abspath(file_path)] = {"size": stat.st_size, "mtime_ns": stat.st_mtime_ns,
+                                                        "key": key}
+        self._evict(index)
+        self._write_index(index)
+
+    @staticmethod
+    def _entry_key(file_path: str, content_hash: str) -> str:
+        # Lo stesso contenuto con un'estensione diversa viene interpretato da un importer diverso
+        return f"{content_hash}{os.path.splitext(file_path)[1].lower().replace('.', '_')}"
+
+    def _write_entry(self, entry_dir: str, data: pd.DataFrame):
+        try:
+            import pyarrow  # noqa: F401 - formato Parquet disponibile solo con pyarrow
+            if all(isinstance(column, str) for column in data.columns):
+                data.to_parquet(os.path.join(entry_dir, "data.parquet"))
+                return {"format": "parquet"}
+        except ImportError:
+            pass
+        except Exception:
+            # Colonne che Parquet non rappresenta (ad esempio testo e numeri mescolati): si prova il formato .npy
+            if os.path.exists(os.path.join(entry_dir, "data.parquet")):
+                os.remove(os.path.join(entry_dir, "data.parquet"))
+
+        # Fallback senza dipendenze: un file .npy per colonna e per l'indice
+        if not all(isinstance(column, (str, int)) for column in data.columns):
+            return None
+        arrays = [("index", data.index)] + [(f"c{i}", data.iloc[:, i]) for i in range(data.shape[1])]
+        kinds = {}
+        for name, values in arrays:
+            kind = self._save_array(os.path.join(entry_dir, name), values)
+            if kind is None:
+                return None
+            kinds[name] = kind
+        return {"format": "npy", "columns": list(data.columns), "index_name": data.index.name, "kinds": kinds}
+
+    @staticmethod
+    def _save_array(path: str, values) -> str:
+        """
+        Salva una colonna in .npy senza pickle. Le colonne di testo (con eventuali valori mancanti) vengono
+        salvate come stringhe a lunghezza fissa più una maschera dei mancanti.
+        """
+        array = np.asarray(values)
+        if array.dtype.kind in "biufcmM":
+            np.save(path + ".npy", array)
+            return "array"
+        if array.dtype.kind == "O":
+            # Codice dei mancanti: 0 = valore presente, 1 = NaN, 2 = None (come restituiti dal parser)
+            codes = {str: 0, type(None): 2}
+            missing = np.array([1 if isinstance(value, float) and np.isnan(value) else codes.get(type(value), -1)
+                                for value in array], dtype=np.int8)
+            if (missing >= 0).all():
+                np.save(path + ".npy", np.where(missing > 0, "", array).astype(str))
+                np.save(path + "_missing.npy", missing)
+                return "text"
+        return None
+
+    def _read_entry(self, key: str, entry: dict) -> pd.DataFrame:
+        entry_dir = os.path.join(self.cache_dir, key)
+        if entry["format"] == "parquet":
+            return pd.read_parquet(os.path.join(entry_dir, "data.parquet"))
+
+        def load(name):
+            values = np.load(os.path.join(entry_dir, name + ".npy"))
+            if entry["kinds"][name] == "text":
+                missing = np.load(os.path.join(entry_dir, name + "_missing.npy"))
+                values = values.astype(object)
+                values[missing == 1] = np.nan
+                values[missing == 2] = None
+            return values
+
+        index = pd.Index(load("index"), name=entry["index_name"])
+        columns = {i: load(f"c{i}") for i in range(len(entry["columns"]))}
+        data = pd.DataFrame(columns, index=index)
+        data.columns = entry["columns"]
+        return data
+
+    def _remove_entry(self, index: dict, key: str):
+        index["entries"].pop(key, None)
+        index["sources"] = {source: info for source, info in index["sources"].items() if info["key"] != key}
+        shutil.rmtree(os.path.join(self.cache_dir, key), ignore_errors=True)
+
+    def _evict(self, index: dict):
+        # I percorsi dei file spariti non vengono più seguiti; le voci senza percorsi diventano le prime da eliminare
+        index["sources"] = {source: info for source, info in index["sources"].items() if os.path.exists(source)}
+        referenced = {info["key"] for info in index["sources"].values()}
+        for key in sorted(index["entries"], key=lambda key: (key in referenced, index["entries"][key]["last_used"])):
+            if len(index["entries"]) <= self.max_entries:
+                break
+            self._remove_entry(index, key)
+
+
 class SelectionFile:
     """
     Gestisce la selezione e l'importazione dei file in base all'estensione.
+    La cache colonnare dei dataset importati è disattivata di default: si attiva assegnando
+    cache = ImportCache(cartella) oppure passando una cache a import_data.
     """
+    cache = None
+
+    @staticmethod
+    def read(file_path: str, cache: ImportCache = None) -> pd.DataFrame:
+        """
+        Importa il file, leggendolo dalla cache (se attiva) quando è già stato importato e non è cambiato.
+        """
+        importer = SelectionFile.get_importer(file_path)
+        cache = cache if cache is not None else SelectionFile.cache
+        if cache is None:
+            return importer.importer(file_path)
+
+        data, key = cache.load(file_path)
+        if data is not None:
+            print(f"Import del file (cache): {file_path}")
+            return data
+        data = importer.importer(file_path)
+        cache.store(file_path, data, key)
+        return data
+
     @staticmethod
     def get_importer(file_path: str) -> Fileimporter:
         if file_path.endswith('.csv'):
@@ -80,10 +319,26 @@ class SelectionFile:
             raise ValueError("Formato file non supportato. Usa uno di questi formati: [.csv, .xlsx, .tsv, .txt, .json]")
 
     @staticmethod
-    def import_data() -> pd.DataFrame:
+    def iter_chunks(file_path: str, chunksize: int = 100_000, dtype=None):
+        """
+        Legge il file a blocchi di righe senza passare dalla cache, per i dataset più grandi della memoria.
+        dtype viene passato al parser (ad esempio {'classtype_v1': 'float32'}) per ottenere tipi compatti.
+        """
+        return SelectionFile.get_importer(file_path).chunks(file_path, chunksize, dtype)
+
+    @staticmethod
+    def import_data(file_path: str = None, cache: ImportCache = None) -> pd.DataFrame:
         """
         Richiede all'utente di inserire il percorso del file e gestisce eventuali errori di importazione.
+        Se il percorso viene passato come argomento il file viene importato senza interazione
+        e gli eventuali errori vengono propagati al chiamante.
+        cache sostituisce, per questa importazione, la cache di SelectionFile.
         """
+        if file_path is not None:
+            data = SelectionFile.read(file_path, cache)
+            print("Importazione completata con successo!")
+            return data
+
         ok = False
         while not ok:
             file_path = input("Inserisci il percorso del file del dataset di analisi: ").strip()
@@ -93,8 +348,7 @@ class SelectionFile:
                 continue
 
             try:
-                importer = SelectionFile.get_importer(file_path)
-                data = importer.importer(file_path)
+                data = SelectionFile.read(file_path, cache)
                 print("Importazione completata con successo!")
                 return data  # Uscita dal ciclo se l'importazione ha successo
             except Exception as e:
@@ -1,3 +1,4 @@
 from .model_evaluation import Validation
 from .metrics_evaluation_model import ModelEvaluationMetrics
-from .visualization import plot_confusion_matrix, plot_auc
+from .visualization import plot_confusion_matrix, plot_auc, plot_in_background
+from .roc import roc_curve, roc_auc
@@ -1,8 +1,12 @@
 import numpy as np
+from evaluation.roc import roc_auc
 
 #Questa classe si occupa della valutazione di un modello di classificazione.
 #Include metriche di valutazione, validazione incrociata e strumenti di analisi visiva.
 class ModelEvaluationMetrics:
+
+    # Definizione delle metriche valide
+    VALID_METRICS = {"Accuracy", "Error_rate", "Sensitivity", "Specificity", "Geometric_mean", "Auc"}
     
     #Calcolo delle Metriche di Valutazione
     #Questo metodo valuta il modello restituendo metriche chiave:
@@ -11,26 +15,55 @@ class ModelEvaluationMetrics:
     #- Sensibilità & Specificità
     #- Geometric Mean
     #- AUC
+    #Se vengono forniti i punteggi (probabilità della classe maligna), l'AUC è quella esatta della
+    #curva ROC; altrimenti è l'approssimazione a soglia singola calcolata dalle classi predette.
     @staticmethod
-    def evaluate(y_true, y_pred, selected_metrics=None):
-        # Definizione delle metriche valide
-        valid_metrics = {"Accuracy", "Error_rate", "Sensitivity", "Specificity", "Geometric_mean", "Auc"}
-        
+    def evaluate(y_true, y_pred, selected_metrics=None, y_scores=None):
+        # Tutte le metriche derivano dalla matrice di confusione, calcolata in un solo passaggio
+        if y_scores is not None:
+            y_scores = np.asarray(y_scores)[None, :]
+        batch_results = ModelEvaluationMetrics.evaluate_batch(y_true, np.asarray(y_pred)[None, :], selected_metrics,
+                                                              y_scores)
+        return {metric: values[0] for metric, values in batch_results.items()}
+
+    @staticmethod
+    def evaluate_batch(y_true, y_preds, selected_metrics=None, y_scores=None):
+        #Valuta in blocco più vettori di predizioni (ad esempio ogni k di un k-sweep o ogni split).
+
+        #:param y_true: Etichette reali, comuni a tutte le predizioni (n,) o una riga per predizione (m, n).
+        #:param y_preds: Matrice (m, n) con un vettore di predizioni per riga.
+        #:param selected_metrics: Metriche da calcolare.
+        #:param y_scores: Matrice (m, n) opzionale dei punteggi della classe maligna, per l'AUC esatta.
+        #:return: Dizionario metrica -> array (m,) con il valore per ogni vettore di predizioni.
+
         # Se non vengono specificate metriche, solleva un'eccezione
         if selected_metrics is None:
             raise ValueError("Errore: È necessario specificare almeno una metrica da valutare.")
         
         selected_metrics = set(selected_metrics)
         # Verifica se ci sono metriche non valide
-        invalid_metrics = selected_metrics - valid_metrics
+        invalid_metrics = selected_metrics - ModelEvaluationMetrics.VALID_METRICS
         if invalid_metrics:
             raise ValueError(f"Le seguenti metriche non sono valide: {invalid_metrics}")
-        
+
+        y_preds = np.atleast_2d(np.asarray(y_preds))
+        y_true = np.broadcast_to(np.asarray(y_true), y_preds.shape)
+        n_vectors, n_samples = y_preds.shape
+
+        # Matrici di confusione di tutti i vettori con un unico bincount:
+        # cm[r, i, j] = numero di campioni della classe i predetti come classe j nel vettore r
+        classes, codes = np.unique(np.concatenate((y_true.ravel(), y_preds.ravel())), return_inverse=True)
+        n_classes = len(classes)
+        true_codes = codes[:y_true.size].reshape(y_true.shape)
+        pred_codes = codes[y_true.size:].reshape(y_preds.shape)
+        flat = (np.arange(n_vectors)[:, None] * n_classes + true_codes) * n_classes + pred_codes
+        cm = np.bincount(flat.ravel(), minlength=n_vectors * n_classes * n_classes).reshape(n_vectors, n_classes, n_classes)
+
         results = {}  # Dizionario per memorizzare i risultati delle metriche selezionate
         
         # Calcolo di Accuracy ed Error Rate solo se selezionate
         if "Accuracy" in selected_metrics or "Error_rate" in selected_metrics:
-            accuracy = np.mean(y_true == y_pred)  # Accuratezza del modello
+            accuracy = np.trace(cm, axis1=1, axis2=2) / n_samples  # Accuratezza del modello
             if "Accuracy" in selected_metrics:
                 results["Accuracy"] = accuracy
             if "Error_rate" in selected_metrics:
@@ -38,39 +71,43 @@ class ModelEvaluationMetrics:
         
         # Controlla se Sensitivity, Specificity o Geometric Mean sono richieste
         if any(metric in selected_metrics for metric in ["Sensitivity", "Specificity", "Geometric_mean"]):
-            sensitivities, specificities, g_means = [], [], []
-            
-            # Itera sulle classi presenti nei dati per calcolare le metriche necessarie
-            for class_label in np.unique(y_true):
-                tp = sum((y_true == class_label) & (y_pred == class_label))  # Veri positivi
-                fn = sum((y_true == class_label) & (y_pred != class_label))  # Falsi negativi
-                tn = sum((y_true != class_label) & (y_pred != class_label))  # Veri negativi
-                fp = sum((y_true != class_label) & (y_pred == class_label))  # Falsi positivi
-                
-                # Calcolo di Sensitivity, Specificity e Geometric Mean
-                sens = tp / (tp + fn) if (tp + fn) > 0 else 0
-                spec = tn / (tn + fp) if (tn + fp) > 0 else 0
-                g_mean = np.sqrt(sens * spec) if (sens * spec) > 0 else 0
-                
-                sensitivities.append(sens)
-                specificities.append(spec)
-                g_means.append(g_mean)
-            
-            # Memorizza i risultati solo se la metrica è stata selezionata
+            # Per ogni classe presente nelle etichette reali, trattata come classe positiva
+            tp = np.diagonal(cm, axis1=1, axis2=2)  # Veri positivi
+            fn = cm.sum(axis=2) - tp  # Falsi negativi
+            fp = cm.sum(axis=1) - tp  # Falsi positivi
+            tn = n_samples - tp - fn - fp  # Veri negativi
+            present = (tp + fn) > 0
+
+            # Calcolo di Sensitivity, Specificity e Geometric Mean
+            with np.errstate(divide="ignore", invalid="ignore"):
+                sens = np.where(tp + fn > 0, tp / (tp + fn), 0)
+                spec = np.where(tn + fp > 0, tn / (tn + fp), 0)
+            g_mean = np.where(sens * spec > 0, np.sqrt(sens * spec), 0)
+
+            # Media sulle sole classi presenti in y_true
+            n_present = present.sum(axis=1)
             if "Sensitivity" in selected_metrics:
-                results["Sensitivity"] = np.mean(sensitivities)
+                results["Sensitivity"] = np.where(present, sens, 0).sum(axis=1) / n_present
             if "Specificity" in selected_metrics:
-                results["Specificity"] = np.mean(specificities)
+                results["Specificity"] = np.where(present, spec, 0).sum(axis=1) / n_present
             if "Geometric_mean" in selected_metrics:
-                results["Geometric_mean"] = np.mean(g_means)
+                results["Geometric_mean"] = np.where(present, g_mean, 0).sum(axis=1) / n_present
         
-        # Calcolo dell'AUC solo se richiesto
-        if "Auc" in selected_metrics:
-            try:
-                fpr = np.sum((y_true == 2) & (y_pred == 4)) / np.sum(y_true == 2)  # False Positive Rate
-                tpr = np.sum((y_true == 4) & (y_pred == 4)) / np.sum(y_true == 4)  # True Positive Rate
-                results["Auc"] = (1 + tpr - fpr) / 2  # Calcolo dell'AUC manualmente
-            except ValueError as e:
-                raise ValueError("Errore: Impossibile calcolare AUC.") from e
+        # Calcolo dell'AUC solo se richiesto: esatta dai punteggi, se disponibili
+        if "Auc" in selected_metrics and y_scores is not None:
+            y_scores = np.broadcast_to(np.asarray(y_scores, dtype=float), y_preds.shape)
+            results["Auc"] = np.array([roc_auc(true_row, score_row, positive_label=4)
+                                       for true_row, score_row in zip(y_true, y_scores)])
+        elif "Auc" in selected_metrics:
+            # Conteggi per etichetta reale/predetta (0 se l'etichetta non compare nei dati)
+            def count(true_label, pred_label=None):
+                i = np.flatnonzero(classes == true_label)
+                j = np.arange(n_classes) if pred_label is None else np.flatnonzero(classes == pred_label)
+                return cm[:, i][:, :, j].sum(axis=(1, 2))
+
+            with np.errstate(divide="ignore", invalid="ignore"):
+                fpr = count(2, 4) / count(2)  # False Positive Rate
+                tpr = count(4, 4) / count(4)  # True Positive Rate
+            results["Auc"] = (1 + tpr - fpr) / 2  # Calcolo dell'AUC manualmente
         
-        return results
\ No newline at end of file
+        return results
@@ -1,14 +1,132 @@
+import os
+import copy
+import math
 import numpy as np
+from itertools import combinations
 import pandas as pd
+from concurrent.futures import ProcessPoolExecutor
+from models.m_knn import KNNClassifier
+from models.quantization import QuantizedMatrix
+from data_cleaning.data_normalizer import ColumnStatistics
 from evaluation.metrics_evaluation_model import ModelEvaluationMetrics
-from evaluation.visualization import plot_auc, plot_confusion_matrix
+from evaluation.visualization import plot_auc, plot_confusion_matrix, plot_in_background, PLOT_MODES
+
+# Dati condivisi da ogni processo worker per tutti i task che gli vengono assegnati
+_worker_state = {}
+
+def _init_worker(state):
+    # Riceve modello, dataset e parametri una sola volta, all'avvio del processo.
+    _worker_state.update(state)
+
+def _run_fold_worker(task):
+    test_idx, normalizer = task
+    return _run_fold(test_idx=test_idx, normalizer=normalizer, **_worker_state)
+
+def _score_bootstrap_worker(counts):
+    return _score_bootstrap(counts, **_worker_state)
+
+def _single_process(classifier):
+    # Copia del classificatore per i worker di un pool: il parallelismo è già quello dei task, quindi il modello
+    # copiato predice in un solo processo (un pool annidato in ogni worker si blocca). La copia condivide gli
+    # array di training ma non il pool né la memoria condivisa del processo principale (vedi __getstate__),
+    # che i worker creati con fork altrimenti erediterebbero e rilascerebbero al primo fit.
+    classifier = copy.copy(classifier)
+    classifier.model = copy.copy(classifier.get_model())
+    classifier.model.n_jobs = 1
+    return classifier
+
+def _run_in_pool(n_jobs, worker, tasks, state):
+    # Esegue i task in un pool di processi e restituisce i risultati nell'ordine dei task.
+    state = dict(state, classifier=_single_process(state["classifier"]))
+    with ProcessPoolExecutor(max_workers=min(n_jobs, len(tasks)), initializer=_init_worker,
+                             initargs=(state,)) as pool:
+        return list(pool.map(worker, tasks))
+
+def _train_indices(n, test_idx):
+
+    #Indici di training di un fold: tutte le righe non di test, nell'ordine originale.
+
+    train_mask = np.ones(n, dtype=bool)
+    train_mask[test_idx] = False
+    return np.flatnonzero(train_mask)
+
+def _run_fold(classifier, X, y, test_idx, selected_metrics, normalizer=None):
+
+    #Addestra e valuta il modello su un singolo fold.
+
+    #:param test_idx: Indici delle righe di test del fold.
+    #:param normalizer: Normalizzatore già addestrato sulle righe di training del fold (opzionale).
+    #:return: (etichette reali, classi predette, probabilità, metriche) del fold di test.
+
+    train_idx = _train_indices(len(X), test_idx)
+    X_test, y_test = X[test_idx], y[test_idx]
+    X_train, y_train = X[train_idx], y[train_idx] #Dati e etichette di addestramento
+    if normalizer is not None:
+        X_train, X_test = normalizer.transform(X_train), normalizer.transform(X_test)
+
+    classifier.train(X_train, y_train)  #Addestramento del modello
+    y_pred, y_scores = classifier.predict(X_test)  #Ora restituiamo anche le probabilità
+
+    #Calcolo delle metriche
+    metrics = ModelEvaluationMetrics.evaluate(y_test, y_pred, selected_metrics, y_scores)
+    return y_test, y_pred, y_scores, metrics
+
+def _score_bootstrap(counts, classifier, X, y, neighbors, selected_metrics):
+
+    #Valuta un gruppo di campioni bootstrap sulle rispettive righe out-of-bag (OOB).
+    #Un campione bootstrap è descritto dal numero di copie di ogni riga del dataset. I k vicini di una
+    #riga OOB nel campione si ottengono scorrendo la sua lista di vicini sull'intero dataset (ordinata
+    #per distanza e indice) e sommando le copie presenti nel campione, senza nuove distanze.
+
+    #:param counts: Matrice (n_campioni, n) delle molteplicità delle righe in ogni campione.
+    #:param neighbors: Vicini di ogni riga sull'intero dataset, ordinati (n, L).
+    #:return: Lista di (indici OOB, classi predette, probabilità, metriche), una per campione.
+
+    k = classifier.get_model().k
+    positive = y == 4
+    outputs = []
+
+    for sample_counts in counts:
+        oob = np.flatnonzero(sample_counts == 0)
+        oob_neighbors = neighbors[oob]
+
+        #Copie di ogni vicino che rientrano tra i primi k del campione bootstrap
+        copies = sample_counts[oob_neighbors]
+        cumulative = np.cumsum(copies, axis=1)
+        taken = np.minimum(copies, np.maximum(k - (cumulative - copies), 0))
+        positive_counts = np.sum(taken * positive[oob_neighbors], axis=1)
+
+        #Righe i cui L vicini non bastano a raggiungere k copie: ricerca esplicita sul campione
+        incomplete = cumulative[:, -1] < k
+        if incomplete.any():
+            sample = np.repeat(np.arange(len(y)), sample_counts)
+            classifier.train(X[sample], y[sample])
+            _, k_indices = classifier.get_model().kneighbors(X[oob[incomplete]])
+            positive_counts[incomplete] = np.sum(positive[sample][k_indices], axis=1)
+
+        y_scores = positive_counts / k
+        y_pred = np.where(y_scores >= 0.5, 4, 2)
+        metrics = ModelEvaluationMetrics.evaluate(y[oob], y_pred, selected_metrics, y_scores)
+        outputs.append((oob, y_pred, y_scores, metrics))
+
+    return outputs
 
 
 class Validation:
     
-    #Classe che gestisce la validazione di un modello utilizzando K-Fold Cross Validation.
+    #Classe che gestisce la validazione di un modello utilizzando K-Fold Cross Validation
+    #(contigua, mescolata o stratificata), Leave-One-Out, Leave-p-Out, Bootstrap, Random Subsampling
+    #e Stratified Shuffle Split.
+
+    #Numero massimo di split valutati dalla Leave-p-Out se non specificato
+    LPO_MAX_SPLITS = 1000
+
+    #Numero massimo di vicini (split x righe di test x vicini) esaminati insieme dalla Leave-p-Out
+    LPO_BLOCK_ELEMENTS = 2 ** 22
     
-    def __init__(self, classifier, X, y, num_folds=5, save_results=True, selected_metrics=None):
+    def __init__(self, classifier, X, y, num_folds=5, save_results=True, selected_metrics=None, n_jobs=1,
+                 shuffle=False, stratified=False, seed=None, plot_mode="show", background_plots=False,
+                 output_dir="result", normalizer=None, dtype=None):
         
         #Inizializza la validazione.
 
@@ -17,13 +135,127 @@ class Validation:
         #:param y: Etichette del dataset.
         #:param num_folds: Numero di folds per la K-Fold Cross Validation.
         #:param save_results: Se True, salva i risultati in CSV.
+        #:param n_jobs: Numero di processi che eseguono i fold in parallelo (-1 = tutti i core).
+        #:param shuffle: Se True, le righe vengono mescolate prima di formare i fold.
+        #:param stratified: Se True, ogni fold mantiene la proporzione delle classi del dataset.
+        #:param seed: Seme del generatore casuale usato per mescolare le righe.
+        #:param plot_mode: "show" salva e mostra i grafici, "headless" li salva soltanto (backend Agg,
+        #                  nessun display richiesto), "off" non li produce.
+        #:param background_plots: Se True, i grafici headless vengono disegnati in un thread in background.
+        #:param output_dir: Cartella in cui salvare risultati e grafici.
+        #:param normalizer: Normalizzatore (es. MinMaxNormalizer()) addestrato separatamente sulle righe di
+        #                   training di ogni fold, così le statistiche del test set non entrano nel training.
+        #:param dtype: Tipo delle feature (np.float64 o np.float32); di default la precisione del modello.
         
+        if plot_mode not in PLOT_MODES:
+            raise ValueError(f"Modalità dei grafici non valida: {plot_mode}. Valori ammessi: {PLOT_MODES}.")
+        if background_plots and plot_mode == "show":
+            raise ValueError("I grafici in background richiedono plot_mode='headless'.")
+
         self.classifier = classifier
-        self.X = np.array(X, dtype=float) #Convertiamo le feature in float per sicurezza
+        if dtype is None:
+            dtype = getattr(classifier.get_model(), "dtype", float)
+        #Riferimento alle feature originali, non convertite né quantizzate: precision_check ne ricava
+        #la ricerca di riferimento in float64 (un riferimento e non una copia, per non raddoppiare la memoria)
+        self._X_source = X
+        self.X = np.array(X, dtype=dtype) #Convertiamo le feature in float per sicurezza
+        if getattr(classifier.get_model(), "compact", False):
+            #Modello in modalità compatta: le feature vengono quantizzate una sola volta e ogni fold
+            #passa al modello i codici uint8/int16, senza copie float64 (se la quantizzazione è senza perdita)
+            quantized = QuantizedMatrix.from_array(self.X)
+            if quantized is not None:
+                self.X = quantized
         self.y = np.array(y)
         self.num_folds = num_folds
         self.save_results = save_results
         self.selected_metrics = selected_metrics
+        self.n_jobs = n_jobs
+        self.shuffle = shuffle
+        self.stratified = stratified
+        self.seed = seed
+        self.plot_mode = plot_mode
+        self.background_plots = background_plots
+        self._plot_futures = []
+        self.output_dir = output_dir
+        self.normalizer = normalizer
+
+    def _model_inputs(self):
+
+        #Restituisce l'input del modello: con una matrice delle distanze precalcolata il modello
+        #riceve gli indici delle righe del dataset invece delle feature.
+
+        distance_cache = getattr(self.classifier.get_model(), "distance_cache", None)
+        if distance_cache is None:
+            return self.X
+        if len(distance_cache) != len(self.X):
+            raise ValueError("La matrice delle distanze non corrisponde al dataset da validare.")
+        return np.arange(len(self.X)).reshape(-1, 1)
+
+    def _split_normalizers(self, test_sets):
+
+        #Addestra il normalizzatore sulle righe di training di ogni split.
+        #Quando gli split partizionano il dataset (K-Fold) le statistiche vengono calcolate una sola volta
+        #per fold e quelle di training di ogni fold si ottengono unendo le statistiche degli altri fold.
+
+        #:param test_sets: Lista di array con gli indici di test di ogni split.
+        #:return: Lista di normalizzatori addestrati, uno per split (None senza normalizzatore).
+
+        if self.normalizer is None:
+            return [None] * len(test_sets)
+        if getattr(self.classifier.get_model(), "distance_cache", None) is not None:
+            raise ValueError("La normalizzazione per fold non è compatibile con una matrice delle distanze precalcolata.")
+
+        n = len(self.X)
+        covered = np.bincount(np.concatenate(test_sets), minlength=n)
+        if np.all(covered == 1):
+            #Unioni cumulative da sinistra e da destra: il training del fold i unisce prefisso e suffisso
+            parts = [ColumnStatistics.from_array(self.X[test_idx]) for test_idx in test_sets]
+            prefix, suffix = [None], [None]
+            for part in parts[:-1]:
+                prefix.append(part if prefix[-1] is None else prefix[-1].merge(part))
+            for part in parts[:0:-1]:
+                suffix.append(part if suffix[-1] is None else part.merge(suffix[-1]))
+            suffix.reverse()
+            train_statistics = [left if right is None else right if left is None else left.merge(right)
+                                for left, right in zip(prefix, suffix)]
+        else:
+            train_statistics = [ColumnStatistics.from_array(self.X[_train_indices(n, test_idx)])
+                                for test_idx in test_sets]
+
+        return [type(self.normalizer)().fit_statistics(statistics) for statistics in train_statistics]
+
+    def _require_global_inputs(self, description):
+
+        #I metodi che cercano i vicini una sola volta sull'intero dataset non possono normalizzare per fold.
+
+        if self.normalizer is not None:
+            raise ValueError(f"{description} non supporta la normalizzazione per fold: "
+                             "normalizzare il dataset prima della validazione.")
+
+    def _fold_indices(self):
+
+        #Genera gli indici di test di ogni fold con un costo complessivamente lineare nel numero di righe.
+        #Senza shuffle né stratificazione i fold sono intervalli contigui, come nella versione originale.
+
+        #:return: Lista di array di indici, uno per fold.
+
+        n = len(self.X)
+        order = np.random.default_rng(self.seed).permutation(n) if self.shuffle else np.arange(n)
+
+        if self.stratified:
+            #Le righe, ordinate per classe, vengono assegnate ai fold a rotazione: ogni fold riceve
+            #così la stessa proporzione di campioni di ciascuna classe
+            order = order[np.argsort(self.y[order], kind="stable")]
+            fold_of = np.empty(n, dtype=np.intp)
+            fold_of[order] = np.arange(n) % self.num_folds
+            order = np.argsort(fold_of, kind="stable")
+            fold_sizes = np.bincount(fold_of, minlength=self.num_folds)
+        else:
+            fold_size = n // self.num_folds  #Dimensione di ogni fold
+            remainder = n % self.num_folds  #Numero di elementi extra
+            fold_sizes = [fold_size + (1 if i < remainder else 0) for i in range(self.num_folds)]
+
+        return np.split(order, np.cumsum(fold_sizes)[:-1])
 
     def k_fold_cross_validation(self):
         
@@ -31,54 +263,492 @@ class Validation:
 
         #:return: DataFrame con i risultati della validazione.
         
-        fold_size = len(self.X) // self.num_folds  #Dimensione di ogni fold
-        remainder = len(self.X) % self.num_folds  #Numero di elementi extra
+        folds = self._fold_indices()
+        results, all_y_true, all_y_pred, all_y_scores = self._evaluate_splits(folds, self.n_jobs)
+
+        # Calcolo della media delle metriche senza la prima riga
+        mean_metrics = {key: np.mean([d[key] for d in results[0:]]) for key in results[0] if key != "fold"}
+
+        # Aggiunta della media al dizionario finale
+        mean_metrics["fold"] = "Mean"  # Etichetta per indicare che è la media
+        results.append(mean_metrics)
+    
+        results_df = pd.DataFrame(results)
+
+        self._report(results_df, all_y_true, all_y_pred, all_y_scores, "validation_results.csv",
+                     "della validazione K-Fold")
+
+        return results_df
+
+    def _evaluate_splits(self, test_sets, n_jobs):
+
+        #Addestra e valuta il modello su ogni split (tutte le righe non di test formano il training set).
+
+        #:param test_sets: Lista di array con gli indici di test di ogni split.
+        #:param n_jobs: Numero di processi (-1 = tutti i core).
+        #:return: (metriche di ogni split, etichette reali, classi predette, probabilità) aggregate
+        #         nell'ordine degli split.
+
         results = []
-        all_y_true = []
-        all_y_pred = []
-        all_y_scores = []  #Ora memorizziamo le probabilità invece delle classi predette
+        X = self._model_inputs()
+        normalizers = self._split_normalizers(test_sets)
 
-        for i in range(self.num_folds):
-            start = i * fold_size + min(i, remainder)  #Inizio del fold di test
-            end = start + fold_size + (1 if i < remainder else 0)  #Fine del fold di test
+        #Le predizioni di tutti gli split vengono scritte, nell'ordine degli split, in array preallocati
+        all_y_true = self.y[np.concatenate(test_sets)]
+        all_y_pred = np.empty(len(all_y_true), dtype=np.int64)
+        all_y_scores = np.empty(len(all_y_true))  #Ora memorizziamo le probabilità invece delle classi predette
 
-            X_test, y_test = self.X[start:end], self.y[start:end]
-            X_train = np.vstack((self.X[:start], self.X[end:])) #Dati di addestramento
-            y_train = np.concatenate((self.y[:start], self.y[end:])) #Etichette di addestramento
+        n_jobs = os.cpu_count() if n_jobs == -1 else n_jobs
+        if n_jobs > 1:
+            #Gli split sono indipendenti: vengono eseguiti in parallelo e raccolti nell'ordine originale
+            state = dict(classifier=self.classifier, X=X, y=self.y, selected_metrics=self.selected_metrics)
+            split_outputs = _run_in_pool(n_jobs, _run_fold_worker, list(zip(test_sets, normalizers)), state)
 
-            self.classifier.train(X_train, y_train)  #Addestramento del modello
-            y_pred, y_scores = self.classifier.predict(X_test)  #Ora restituiamo anche le probabilità
+            #Come nell'esecuzione seriale, il modello resta addestrato sull'ultimo split
+            train_idx = _train_indices(len(X), test_sets[-1])
+            X_train = X[train_idx] if normalizers[-1] is None else normalizers[-1].transform(X[train_idx])
+            self.classifier.train(X_train, self.y[train_idx])
+        else:
+            split_outputs = (_run_fold(self.classifier, X, self.y, test_idx, self.selected_metrics, normalizer)
+                             for test_idx, normalizer in zip(test_sets, normalizers))
 
-            #Calcolo delle metriche
-            metrics = ModelEvaluationMetrics.evaluate(y_test, y_pred, self.selected_metrics)
+        offset = 0
+        for i, (y_test, y_pred, y_scores, metrics) in enumerate(split_outputs):
             metrics["fold"] = i + 1
             results.append(metrics)
 
             #Salvataggio delle predizioni per i grafici
-            all_y_pred.extend(y_pred)
-            all_y_true.extend(y_test)
-            y_true_binary = np.where(np.array(all_y_true) == 4, 1, 0) #Conversione per la ROC-AUC
-            all_y_scores.extend(y_scores)  #Usiamo le probabilità per la ROC-AUC
+            all_y_pred[offset:offset + len(y_test)] = y_pred
+            all_y_scores[offset:offset + len(y_test)] = y_scores  #Usiamo le probabilità per la ROC-AUC
+            offset += len(y_test)
 
+        return results, all_y_true, all_y_pred, all_y_scores
 
-        # Calcolo della media delle metriche senza la prima riga
-        mean_metrics = {key: np.mean([d[key] for d in results[0:]]) for key in results[0] if key != "fold"}
+    def _report(self, results_df, y_true, y_pred, y_scores, filename, description):
 
-        # Aggiunta della media al dizionario finale
-        mean_metrics["fold"] = "Mean"  # Etichetta per indicare che è la media
-        results.append(mean_metrics)
-    
-        results_df = pd.DataFrame(results)
+        #Produce i grafici sulle predizioni aggregate e salva i risultati.
 
-        #Cacolo matrice di confusione
-        plot_confusion_matrix(np.array(all_y_true), np.array(all_y_pred))  #Usa classi discrete
+        #:param results_df: DataFrame con le metriche da salvare.
+        #:param y_true: Etichette reali di tutte le predizioni.
+        #:param y_pred: Classi predette.
+        #:param y_scores: Probabilità della classe maligna.
+        #:param filename: Nome del file CSV nella cartella result.
+        #:param description: Descrizione della validazione per il messaggio finale.
 
-        #Calcolo della ROC-AUC basata sulle probabilità
-        plot_auc(np.array(y_true_binary), np.array(all_y_scores))  #ROC-AUC basata sulle probabilità
+        if self.plot_mode != "off" or self.save_results:
+            os.makedirs(self.output_dir, exist_ok=True)
+
+        if self.plot_mode != "off":
+            y_true_binary = np.where(y_true == 4, 1, 0) #Conversione per la ROC-AUC
+            if self.background_plots:
+                #I grafici vengono disegnati dal worker in background: si attende solo con wait_for_plots
+                self._plot_futures.append(plot_in_background(plot_confusion_matrix, y_true, y_pred,
+                                                             output_dir=self.output_dir))
+                self._plot_futures.append(plot_in_background(plot_auc, y_true_binary, y_scores,
+                                                             output_dir=self.output_dir))
+            else:
+                show = self.plot_mode == "show"
+                plot_confusion_matrix(y_true, y_pred, show=show, output_dir=self.output_dir)  #Usa classi discrete
+                plot_auc(y_true_binary, y_scores, show=show, output_dir=self.output_dir)  #ROC-AUC sulle probabilità
 
         #Salvataggio dei risultati
         if self.save_results:
-            results_df.to_csv("result/validation_results.csv", index=False)
-            print("Risultati della validazione K-Fold salvati in results/validation_results.csv")
+            path = os.path.join(self.output_dir, filename)
+            results_df.to_csv(path, index=False)
+            print(f"Risultati {description} salvati in {path}")
+
+    def wait_for_plots(self):
+
+        #Attende che i grafici disegnati in background siano stati salvati.
+        #Eventuali errori di disegno vengono rilanciati qui.
+
+        futures, self._plot_futures = self._plot_futures, []
+        for future in futures:
+            future.result()
+
+    def leave_one_out(self):
+
+        #Esegue la Leave-One-Out Cross Validation sfruttando la struttura del k-NN: una sola ricerca
+        #dei k+1 vicini sull'intero dataset, da cui si scarta il punto stesso, fornisce in un unico
+        #passaggio vettorizzato la predizione di ogni campione escluso dal training.
+
+        #:return: DataFrame con le metriche calcolate su tutte le predizioni.
+
+        model = self.classifier.get_model()
+        if not isinstance(model, KNNClassifier):
+            raise ValueError("La Leave-One-Out veloce è disponibile solo per il classificatore k-NN.")
+        if len(self.X) <= model.k:
+            raise ValueError("La Leave-One-Out richiede più campioni del numero di vicini k.")
+        self._require_global_inputs("La Leave-One-Out veloce")
+
+        X = self._model_inputs()
+        self.classifier.train(X, self.y)
+        _, neighbors = model.kneighbors(X, model.k + 1)
+
+        #Si scarta il campione stesso dai suoi k+1 vicini
+        neighbors = neighbors[Validation._loo_mask(neighbors)].reshape(len(X), model.k)
+
+        y_pred, y_scores = KNNClassifier.vote(self.y[neighbors], model.k)
+
+        metrics = ModelEvaluationMetrics.evaluate(self.y, y_pred, self.selected_metrics, y_scores)
+        metrics["fold"] = "LOO"
+        results_df = pd.DataFrame([metrics])
+
+        self._report(results_df, self.y, y_pred, y_scores, "loo_results.csv", "della validazione Leave-One-Out")
+
+        return results_df
+
+    @staticmethod
+    def _loo_mask(neighbors):
+
+        #Maschera dei vicini da tenere tra i k+1 di ogni riga cercati sull'intero dataset.
+        #Si scarta il campione stesso; se pareggi a distanza zero con indici minori lo hanno escluso
+        #dai k+1 vicini, si scarta l'ultimo, così restano i k vicini del training set senza il campione
+
+        k = neighbors.shape[1] - 1
+        is_self = neighbors == np.arange(len(neighbors))[:, None]
+        return ~(is_self | (~is_self.any(axis=1))[:, None] & (np.arange(k + 1) == k))
+
+    def precision_check(self, k=None):
+
+        #Verifica se la precisione float32 è sicura sul dataset: per ogni riga confronta i k vicini
+        #Leave-One-Out trovati in float32 con quelli trovati in float64, con gli stessi parametri del modello.
+
+        #:param k: Numero di vicini da confrontare (default: k del modello).
+        #:return: DataFrame con il numero e la frazione di righe con insiemi di vicini diversi, ordine dei
+        #         vicini diverso e predizione diversa, e lo scarto massimo tra le distanze di pari posizione.
+
+        model = self.classifier.get_model()
+        if not isinstance(model, KNNClassifier):
+            raise ValueError("Il confronto delle precisioni è disponibile solo per il classificatore k-NN.")
+        if model.distance_cache is not None:
+            raise ValueError("Con una matrice delle distanze precalcolata la precisione è quella della matrice.")
+        k = model.k if k is None else k
+        if len(self.X) <= k:
+            raise ValueError("Il confronto delle precisioni richiede più campioni del numero di vicini k.")
+
+        #Entrambe le ricerche partono dalle feature originali: con il modello in float32 self.X è già
+        #arrotondato, e il riferimento in float64 non sarebbe più quello del dataset
+        X = np.asarray(self._X_source, dtype=float)
+        searches = []
+        for dtype in KNNClassifier.DTYPES:
+            knn = KNNClassifier(k=k, index=model.index, leaf_size=model.leaf_size, max_memory_mb=model.max_memory_mb,
+                                block_size=model.block_size, n_jobs=model.n_jobs, dtype=dtype)
+            knn.fit(X, self.y)
+            distances, neighbors = knn.kneighbors(X, k + 1)
+            keep = Validation._loo_mask(neighbors)
+            searches.append((distances[keep].reshape(len(X), k).astype(float), neighbors[keep].reshape(len(X), k)))
+        (dist_64, neighbors_64), (dist_32, neighbors_32) = searches
+
+        set_differs = (np.sort(neighbors_64, axis=1) != np.sort(neighbors_32, axis=1)).any(axis=1)
+        order_differs = (neighbors_64 != neighbors_32).any(axis=1)
+        pred_64, _ = KNNClassifier.vote(self.y[neighbors_64], k)
+        pred_32, _ = KNNClassifier.vote(self.y[neighbors_32], k)
+        pred_differs = pred_64 != pred_32
+
+        results_df = pd.DataFrame([{
+            "rows": len(X),
+            "k": k,
+            "neighbor_set_mismatches": int(set_differs.sum()),
+            "neighbor_set_mismatch_rate": set_differs.mean(),
+            "neighbor_order_mismatch_rate": order_differs.mean(),
+            "prediction_mismatches": int(pred_differs.sum()),
+            "prediction_mismatch_rate": pred_differs.mean(),
+            "max_distance_error": np.abs(dist_64 - dist_32).max(),
+        }])
+        print(f"float32 e float64: vicini diversi per {set_differs.sum()} righe su {len(X)} "
+              f"({set_differs.mean():.2%}), predizioni diverse per {pred_differs.sum()} righe.")
+
+        if self.save_results:
+            os.makedirs(self.output_dir, exist_ok=True)
+            path = os.path.join(self.output_dir, "precision_check_results.csv")
+            results_df.to_csv(path, index=False)
+            print(f"Risultati del confronto delle precisioni salvati in {path}")
+
+        return results_df
+
+    def leave_p_out(self, p, max_splits=None, seed=None):
+
+        #Esegue la Leave-p-Out Cross Validation. Se il numero di split C(n, p) non supera max_splits
+        #vengono enumerati tutti, altrimenti se ne estraggono max_splits in modo uniforme.
+        #Basta una sola ricerca dei k+p vicini sull'intero dataset: togliendo i p punti di test, al più p
+        #vicini di ogni punto vengono scartati e i primi k rimanenti sono quelli del training set.
+
+        #:param p: Numero di righe di test di ogni split.
+        #:param max_splits: Numero massimo di split da valutare (default: LPO_MAX_SPLITS).
+        #:param seed: Seme del generatore casuale usato quando gli split vengono campionati.
+        #:return: DataFrame con le metriche di ogni split e la loro media.
+
+        model = self.classifier.get_model()
+        if not isinstance(model, KNNClassifier):
+            raise ValueError("La Leave-p-Out veloce è disponibile solo per il classificatore k-NN.")
+        self._require_global_inputs("La Leave-p-Out veloce")
+
+        n = len(self.X)
+        if not 0 < p <= n - model.k:
+            raise ValueError("p deve essere positivo e lasciare almeno k righe nel training set.")
+
+        max_splits = self.LPO_MAX_SPLITS if max_splits is None else max_splits
+        total_splits = math.comb(n, p)
+        if total_splits <= max_splits:
+            test_sets = np.array(list(combinations(range(n), p)), dtype=np.intp).reshape(-1, p)
+        else:
+            #Ogni split è un sottoinsieme uniforme di p righe: le p chiavi casuali più piccole di ogni riga
+            keys = np.random.default_rng(seed).random((max_splits, n))
+            test_sets = np.argpartition(keys, p - 1, axis=1)[:, :p]
+        print(f"Leave-p-Out: valutati {len(test_sets)} split su {total_splits} possibili (p={p}).")
+
+        X = self._model_inputs()
+        self.classifier.train(X, self.y)
+        _, neighbors = model.kneighbors(X, model.k + p)
+
+        #Vicini di ogni punto di test, esclusi quelli che appartengono allo stesso split
+        #Gli split vengono elaborati a blocchi di LPO_BLOCK_ELEMENTS vicini; l'appartenenza allo split si
+        #verifica con una ricerca binaria delle chiavi (split, riga) tra quelle di test ordinate
+        y_scores = np.empty(test_sets.shape)
+        block_splits = max(self.LPO_BLOCK_ELEMENTS // (p * neighbors.shape[1]), 1)
+        for start in range(0, len(test_sets), block_splits):
+            block = test_sets[start:start + block_splits]
+            offsets = np.arange(len(block))[:, None] * n
+            test_keys = np.sort(block + offsets, axis=None)
+            split_neighbors = neighbors[block]
+            keys = split_neighbors + offsets[:, :, None]
+            positions = np.minimum(np.searchsorted(test_keys, keys), len(test_keys) - 1)
+            in_test = test_keys[positions] == keys
+            kept = ~in_test & (np.cumsum(~in_test, axis=-1) <= model.k)
+            y_scores[start:start + block_splits] = np.sum(kept & (self.y[split_neighbors] == 4), axis=-1) / model.k
+        y_pred = np.where(y_scores >= 0.5, 4, 2)
+
+        #Tutti gli split hanno p righe di test: vengono valutati in blocco
+        batch_metrics = ModelEvaluationMetrics.evaluate_batch(self.y[test_sets], y_pred, self.selected_metrics,
+                                                              y_scores)
+        results = []
+        for i in range(len(test_sets)):
+            metrics = {key: values[i] for key, values in batch_metrics.items()}
+            metrics["fold"] = i + 1
+            results.append(metrics)
+
+        mean_metrics = {key: np.mean([d[key] for d in results]) for key in results[0] if key != "fold"}
+        mean_metrics["fold"] = "Mean"
+        results_df = pd.DataFrame(results + [mean_metrics])
+        results_df.attrs["n_splits"] = len(test_sets)
+
+        self._report(results_df, self.y[test_sets.ravel()], y_pred.ravel(), y_scores.ravel(),
+                     "leave_p_out_results.csv", "della validazione Leave-p-Out")
+
+        return results_df
+
+    def k_sweep(self, k_max):
+
+        #Valuta con la K-Fold tutti i valori di k da 1 a k_max con una sola ricerca dei vicini per fold.
+        #Per ogni fold si cercano i k_max vicini una volta sola; le predizioni per ogni k derivano dai
+        #conteggi cumulativi delle etichette dei vicini ordinati.
+
+        #:param k_max: Valore massimo di k da valutare.
+        #:return: DataFrame con una riga per ogni k e la media delle metriche sui fold.
+
+        results_df = Validation.sweep_metrics(self.fold_neighbor_labels(k_max), k_max, self.selected_metrics)
+
+        if self.save_results:
+            os.makedirs(self.output_dir, exist_ok=True)
+            path = os.path.join(self.output_dir, "k_sweep_results.csv")
+            results_df.to_csv(path, index=False)
+            print(f"Risultati del k-sweep salvati in {path}")
+
+        return results_df
+
+    def fold_neighbor_labels(self, k_max):
+
+        #Cerca una sola volta per fold i k_max vicini di ogni riga di test (primo passo del k-sweep).
+
+        #:param k_max: Numero di vicini da cercare.
+        #:return: Lista di coppie (etichette reali del fold, etichette dei k_max vicini ordinati (n_test, k_max)).
+
+        model = self.classifier.get_model()
+        if not isinstance(model, KNNClassifier):
+            raise ValueError("Il k-sweep è disponibile solo per il classificatore k-NN.")
+
+        fold_neighbors = []
+        X = self._model_inputs()
+        folds = self._fold_indices()
+
+        for test_idx, normalizer in zip(folds, self._split_normalizers(folds)):
+            train_idx = _train_indices(len(X), test_idx)
+            X_train, X_test = X[train_idx], X[test_idx]
+            if normalizer is not None:
+                X_train, X_test = normalizer.transform(X_train), normalizer.transform(X_test)
+            self.classifier.train(X_train, self.y[train_idx])
+
+            _, k_indices = model.kneighbors(X_test, k_max)
+            fold_neighbors.append((self.y[test_idx], model.y_train[k_indices]))
+
+        return fold_neighbors
+
+    @staticmethod
+    def sweep_metrics(fold_neighbors, k_max, selected_metrics=None):
+
+        #Calcola le metriche medie sui fold per ogni k da 1 a k_max a partire dalle etichette dei vicini.
+
+        #:param fold_neighbors: Output di fold_neighbor_labels.
+        #:param k_max: Valore massimo di k da valutare.
+        #:param selected_metrics: Metriche da calcolare.
+        #:return: DataFrame con una riga per ogni k e la media delle metriche sui fold.
+
+        fold_metrics = {k: [] for k in range(1, k_max + 1)}
+
+        for y_test, neighbor_labels in fold_neighbors:
+            y_pred, y_scores = KNNClassifier.sweep_votes(neighbor_labels[:, :k_max], k_max)
+
+            #Tutti i k del fold vengono valutati insieme: una riga di predizioni per ogni k
+            batch_metrics = ModelEvaluationMetrics.evaluate_batch(y_test, y_pred.T, selected_metrics, y_scores.T)
+            for k in fold_metrics:
+                fold_metrics[k].append({key: values[k - 1] for key, values in batch_metrics.items()})
+
+        results = []
+        for k, metrics in fold_metrics.items():
+            mean_metrics = {"k": k}
+            mean_metrics.update({key: np.mean([d[key] for d in metrics]) for key in metrics[0]})
+            results.append(mean_metrics)
+
+        return pd.DataFrame(results)
+
+    def bootstrap(self, n_iterations=100, seed=None, n_jobs=None):
+
+        #Esegue la validazione Bootstrap con stima out-of-bag e stima .632.
+        #Tutte le matrici di ricampionamento vengono generate insieme con NumPy. Per il k-NN la ricerca
+        #dei vicini viene fatta una sola volta sull'intero dataset: ogni campione bootstrap contiene solo
+        #copie di righe del dataset, quindi i suoi vicini derivano dalla stessa lista ordinata. Il modello
+        #equivale a quello addestrato sul campione bootstrap ordinato per indice di riga.
+
+        #:param n_iterations: Numero di campioni bootstrap.
+        #:param seed: Seme del generatore casuale.
+        #:param n_jobs: Numero di processi (default: quello della validazione).
+        #:return: DataFrame con le metriche di ogni campione, la media OOB e la stima .632.
+
+        model = self.classifier.get_model()
+        if not isinstance(model, KNNClassifier):
+            raise ValueError("Il Bootstrap è disponibile solo per il classificatore k-NN.")
+        self._require_global_inputs("Il Bootstrap")
+
+        n = len(self.X)
+        X = self._model_inputs()
+        rng = np.random.default_rng(seed)
+
+        #Molteplicità di ogni riga in ogni campione, calcolate con un unico bincount
+        samples = rng.integers(0, n, size=(n_iterations, n))
+        counts = np.bincount((samples + n * np.arange(n_iterations)[:, None]).ravel(),
+                             minlength=n_iterations * n).reshape(n_iterations, n)
+
+        #Stima apparente (.632): modello addestrato e valutato sull'intero dataset
+        self.classifier.train(X, self.y)
+        y_apparent, apparent_scores = self.classifier.predict(X)
+        apparent_metrics = ModelEvaluationMetrics.evaluate(self.y, y_apparent, self.selected_metrics,
+                                                           apparent_scores)
+
+        #Una sola ricerca dei vicini, abbastanza lunga da coprire k copie quasi sempre
+        _, neighbors = model.kneighbors(X, max(4 * model.k, model.k + 32))
+
+        state = dict(classifier=self.classifier, X=X, y=self.y, neighbors=neighbors,
+                     selected_metrics=self.selected_metrics)
+        n_jobs = self.n_jobs if n_jobs is None else n_jobs
+        n_jobs = os.cpu_count() if n_jobs == -1 else n_jobs
+        if n_jobs > 1:
+            chunks = np.array_split(counts, min(4 * n_jobs, n_iterations))
+            outputs = [out for chunk in _run_in_pool(n_jobs, _score_bootstrap_worker, chunks, state) for out in chunk]
+        else:
+            outputs = _score_bootstrap(counts, **state)
+
+        results = []
+        for i, (_, _, _, metrics) in enumerate(outputs):
+            metrics["fold"] = i + 1
+            results.append(metrics)
+
+        mean_metrics = {key: np.mean([d[key] for d in results]) for key in results[0] if key != "fold"}
+        estimate_632 = {key: 0.368 * apparent_metrics[key] + 0.632 * value for key, value in mean_metrics.items()}
+        mean_metrics["fold"] = "Mean"
+        estimate_632["fold"] = ".632"
+        results_df = pd.DataFrame(results + [mean_metrics, estimate_632])
+
+        #Grafici sulle predizioni OOB di tutti i campioni
+        y_true = self.y[np.concatenate([oob for oob, _, _, _ in outputs])]
+        y_pred = np.concatenate([pred for _, pred, _, _ in outputs])
+        y_scores = np.concatenate([scores for _, _, scores, _ in outputs])
+        self._report(results_df, y_true, y_pred, y_scores, "bootstrap_results.csv", "della validazione Bootstrap")
+
+        return results_df
+
+    def _shuffle_split_indices(self, n_repeats, test_size, seed, stratified):
+
+        #Genera con un'unica chiamata vettorizzata gli indici di test di tutte le ripetizioni.
+
+        #:param test_size: Frazione (0 < test_size < 1) o numero di righe di test.
+        #:return: Matrice (n_repeats, n_test) di indici di test.
+
+        n = len(self.X)
+        n_test = int(np.ceil(test_size * n)) if 0 < test_size < 1 else int(test_size)
+        if not 0 < n_test < n:
+            raise ValueError("test_size deve lasciare almeno una riga sia nel test sia nel training set.")
+
+        keys = np.random.default_rng(seed).random((n_repeats, n))
+        if not stratified:
+            #Una permutazione casuale per riga: le prime n_test posizioni formano il test set
+            return np.argsort(keys, axis=1)[:, :n_test]
+
+        #Aggiungendo il codice della classe alle chiavi casuali, l'ordinamento raggruppa le righe per
+        #classe mescolandole all'interno di ogni gruppo: da ogni gruppo si prende la quota di test
+        classes, class_codes, class_sizes = np.unique(self.y, return_inverse=True, return_counts=True)
+        order = np.argsort(keys + class_codes, axis=1)
+
+        #Quote di test per classe proporzionali alla frequenza (metodo dei resti più grandi)
+        quotas = class_sizes * n_test / n
+        class_test = np.floor(quotas).astype(int)
+        class_test[np.argsort(class_test - quotas)[:n_test - class_test.sum()]] += 1
+
+        class_starts = np.concatenate(([0], np.cumsum(class_sizes)[:-1]))
+        positions = np.concatenate([np.arange(start, start + size) for start, size in zip(class_starts, class_test)])
+        return order[:, positions]
+
+    def _repeated_splits(self, n_repeats, test_size, seed, n_jobs, stratified, filename, description):
+
+        test_sets = list(self._shuffle_split_indices(n_repeats, test_size, seed, stratified))
+        n_jobs = self.n_jobs if n_jobs is None else n_jobs
+        results, y_true, y_pred, y_scores = self._evaluate_splits(test_sets, n_jobs)
+
+        #Media e deviazione standard delle metriche sulle ripetizioni
+        keys = [key for key in results[0] if key != "fold"]
+        mean_metrics = {key: np.mean([d[key] for d in results]) for key in keys}
+        std_metrics = {key: np.std([d[key] for d in results], ddof=1) if len(results) > 1 else 0.0 for key in keys}
+        mean_metrics["fold"] = "Mean"
+        std_metrics["fold"] = "Std"
+        results_df = pd.DataFrame(results + [mean_metrics, std_metrics])
+
+        self._report(results_df, y_true, y_pred, y_scores, filename, description)
+
+        return results_df
+
+    def random_subsampling(self, n_repeats=100, test_size=0.2, seed=None, n_jobs=None):
+
+        #Esegue il Random Subsampling: n_repeats split casuali indipendenti in training e test.
+
+        #:param n_repeats: Numero di ripetizioni.
+        #:param test_size: Frazione (0 < test_size < 1) o numero di righe di test.
+        #:param seed: Seme del generatore casuale.
+        #:param n_jobs: Numero di processi (default: quello della validazione).
+        #:return: DataFrame con le metriche di ogni ripetizione, la media e la deviazione standard.
+
+        return self._repeated_splits(n_repeats, test_size, seed, n_jobs, False, "random_subsampling_results.csv",
+                                     "del Random Subsampling")
+
+    def stratified_shuffle_split(self, n_repeats=100, test_size=0.2, seed=None, n_jobs=None):
+
+        #Esegue lo Stratified Shuffle Split: come il Random Subsampling, ma ogni test set mantiene
+        #la proporzione delle classi del dataset.
+
+        #:param n_repeats: Numero di ripetizioni.
+        #:param test_size: Frazione (0 < test_size < 1) o numero di righe di test.
+        #:param seed: Seme del generatore casuale.
+        #:param n_jobs: Numero di processi (default: quello della validazione).
+        #:return: DataFrame con le metriche di ogni ripetizione, la media e la deviazione standard.
 
-        return results_df
\ No newline at end of file
+        return self._repeated_splits(n_repeats, test_size, seed, n_jobs, True,
+                                     "stratified_shuffle_split_results.csv", "dello Stratified Shuffle Split")
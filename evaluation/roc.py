@@ -0,0 +1,50 @@
+import numpy as np
+
+#Modulo per la curva ROC e l'AUC calcolate dai punteggi probabilistici.
+#I punteggi vengono ordinati una sola volta: i conteggi cumulativi di veri e falsi positivi alle soglie
+#distinte danno tutti i punti della curva in O(n log n), e l'area sotto la curva è esatta anche in
+#presenza di punteggi uguali (equivalente alla statistica di Mann-Whitney).
+
+def roc_curve(y_true, y_scores, positive_label=1):
+
+    #Calcola i punti della curva ROC, uno per ogni soglia distinta.
+
+    #:param y_true: Etichette reali.
+    #:param y_scores: Punteggi della classe positiva (più alti = più probabilmente positivi).
+    #:param positive_label: Etichetta della classe positiva.
+    #:return: (fpr, tpr, soglie); il primo punto è (0, 0) con soglia +inf, l'ultimo è (1, 1).
+
+    y_true = np.asarray(y_true).ravel()
+    y_scores = np.asarray(y_scores, dtype=float).ravel()
+
+    #Ordinamento decrescente dei punteggi, eseguito una sola volta
+    order = np.argsort(y_scores, kind="stable")[::-1]
+    sorted_scores = y_scores[order]
+    is_positive = y_true[order] == positive_label
+
+    #Ultima posizione di ogni gruppo di punteggi uguali: i pareggi producono un solo punto
+    last_of_group = np.flatnonzero(np.diff(sorted_scores, append=-np.inf))
+
+    tps = np.cumsum(is_positive)[last_of_group]
+    fps = (last_of_group + 1) - tps
+    positives, negatives = is_positive.sum(), len(is_positive) - is_positive.sum()
+
+    with np.errstate(divide="ignore", invalid="ignore"):
+        tpr = np.concatenate(([0.0], tps / positives))
+        fpr = np.concatenate(([0.0], fps / negatives))
+    thresholds = np.concatenate(([np.inf], sorted_scores[last_of_group]))
+
+    return fpr, tpr, thresholds
+
+def roc_auc(y_true, y_scores, positive_label=1):
+
+    #Calcola l'area esatta sotto la curva ROC (i pareggi contano 1/2, come in Mann-Whitney).
+
+    #:return: AUC in [0, 1], oppure NaN se manca una delle due classi.
+
+    fpr, tpr, _ = roc_curve(y_true, y_scores, positive_label)
+    if len(fpr) < 2 or np.isnan(fpr[-1]) or np.isnan(tpr[-1]):
+        return np.nan
+
+    #Regola del trapezio sui punti della curva: i segmenti tra soglie distinte contano i pareggi a metà
+    return float(np.sum(np.diff(fpr) * (tpr[1:] + tpr[:-1]) / 2))
@@ -1,13 +1,58 @@
+import os
 import numpy as np
-import matplotlib.pyplot as plt
+from concurrent.futures import ThreadPoolExecutor
+from evaluation.roc import roc_curve, roc_auc
 
 #Modulo di Visualizzazione (Confusion Matrix & ROC Curve)
-def plot_confusion_matrix(y_true, y_pred):
+#Matplotlib viene importato solo quando un grafico viene effettivamente prodotto. In modalità "headless"
+#le figure vengono create direttamente sul backend Agg, senza pyplot né finestre, e salvate su file:
+#non richiedono un display e possono essere disegnate anche in un thread in background.
+
+#Modalità di disegno: "show" (salva e mostra), "headless" (salva soltanto), "off" (nessun grafico)
+PLOT_MODES = ("show", "headless", "off")
+
+#Worker unico per i grafici in background, creato al primo utilizzo
+_plot_executor = None
+
+def _new_figure(show):
+
+    #Crea una nuova figura: con pyplot se deve essere mostrata, altrimenti sul backend Agg.
+
+    #:param show: Se True, la figura viene gestita da pyplot per poter essere mostrata.
+    #:return: Figura matplotlib.
+
+    if show:
+        import matplotlib.pyplot as plt
+        return plt.figure()
+
+    from matplotlib.figure import Figure
+    from matplotlib.backends.backend_agg import FigureCanvasAgg
+    figure = Figure()
+    FigureCanvasAgg(figure)
+    return figure
+
+def _finish_figure(figure, path, show):
+
+    #Salva la figura ed eventualmente la mostra, poi la chiude.
+
+    #:param path: Percorso dell'immagine da salvare.
+    #:param show: Se True, mostra la figura con pyplot.
+
+    figure.savefig(path) #Salva l'immagine nella cartella dei risultati
+
+    if show:
+        import matplotlib.pyplot as plt
+        plt.show() #Mostra il grafico
+        plt.close(figure) #Chiude la figura per evitare sovrapposizioni
+
+def plot_confusion_matrix(y_true, y_pred, show=True, output_dir="result"):
 
     #Genera e visualizza la matrice di confusione.
-    
+
     #:param y_true: Valori reali delle classi.
     #:param y_pred: Valori predetti dal modello.
+    #:param show: Se False, la figura viene solo salvata (backend Agg, nessun display richiesto).
+    #:param output_dir: Cartella in cui salvare l'immagine.
 
     cm = np.zeros((2, 2), dtype=int) #Matrice 2x2 con rispettivamente i valori di: TN, FP, FN, TP
     cm[0, 0] = np.sum((y_true == 2) & (y_pred == 2))  #TN
@@ -16,57 +61,54 @@ def plot_confusion_matrix(y_true, y_pred):
     cm[1, 1] = np.sum((y_true == 4) & (y_pred == 4))  #TP
 
     #Visualizzazione matrice di confusione
-    plt.matshow(cm, cmap=plt.cm.Blues)
+    figure = _new_figure(show)
+    axes = figure.add_subplot()
+    image = axes.matshow(cm, cmap="Blues")
     for (i, j), val in np.ndenumerate(cm):
-        plt.text(j, i, f"{val}", ha='center', va='center', color='black')
-    
-    plt.xlabel("Predetto")
-    plt.ylabel("Reale")
-    plt.title("Matrice di Confusione")
-    plt.colorbar()
-
-    plt.savefig("result/confusion_matrix.png") #Salve l'immagine in /result
+        axes.text(j, i, f"{val}", ha='center', va='center', color='black')
 
+    axes.set_xlabel("Predetto")
+    axes.set_ylabel("Reale")
+    axes.set_title("Matrice di Confusione")
+    figure.colorbar(image)
 
-    plt.show() #Mostra la matrice di confusione
+    _finish_figure(figure, os.path.join(output_dir, "confusion_matrix.png"), show)
 
-    plt.close() #Chiude la figura per evitare sovrapposizioni
-
-def plot_auc(y_true, y_scores):
+def plot_auc(y_true, y_scores, show=True, output_dir="result"):
 
     #Genera e visualizza la curva ROC-AUC basata su punteggi probabilistici.
-    
+
     #:param y_true: Etichette reali binarie (0, 1).
     #:param y_scores: Probabilità di previsione per la classe positiva.
-    #Ordinamento delle coppie (y_scores, y_true) per FPR e TPR
-    
-    # Ordinamento delle coppie (y_scores, y_true) per FPR e TPR
-    thresholds = np.sort(y_scores)[::-1]  #Ordinamento decrescente
-    fpr_values = []
-    tpr_values = []
-    
-    for threshold in thresholds:
-        y_pred_thresh = (y_scores >= threshold).astype(int)  # Classifica in base alla soglia
-        fpr = np.sum((y_true == 0) & (y_pred_thresh == 1)) / np.sum(y_true == 0)
-        tpr = np.sum((y_true == 1) & (y_pred_thresh == 1)) / np.sum(y_true == 1)
-        
-        fpr_values.append(fpr)
-        tpr_values.append(tpr)
-
-    # AUC approssimato con il metodo del trapezio
-    auc_score = np.trapz(tpr_values, fpr_values)
+    #:param show: Se False, la figura viene solo salvata (backend Agg, nessun display richiesto).
+    #:param output_dir: Cartella in cui salvare l'immagine.
+
+    # Punti della curva alle soglie distinte e AUC esatta, con un solo ordinamento dei punteggi
+    fpr_values, tpr_values, _ = roc_curve(y_true, y_scores)
+    auc_score = roc_auc(y_true, y_scores)
 
     # Plot della Curva ROC
-    plt.figure()
-    plt.plot([0, 1], [0, 1], linestyle="--", label="Random")  # Linea casuale
-    plt.plot(fpr_values, tpr_values, marker="o", label=f"AUC = {auc_score:.2f}")
-    
-    plt.xlabel("False Positive Rate (FPR)")
-    plt.ylabel("True Positive Rate (TPR)")
-    plt.title("Curva ROC-AUC")
-    plt.legend()
-    plt.savefig("result/roc_auc_curve.png") #Salve l'immagine in /result
-
-    plt.show() #Mostra la matrice di confusione
-
-    plt.close() #Chiude la figura per evitare sovrapposizioni
\ No newline at end of file
+    figure = _new_figure(show)
+    axes = figure.add_subplot()
+    axes.plot([0, 1], [0, 1], linestyle="--", label="Random")  # Linea casuale
+    axes.plot(fpr_values, tpr_values, marker="o", label=f"AUC = {auc_score:.2f}")
+
+    axes.set_xlabel("False Positive Rate (FPR)")
+    axes.set_ylabel("True Positive Rate (TPR)")
+    axes.set_title("Curva ROC-AUC")
+    axes.legend()
+
+    _finish_figure(figure, os.path.join(output_dir, "roc_auc_curve.png"), show)
+
+def plot_in_background(plot_function, *args, **kwargs):
+
+    #Disegna un grafico headless nel worker in background, senza bloccare il chiamante.
+    #I grafici vengono disegnati uno alla volta, nell'ordine in cui sono stati richiesti.
+
+    #:param plot_function: Funzione di disegno (plot_confusion_matrix o plot_auc).
+    #:return: Future che si completa quando l'immagine è stata salvata.
+
+    global _plot_executor
+    if _plot_executor is None:
+        _plot_executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="plot")
+    return _plot_executor.submit(plot_function, *args, show=False, **kwargs)
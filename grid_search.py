@@ -0,0 +1,283 @@
+import argparse
+import hashlib
+import os
+import pickle
+from collections import OrderedDict
+from concurrent.futures import ProcessPoolExecutor
+import numpy as np
+import pandas as pd
+from data_cleaning import SelectionFile, GestioneValMancanti
+from data_cleaning import Preprocessing, MinMaxNormalizer, StandardNormalizer
+from models import Modelling
+from evaluation import Validation
+from pipeline import CLEANING_MODES, EXCLUDED_COLUMNS, TARGET_COLUMN
+from utils import select_metrics
+
+#Ricerca a griglia su gestione dei valori mancanti × normalizzazione × k × numero di folds.
+#La pipeline è modellata come una catena di stadi (import → pulizia → normalizzazione → ricerca dei vicini
+#→ metriche): l'output di ogni stadio viene memorizzato con chiave data dai parametri dello stadio e da
+#quella dello stadio precedente, così i prefissi comuni a più combinazioni vengono calcolati una volta sola.
+#Per ogni (pulizia, normalizzazione, folds) i vicini vengono cercati una volta per fold con il k massimo
+#della griglia: tutti i k derivano dagli stessi vicini ordinati, come nel k-sweep.
+
+NORMALIZERS = {
+    "normalizzazione min-max": MinMaxNormalizer.normalize,
+    "standardizzazione": StandardNormalizer.standardize,
+}
+
+
+class StageCache:
+
+    #Memoria degli output degli stadi con politica LRU in memoria e, opzionalmente, copia su disco.
+    #Su disco ogni voce è un file pickle nominato con l'hash della chiave; oltre max_disk_entries vengono
+    #eliminati i file usati meno di recente.
+
+    def __init__(self, max_entries=32, cache_dir=None, max_disk_entries=256):
+
+        #:param max_entries: Numero massimo di output tenuti in memoria.
+        #:param cache_dir: Cartella della copia su disco (None = solo memoria).
+        #:param max_disk_entries: Numero massimo di file nella cartella della cache.
+
+        self.max_entries = max_entries
+        self.cache_dir = cache_dir
+        self.max_disk_entries = max_disk_entries
+        self._entries = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+        if cache_dir is not None:
+            os.makedirs(cache_dir, exist_ok=True)
+
+    def _path(self, key):
+        digest = hashlib.sha1(repr(key).encode("utf-8")).hexdigest()
+        return os.path.join(self.cache_dir, f"{digest}.pkl")
+
+    def _lookup(self, key):
+        self.hits += 1
+        self._entries.move_to_end(key)
+        return self._entries[key]
+
+    def lookup(self, key):
+
+        #Cerca una chiave in memoria e poi su disco.
+
+        #:return: (True, output) se presente, altrimenti (False, None).
+
+        if key in self._entries:
+            return True, self._lookup(key)
+
+        if self.cache_dir is not None and os.path.exists(self._path(key)):
+            with open(self._path(key), "rb") as cache_file:
+                stored_key, value = pickle.load(cache_file)
+            if stored_key == key:
+                os.utime(self._path(key))  #Aggiorna l'ultimo utilizzo per l'eliminazione LRU su disco
+                self.hits += 1
+                self._remember(key, value)
+                return True, value
+
+        self.misses += 1
+        return False, None
+
+    def put(self, key, value):
+
+        #Memorizza l'output di uno stadio in memoria e, se configurato, su disco.
+
+        self._remember(key, value)
+        if self.cache_dir is not None:
+            with open(self._path(key), "wb") as cache_file:
+                pickle.dump((key, value), cache_file, protocol=pickle.HIGHEST_PROTOCOL)
+            self._evict_disk()
+
+    def _remember(self, key, value):
+        self._entries[key] = value
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+
+    def _evict_disk(self):
+        files = [os.path.join(self.cache_dir, name) for name in os.listdir(self.cache_dir) if name.endswith(".pkl")]
+        if len(files) > self.max_disk_entries:
+            files.sort(key=os.path.getmtime)
+            for path in files[:len(files) - self.max_disk_entries]:
+                os.remove(path)
+
+    def memoize(self, key, compute):
+
+        #Restituisce l'output dello stadio, calcolandolo solo se non è né in memoria né su disco.
+
+        found, value = self.lookup(key)
+        if not found:
+            value = compute()
+            self.put(key, value)
+        return value
+
+
+def _search_neighbors(task):
+
+    #Stadio di ricerca dei vicini, eseguibile in un processo separato.
+
+    #:param task: (X, y, num_folds, k_max, opzioni della validazione).
+    #:return: Etichette reali e dei k_max vicini di ogni fold.
+
+    X, y, num_folds, k_max, options = task
+    validator = Validation(Modelling(model_type="knn", k=k_max, index=options["index"]), X, y,
+                           num_folds=num_folds, save_results=False, plot_mode="off", shuffle=options["shuffle"],
+                           stratified=options["stratified"], seed=options["seed"])
+    return validator.fold_neighbor_labels(k_max)
+
+
+class GridSearch:
+
+    #Ricerca a griglia memoizzata sulle combinazioni di pulizia, normalizzazione, k e numero di folds.
+
+    def __init__(self, file_path, cleaning_modes=None, normalizations=None, k_values=range(1, 16),
+                 fold_values=(5, 10), selected_metrics=None, rank_by="Accuracy", shuffle=False, stratified=False,
+                 seed=None, index="brute", n_jobs=1, cache=None):
+
+        #:param file_path: Percorso del dataset.
+        #:param cleaning_modes: Modalità di gestione dei valori mancanti (default: tutte).
+        #:param normalizations: Metodi di normalizzazione (default: entrambi).
+        #:param k_values: Valori di k da valutare.
+        #:param fold_values: Numeri di folds da valutare.
+        #:param selected_metrics: Metriche da calcolare (default: tutte).
+        #:param rank_by: Metrica usata per ordinare le combinazioni (Error_rate in ordine crescente).
+        #:param n_jobs: Numero di processi per la ricerca dei vicini (-1 = tutti i core).
+        #:param cache: StageCache condivisa tra più ricerche (default: nuova cache in memoria).
+
+        self.file_path = file_path
+        self.cleaning_modes = list(cleaning_modes or CLEANING_MODES)
+        self.normalizations = list(normalizations or NORMALIZERS)
+        self.k_values = sorted(set(int(k) for k in k_values))
+        self.fold_values = sorted(set(int(f) for f in fold_values))
+        self.selected_metrics = select_metrics(selected_metrics if selected_metrics else ["7"])
+        self.rank_by = rank_by
+        self.options = dict(shuffle=shuffle, stratified=stratified, seed=seed, index=index)
+        self.n_jobs = os.cpu_count() if n_jobs == -1 else n_jobs
+        self.cache = cache if cache is not None else StageCache()
+
+        unknown = set(self.normalizations) - set(NORMALIZERS)
+        if unknown:
+            raise ValueError(f"Normalizzazioni non supportate: {sorted(unknown)}. Usa una tra {list(NORMALIZERS)}")
+        unknown = set(self.cleaning_modes) - set(CLEANING_MODES)
+        if unknown:
+            raise ValueError(f"Modalità di pulizia non supportate: {sorted(unknown)}. Usa una tra {CLEANING_MODES}")
+        if not self.k_values or self.k_values[0] < 1:
+            raise ValueError("I valori di k devono essere interi positivi.")
+        if not self.fold_values or self.fold_values[0] < 2:
+            raise ValueError("Il numero di folds deve essere almeno 2.")
+        if rank_by not in self.selected_metrics:
+            raise ValueError(f"La metrica di ordinamento {rank_by} non è tra le metriche selezionate.")
+
+    def _import_key(self):
+        #Il file viene identificato anche da dimensione e data di modifica: se cambia, la cache non vale più
+        stat = os.stat(self.file_path)
+        return ("import", os.path.abspath(self.file_path), stat.st_size, stat.st_mtime_ns)
+
+    def _dataset(self, cleaning, normalization):
+
+        #Stadi import → pulizia → normalizzazione, ciascuno memoizzato.
+
+        #:return: (chiave dello stadio di normalizzazione, X, y).
+
+        import_key = self._import_key()
+        data = self.cache.memoize(import_key, lambda: SelectionFile.import_data(self.file_path))
+
+        clean_key = ("clean", import_key, cleaning)
+        cleaned = self.cache.memoize(clean_key, lambda: GestioneValMancanti.get_mode(cleaning, data))
+
+        def normalize():
+            scaled = NORMALIZERS[normalization](cleaned, EXCLUDED_COLUMNS)
+            X, y = Preprocessing.split_features_target(scaled, target_col=TARGET_COLUMN)
+            return np.asarray(X, dtype=float), np.asarray(y)
+
+        normalize_key = ("normalize", clean_key, normalization)
+        X, y = self.cache.memoize(normalize_key, normalize)
+        return normalize_key, X, y
+
+    def run(self, save_results=True, output_dir="result"):
+
+        #Esegue la ricerca a griglia.
+
+        #:param save_results: Se True, salva la tabella in output_dir/grid_search_results.csv.
+        #:return: DataFrame con una riga per combinazione, ordinato per rank_by (colonna "rank").
+
+        k_max = self.k_values[-1]
+        metrics_key = tuple(self.selected_metrics)
+
+        #Stadi fino alla normalizzazione (economici) e raccolta delle ricerche dei vicini mancanti
+        groups = []
+        neighbors = {}
+        pending = {}
+        for cleaning in self.cleaning_modes:
+            for normalization in self.normalizations:
+                normalize_key, X, y = self._dataset(cleaning, normalization)
+                for num_folds in self.fold_values:
+                    search_key = ("neighbors", normalize_key, num_folds, k_max, tuple(sorted(self.options.items())))
+                    groups.append((cleaning, normalization, num_folds, search_key))
+                    if search_key in neighbors or search_key in pending:
+                        continue
+                    found, fold_neighbors = self.cache.lookup(search_key)
+                    if found:
+                        neighbors[search_key] = fold_neighbors
+                    else:
+                        pending[search_key] = (X, y, num_folds, k_max, self.options)
+
+        #Stadio di ricerca dei vicini: le combinazioni mancanti vengono eseguite in parallelo
+        if pending:
+            tasks = list(pending.values())
+            if self.n_jobs > 1 and len(tasks) > 1:
+                with ProcessPoolExecutor(max_workers=min(self.n_jobs, len(tasks))) as executor:
+                    outputs = list(executor.map(_search_neighbors, tasks))
+            else:
+                outputs = [_search_neighbors(task) for task in tasks]
+            for search_key, output in zip(pending, outputs):
+                self.cache.put(search_key, output)
+                neighbors[search_key] = output
+
+        #Stadio delle metriche: tutti i k di un gruppo derivano dagli stessi vicini
+        rows = []
+        for cleaning, normalization, num_folds, search_key in groups:
+            fold_neighbors = neighbors[search_key]
+            sweep = self.cache.memoize(("metrics", search_key, metrics_key),
+                                       lambda: Validation.sweep_metrics(fold_neighbors, k_max, self.selected_metrics))
+            sweep = sweep[sweep["k"].isin(self.k_values)]
+            for record in sweep.to_dict("records"):
+                rows.append({"cleaning": cleaning, "normalization": normalization, "num_folds": num_folds,
+                             **record})
+
+        results_df = pd.DataFrame(rows)
+        ascending = self.rank_by == "Error_rate"
+        results_df = results_df.sort_values(self.rank_by, ascending=ascending, kind="stable").reset_index(drop=True)
+        results_df.insert(0, "rank", np.arange(1, len(results_df) + 1))
+
+        if save_results:
+            os.makedirs(output_dir, exist_ok=True)
+            path = os.path.join(output_dir, "grid_search_results.csv")
+            results_df.to_csv(path, index=False)
+            print(f"Risultati della ricerca a griglia salvati in {path}")
+
+        return results_df
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Ricerca a griglia memoizzata del classificatore k-NN.")
+    parser.add_argument("--file", required=True, help="Percorso del dataset.")
+    parser.add_argument("--cleaning", nargs="+", choices=CLEANING_MODES, help="Modalità di pulizia da valutare.")
+    parser.add_argument("--normalization", nargs="+", choices=list(NORMALIZERS), help="Normalizzazioni da valutare.")
+    parser.add_argument("--k", nargs="+", type=int, default=list(range(1, 16)), help="Valori di k da valutare.")
+    parser.add_argument("--folds", nargs="+", type=int, default=[5, 10], help="Numeri di folds da valutare.")
+    parser.add_argument("--metrics", help="Metriche separate da virgola (numeri del menu o nomi).")
+    parser.add_argument("--rank-by", dest="rank_by", default="Accuracy", help="Metrica di ordinamento.")
+    parser.add_argument("--n-jobs", dest="n_jobs", type=int, default=1, help="Numero di processi (-1 = tutti).")
+    parser.add_argument("--cache-dir", dest="cache_dir", help="Cartella della cache su disco degli stadi.")
+    parser.add_argument("--output-dir", dest="output_dir", default="result", help="Cartella dei risultati.")
+    args = parser.parse_args(argv)
+
+    grid = GridSearch(args.file, cleaning_modes=args.cleaning, normalizations=args.normalization, k_values=args.k,
+                      fold_values=args.folds, selected_metrics=args.metrics, rank_by=args.rank_by,
+                      n_jobs=args.n_jobs, cache=StageCache(cache_dir=args.cache_dir))
+    results_df = grid.run(output_dir=args.output_dir)
+    print(results_df.head(10).to_string(index=False))
+
+
+if __name__ == "__main__":
+    main()
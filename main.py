@@ -1,9 +1,11 @@
+import sys
 from data_cleaning import SelectionFile, DataCleaner
 from data_cleaning import Preprocessing
 from models import Modelling
 from evaluation import Validation
 from utils import get_valid_int
 from utils import select_metrics
+import pipeline
 
 def main():
     #Input dell'utente per l'import del file
@@ -52,4 +54,8 @@ def main():
     
 
 if __name__ == "__main__":
-    main()
+    #Con argomenti da riga di comando (es. --config esperimenti.json) la pipeline viene eseguita senza input
+    if len(sys.argv) > 1:
+        pipeline.main()
+    else:
+        main()
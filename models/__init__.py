@@ -1,2 +1,6 @@
 from .model_management import Modelling
-from .m_knn import KNNClassifier
\ No newline at end of file
+from .m_knn import KNNClassifier
+from .spatial_index import KDTree, BallTree
+from .distance_cache import PairwiseDistances
+from .model_artifact import ModelArtifact
+from .quantization import FeatureQuantizer, QuantizedMatrix
@@ -0,0 +1,63 @@
+import os
+import json
+import hashlib
+import numpy as np
+
+class PairwiseDistances:
+
+    # Matrice (n, n) delle distanze euclidee tra tutte le righe di un dataset, calcolata una sola volta.
+    # Un KNNClassifier costruito con distance_cache=PairwiseDistances(...) riceve in fit/predict gli
+    # indici delle righe invece delle feature, e per ogni split legge le distanze dalla matrice
+    # senza ricalcolarle. Con "path" la matrice viene salvata su disco come .npy e riaperta in
+    # memory-map dalle esecuzioni successive sullo stesso dataset (stessi valori normalizzati).
+
+    # Numero massimo di differenze (righe × n × feature) calcolate insieme durante la costruzione
+    BLOCK_ELEMENTS = 2**22
+
+    def __init__(self, X, dtype=np.float32, path=None):
+
+        # :param X: Feature del dataset (già normalizzate).
+        # :param dtype: Tipo degli elementi della matrice (float32 dimezza la memoria rispetto a float64).
+        # :param path: File .npy in cui salvare o da cui riaprire la matrice.
+
+        X = np.asarray(X, dtype=float)
+        self.digest = hashlib.sha1(np.ascontiguousarray(X).tobytes() + str(X.shape).encode()).hexdigest()
+        self.path = path
+
+        if path is not None and self._load(path, dtype):
+            return
+
+        if path is not None:
+            self.matrix = np.lib.format.open_memmap(path, mode="w+", dtype=dtype, shape=(len(X), len(X)))
+        else:
+            self.matrix = np.empty((len(X), len(X)), dtype=dtype)
+
+        # Distanza calcolata come norma della differenza, come nella ricerca esatta del KNNClassifier
+        rows = max(self.BLOCK_ELEMENTS // max(X.size, 1), 1)
+        for start in range(0, len(X), rows):
+            diff = X[start:start + rows, None, :] - X[None, :, :]
+            self.matrix[start:start + rows] = np.sqrt(np.add.reduce(diff * diff, axis=2))
+
+        if path is not None:
+            self.matrix.flush()
+            with open(self._meta_path(path), "w") as meta:
+                json.dump({"digest": self.digest, "dtype": np.dtype(dtype).str}, meta)
+            self.matrix = np.load(path, mmap_mode="r")
+
+    def __len__(self):
+        return len(self.matrix)
+
+    @staticmethod
+    def _meta_path(path):
+        return path + ".json"
+
+    def _load(self, path, dtype):
+        # Riapre una matrice già salvata solo se è stata calcolata sugli stessi dati e con lo stesso tipo.
+        if not (os.path.exists(path) and os.path.exists(self._meta_path(path))):
+            return False
+        with open(self._meta_path(path)) as meta:
+            info = json.load(meta)
+        if info.get("digest") != self.digest or info.get("dtype") != np.dtype(dtype).str:
+            return False
+        self.matrix = np.load(path, mmap_mode="r")
+        return True
@@ -1,8 +1,14 @@
+import os
+import warnings
 import numpy as np
 import pandas as pd
 import random
 from collections import Counter
 from abc import ABC, abstractmethod
+from concurrent.futures import ProcessPoolExecutor
+from models.spatial_index import KDTree, BallTree
+from models.shared_arrays import SharedArray
+from models.quantization import QuantizedMatrix
 
 class Classifier(ABC):
     
@@ -20,52 +26,447 @@ class Classifier(ABC):
         # Metodo per fare previsioni.
         pass
 
+# Modello ricostruito in ogni processo worker a partire dal training set in memoria condivisa
+_worker_state = {}
+
+def _init_worker(params, x_spec, norms_spec, tree_class, tree_nodes, quantizer=None):
+    # Collega il worker agli array condivisi del training set, chiudendo quelli di un training set precedente:
+    # il pool sopravvive ai fit del classificatore, e il worker si ricollega solo quando il training set cambia.
+    _worker_state.pop("model", None)
+    for handle in _worker_state.pop("handles", ()):
+        if handle is not None:
+            try:
+                handle.close()
+            except BufferError:
+                pass
+
+    X_train, x_handle = SharedArray.attach(x_spec)
+    train_sq_norms, norms_handle = SharedArray.attach(norms_spec)
+
+    model = KNNClassifier(**params)
+    model.X_train = X_train
+    model._train_sq_norms = train_sq_norms
+    model._quantizer = quantizer
+    if tree_class is not None:
+        model._tree = tree_class.from_nodes(tree_nodes, X_train)
+
+    _worker_state.update(model=model, handles=(x_handle, norms_handle), key=(params, x_spec, norms_spec))
+
+def _worker_kneighbors(X_chunk, k, setup):
+    # Ricerca dei vicini per una porzione delle righe di test (feature o codici già pronti).
+    # :param setup: Argomenti di _init_worker del training set corrente; il modello del worker viene
+    #               ricostruito solo se parametri o array condivisi sono cambiati dall'ultimo task.
+    if _worker_state.get("key") != setup[:3]:
+        _init_worker(*setup)
+    return _worker_state["model"]._search(X_chunk, k)
+
 class KNNClassifier:
 
     # Implementazione del classificatore k-NN (k-Nearest Neighbors) da zero.
+
+    # Numero di righe di test elaborate insieme in un unico prodotto matriciale
+    BLOCK_SIZE = 256
+
+    # Byte stimati per ogni distanza di un blocco (matrice GEMM, distanze, maschera e temporanei)
+    BYTES_PER_DISTANCE = 32
+
+    # Blocchi di default in modalità compatta: blocchi di distanze piccoli restano in cache insieme alla
+    # porzione di codici di training che li genera, e la scansione è limitata dalla CPU e non dalla memoria
+    COMPACT_BLOCK_SIZE = 128
+    COMPACT_MAX_MEMORY_MB = 16
+
+    # Indici spaziali disponibili: "brute" confronta ogni punto di test con tutto il training set
+    INDEXES = {"brute": None, "kdtree": KDTree, "balltree": BallTree}
+
+    # Precisioni disponibili per feature, distanze e punteggi
+    DTYPES = [np.float64, np.float32]
     
-    def __init__(self, k=3):
+    def __init__(self, k=3, index="brute", leaf_size=20, max_memory_mb=None, block_size=None, n_jobs=1,
+                 distance_cache=None, compact=False, dtype=np.float64):
         # Inizializza il modello con il numero di vicini k.
+        # :param index: Indice spaziale costruito in fit ('brute', 'kdtree' o 'balltree').
+        # :param leaf_size: Numero massimo di punti per foglia degli indici ad albero.
+        # :param max_memory_mb: Memoria massima (MB) per il blocco di distanze della ricerca brute-force;
+        #                       se impostata, anche il training set viene scandito a blocchi.
+        # :param block_size: Numero di righe di test per blocco (default: BLOCK_SIZE).
+        # :param n_jobs: Numero di processi per la predizione (-1 = tutti i core disponibili).
+        # :param distance_cache: PairwiseDistances precalcolata; in tal caso fit e predict ricevono
+        #                        gli indici delle righe del dataset al posto delle feature.
+        # :param compact: Se True e le feature stanno su una griglia regolare (ad esempio interi da 1 a 10,
+        #                 anche normalizzati), il training set viene memorizzato come codici uint8/int16
+        #                 (FeatureQuantizer) e le distanze vengono calcolate dai codici. Le distanze coincidono
+        #                 con quelle in float, ma i pareggi in aritmetica esatta si risolvono per indice, mentre
+        #                 in float decide l'arrotondamento: le predizioni possono differire quando il k-esimo
+        #                 vicino è a pari distanza con il successivo.
+        # :param dtype: Precisione di training set, distanze e punteggi (np.float64 o np.float32). In float32
+        #               il training set occupa metà memoria e prodotti matriciali e distanze sono in singola
+        #               precisione; Validation.precision_check misura quanto spesso cambiano i vicini.
+        if index not in self.INDEXES:
+            raise ValueError(f"Indice non supportato. Usare uno tra: {list(self.INDEXES)}")
+        if distance_cache is not None and index != "brute":
+            raise ValueError("Con una matrice delle distanze precalcolata l'indice deve essere 'brute'.")
+        if compact and (index != "brute" or distance_cache is not None):
+            raise ValueError("La rappresentazione compatta è disponibile solo per la ricerca 'brute' sulle feature.")
+        if np.dtype(dtype) not in self.DTYPES:
+            raise ValueError(f"Precisione non supportata: {dtype}. Usare np.float64 o np.float32.")
+
         self.k = k
+        self.index = index
+        self.leaf_size = leaf_size
+        self.max_memory_mb = max_memory_mb
+        self.block_size = block_size
+        self.n_jobs = n_jobs
+        self.distance_cache = distance_cache
+        self.compact = compact
+        self.dtype = np.dtype(dtype)
         self.X_train = None
         self.y_train = None
+        self._train_sq_norms = None
+        self._tree = None
+        self._shared = None
+        self._quantizer = None  # FeatureQuantizer dei codici in X_train (solo in modalità compatta)
+        self._pool = None  # Pool di processi della predizione: creato alla prima richiesta e riusato tra i fit
+        self._pool_workers = None
+
+    def __getstate__(self):
+        # Memoria condivisa e pool appartengono a questo processo: una copia serializzata usa array ordinari.
+        state = self.__dict__.copy()
+        state["_shared"] = None
+        state["_pool"] = None
+        return state
+
+    def __del__(self):
+        self.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    def close(self):
+        # Termina il pool di processi della predizione e libera la memoria condivisa del training set.
+        # Il classificatore resta utilizzabile: un nuovo predict parallelo ricrea il pool.
+        pool = getattr(self, "_pool", None)
+        if pool is not None:
+            self._pool = None
+            pool.shutdown()
+        self._release_shared()
     
     def fit(self, X, y):
         # Memorizza i dati di training.
-        self.X_train = np.array(X)
+        self._release_shared()
+
+        if self.distance_cache is not None:
+            # X contiene gli indici delle righe di training nella matrice delle distanze
+            self.X_train = np.asarray(X, dtype=np.intp).ravel()
+            self.y_train = np.array(y)
+            return
+
+        self._quantizer = None
+        if self.compact:
+            # Codici interi: ricevuti già quantizzati (da Validation) oppure calcolati qui senza perdita
+            quantized = X if isinstance(X, QuantizedMatrix) else QuantizedMatrix.from_array(X)
+            if quantized is not None:
+                self.X_train, self._quantizer = quantized.codes, quantized.quantizer
+                self.y_train = np.array(y)
+                self._train_sq_norms = self._quantizer.squared_norms(self.X_train)
+                self._tree = None
+                return
+            # Un avviso e non un print: ripetuto a ogni fit (ad esempio a ogni fold) viene mostrato una volta sola
+            warnings.warn(f"Le feature non stanno su una griglia regolare: uso la rappresentazione {self.dtype}.")
+
+        self.X_train = np.array(X, dtype=self.dtype)
         self.y_train = np.array(y)
+        # Norme al quadrato dei punti di training: calcolate una sola volta e riusate da ogni predict
+        self._train_sq_norms = np.einsum("ij,ij->i", self.X_train, self.X_train)
+
+        # L'eventuale indice ad albero viene costruito una sola volta qui e riusato da ogni predict
+        tree_class = self.INDEXES[self.index]
+        self._tree = tree_class(self.X_train, leaf_size=self.leaf_size) if tree_class is not None else None
     
     def predict(self, X_test):
         """
         Effettua previsioni su un insieme di test.
         Restituisce sia le classi predette che i punteggi di probabilità.
         """
-        X_test = np.array(X_test)
-        predictions = []
-        probabilities = []
+        _, k_indices = self.kneighbors(X_test)
 
-        for x in X_test:
-            pred, prob = self._predict_single(x)
-            predictions.append(pred)
-            probabilities.append(prob)
+        # Ottiene le etichette dei k vicini di ogni riga di test
+        predicted_class, positive_fraction = self.vote(self.y_train[k_indices], self.k)
+        return predicted_class, positive_fraction.astype(self.dtype, copy=False)
+
+    @staticmethod
+    def vote(k_nearest_labels, k):
+        # Voto a maggioranza su una matrice (n_test, k) di etichette dei vicini.
+        # :return: (classi predette, frazione di vicini maligni) per ogni riga.
 
-        return np.array(predictions), np.array(probabilities)
-    
-    def _predict_single(self, x):
-
-        # Calcola la distanza euclidea tra x e tutti i punti del training set
-        distances = np.linalg.norm(self.X_train-x, axis=1) #QUI DA UN ERORRE PERCHè NON HA ANCORA I DATI PROCESSATI
-        
-        # Trova gli indici dei k vicini più vicini andando a prendere i primi k elementi dell'array k_indices
-        k_indices = np.argsort(distances)[:self.k]
-        
-        # Ottiene le etichette dei k vicini
-        k_nearest_labels = self.y_train[k_indices]
-        
         # Calcoliamo la frazione di vicini appartenenti alla classe "4" (maligno)
-        positive_fraction = np.sum(k_nearest_labels == 4) / self.k
+        positive_fraction = np.sum(k_nearest_labels == 4, axis=1) / k
 
         # Se la frazione è ≥ 0.5, prevediamo "4" (maligno), altrimenti "2" (benigno)
-        predicted_class = 4 if positive_fraction >= 0.5 else 2
+        predicted_class = np.where(positive_fraction >= 0.5, 4, 2)
+
+        return predicted_class, positive_fraction
+
+    @staticmethod
+    def sweep_votes(k_nearest_labels, k_max):
+        # Voto a maggioranza per ogni k da 1 a k_max a partire da una sola ricerca dei vicini.
+        # :param k_nearest_labels: Etichette dei vicini (n_test, ≤ k_max), ordinate per distanza.
+        # :return: (classi predette, frazione di vicini maligni) di forma (n_test, k_max): la colonna
+        #          k-1 coincide con il risultato di vote() sui primi k vicini.
+
+        # Conteggi cumulativi dei vicini maligni: la colonna k-1 conta i maligni tra i primi k
+        positive_counts = np.cumsum(k_nearest_labels == 4, axis=1)
+
+        # Se il training set ha meno di k_max punti, i k successivi vedono gli stessi vicini
+        missing = k_max - positive_counts.shape[1]
+        if missing > 0:
+            positive_counts = np.hstack((positive_counts, np.repeat(positive_counts[:, -1:], missing, axis=1)))
+
+        positive_fraction = positive_counts / np.arange(1, k_max + 1)
+        predicted_class = np.where(positive_fraction >= 0.5, 4, 2)
+
+        return predicted_class, positive_fraction
+
+    def kneighbors(self, X_test, k=None):
+        # Trova i k vicini più vicini di ogni riga di X_test, elaborando le righe a blocchi.
+        # :param X_test: Dati di test (feature).
+        # :param k: Numero di vicini (default: self.k).
+        # :return: (distanze, indici) di forma (n_test, k), ordinati per distanza crescente;
+        #          a parità di distanza viene prima il punto di training con indice minore.
+
+        k = self.k if k is None else k
+        if self.distance_cache is not None:
+            return self._kneighbors_precomputed(np.asarray(X_test, dtype=np.intp).ravel(), min(k, len(self.X_train)))
+
+        k = min(k, len(self.X_train))
+        if self._quantizer is None:
+            return self._search(np.asarray(X_test, dtype=self.dtype).reshape(-1, self.X_train.shape[1]), k)
+
+        # Modalità compatta: le righe di test vengono cercate come codici dello stesso quantizzatore
+        if isinstance(X_test, QuantizedMatrix) and X_test.quantizer is self._quantizer:
+            return self._search(X_test.codes, k)
+        X_test = np.asarray(X_test, dtype=float).reshape(-1, self.X_train.shape[1])
+        codes, exact = self._quantizer.encode(X_test)
+        if exact.all():
+            return self._search(codes, k)
+
+        # Righe fuori dalla griglia del training set: cercate sulle feature decodificate
+        distances = np.empty((len(X_test), k))
+        indices = np.empty((len(X_test), k), dtype=np.intp)
+        distances[exact], indices[exact] = self._search(codes[exact], k)
+        fallback = KNNClassifier(k=k, max_memory_mb=self.max_memory_mb, block_size=self.block_size,
+                                 dtype=self.dtype)
+        fallback.fit(self._quantizer.decode(self.X_train), self.y_train)
+        distances[~exact], indices[~exact] = fallback.kneighbors(X_test[~exact], k)
+        return distances, indices
+
+    def _search(self, X_test, k):
+        # Ricerca dei k vicini di righe già pronte per il modello: feature nel tipo del modello, oppure
+        # codici interi in modalità compatta (con distanze in float64).
+
+        n_jobs = os.cpu_count() if self.n_jobs == -1 else self.n_jobs
+        if n_jobs > 1 and len(X_test) > self.BLOCK_SIZE:
+            return self._parallel_kneighbors(X_test, k, n_jobs)
+
+        if self._tree is not None:
+            return self._tree.query(X_test, k)
+
+        dtype = self.dtype if self._quantizer is None else np.dtype(float)
+        distances = np.empty((len(X_test), k), dtype=dtype)
+        indices = np.empty((len(X_test), k), dtype=np.intp)
+        test_rows, train_rows = self._block_shape()
+
+        for start in range(0, len(X_test), test_rows):
+            X_block = X_test[start:start + test_rows]
+
+            # Top-k corrente di ogni riga del blocco, aggiornato un blocco di training alla volta
+            best_dist = np.full((len(X_block), k), np.inf, dtype=dtype)
+            best_idx = np.full((len(X_block), k), -1, dtype=np.intp)
+
+            for train_start in range(0, len(self.X_train), train_rows):
+                block_dist, block_idx = self._kneighbors_block(X_block, k, train_start, train_start + train_rows)
+                best_dist, best_idx = self._merge_neighbors(best_dist, best_idx, block_dist, block_idx, k)
+
+            distances[start:start + test_rows] = best_dist
+            indices[start:start + test_rows] = best_idx
+
+        return distances, indices
+
+    def _parallel_kneighbors(self, X_test, k, n_jobs):
+        # Divide le righe di test tra n_jobs processi. Il training set viene copiato in memoria
+        # condivisa una sola volta per fit e i worker vi si collegano al primo task che lo usa: a ogni
+        # task vengono inviati solo la porzione di test e la descrizione degli array condivisi.
+        # Il pool resta attivo tra un fit e l'altro (ad esempio tra i fold di una validazione) finché
+        # non viene chiamato close(). I risultati tornano nell'ordine originale delle righe.
+        # Se il training set è già mappato da file (modello caricato da un artefatto) i worker
+        # riaprono direttamente i file, senza alcuna copia.
+        file_specs = [SharedArray.file_spec(self.X_train), SharedArray.file_spec(self._train_sq_norms)]
+        if None not in file_specs:
+            x_spec, norms_spec = file_specs
+        else:
+            if self._shared is None:
+                self._share_training_set()
+            x_spec, norms_spec = self._shared[0].spec, self._shared[1].spec
+
+        params = dict(k=self.k, index=self.index, leaf_size=self.leaf_size,
+                      max_memory_mb=self.max_memory_mb, block_size=self.block_size, compact=self.compact,
+                      dtype=self.dtype)
+        tree_class = type(self._tree) if self._tree is not None else None
+        tree_nodes = self._tree.nodes() if self._tree is not None else None
+        setup = (params, x_spec, norms_spec, tree_class, tree_nodes, self._quantizer)
+
+        if self._pool is not None and self._pool_workers != n_jobs:
+            self._pool.shutdown()
+            self._pool = None
+        if self._pool is None:
+            self._pool, self._pool_workers = ProcessPoolExecutor(max_workers=n_jobs), n_jobs
+
+        chunks = np.array_split(X_test, min(4 * n_jobs, len(X_test)))
+        results = list(self._pool.map(_worker_kneighbors, chunks, [k] * len(chunks), [setup] * len(chunks)))
+
+        return np.vstack([dist for dist, _ in results]), np.vstack([idx for _, idx in results])
+
+    def _share_training_set(self):
+        # Sposta X_train e le sue norme in memoria condivisa; il modello continua a usarle tramite viste.
+        self._shared = [SharedArray(self.X_train), SharedArray(self._train_sq_norms)]
+        self.X_train = self._shared[0].array
+        self._train_sq_norms = self._shared[1].array
+        if self._tree is not None:
+            self._tree.data = self.X_train
+
+    def _release_shared(self):
+        # Libera la memoria condivisa riportando il training set in array ordinari.
+        if getattr(self, "_shared", None) is None:
+            return
+        self.X_train = np.array(self.X_train)
+        self._train_sq_norms = np.array(self._train_sq_norms)
+        if self._tree is not None:
+            self._tree.data = self.X_train
+        for shared in self._shared:
+            shared.release()
+        self._shared = None
+
+    def _block_shape(self):
+        # Numero di righe di test e di training per blocco. Con max_memory_mb la matrice delle distanze
+        # di un blocco non supera il budget, qualunque sia la dimensione dei dati.
+        test_rows = self.block_size or self.BLOCK_SIZE
+        max_memory_mb = self.max_memory_mb
+        if self._quantizer is not None:
+            test_rows = self.block_size or self.COMPACT_BLOCK_SIZE
+            max_memory_mb = max_memory_mb or self.COMPACT_MAX_MEMORY_MB
+        if max_memory_mb is None:
+            return test_rows, len(self.X_train)
+
+        elements = max(int(max_memory_mb * 2**20 / self.BYTES_PER_DISTANCE), 1)
+        test_rows = min(test_rows, elements)
+        return test_rows, min(max(elements // test_rows, 1), len(self.X_train))
+
+    @staticmethod
+    def _merge_neighbors(best_dist, best_idx, new_dist, new_idx, k):
+        # Unisce due liste di vicini riga per riga e tiene i primi k per (distanza, indice).
+        cand_dist = np.concatenate((best_dist, new_dist), axis=1)
+        cand_idx = np.concatenate((best_idx, new_idx), axis=1)
+        order = np.lexsort((cand_idx, cand_dist), axis=1)[:, :k]
+        return np.take_along_axis(cand_dist, order, axis=1), np.take_along_axis(cand_idx, order, axis=1)
+
+    def _kneighbors_block(self, X_block, k, train_start, train_stop):
+        # Vicini di un blocco di test all'interno della porzione [train_start, train_stop) del training set.
+        if self._quantizer is not None:
+            return self._compact_kneighbors_block(X_block, k, train_start, train_stop)
+
+        X_train = self.X_train[train_start:train_stop]
+        train_sq_norms = self._train_sq_norms[train_start:train_stop]
+        k = min(k, len(X_train))
+
+        # Distanze al quadrato approssimate con la formulazione ||a||² + ||b||² − 2ab (un solo GEMM, nel tipo
+        # del modello: in float32 anche margine e distanze esatte seguono la singola precisione)
+        block_sq_norms = np.einsum("ij,ij->i", X_block, X_block)
+        approx = block_sq_norms[:, None] + train_sq_norms[None, :] - 2.0 * (X_block @ X_train.T)
+
+        # Margine che copre l'errore di arrotondamento della formulazione GEMM rispetto alla
+        # distanza calcolata come norma della differenza
+        eps = np.finfo(approx.dtype).eps
+        tol = 4 * (X_block.shape[1] + 2) * eps * (block_sq_norms + train_sq_norms.max())
+
+        # Selezione parziale: il k-esimo valore più piccolo di ogni riga senza ordinare tutto l'array
+        kth = np.partition(approx, k - 1, axis=1)[:, k - 1]
+        rows, cols = np.nonzero(approx <= (kth + 2 * tol)[:, None])
+        del approx
+
+        # Sui soli candidati calcoliamo la distanza euclidea esatta, identica a np.linalg.norm
+        diff = X_block[rows] - X_train[cols]
+        exact = np.sqrt(np.add.reduce(diff * diff, axis=1))
+
+        block_dist, block_idx = self._top_k_candidates(rows, cols, exact, k)
+        return block_dist, block_idx + train_start
+
+    def _compact_kneighbors_block(self, codes_block, k, train_start, train_stop):
+        # Come _kneighbors_block, ma sui codici interi: la selezione dei candidati usa un GEMM in float32
+        # sui codici e la distanza esatta dei candidati viene dai quadrati delle differenze dei codici,
+        # sommati in aritmetica intera. Con il kernel intero il GEMM dà già le somme esatte.
+        quantizer = self._quantizer
+        train_codes = self.X_train[train_start:train_stop]
+        train_sq_norms = self._train_sq_norms[train_start:train_stop]
+        k = min(k, len(train_codes))
+
+        block = codes_block.astype(np.float32)
+        block_sq_norms = (block * block) @ quantizer.gemm_weights
+        products = (block * quantizer.gemm_weights) @ train_codes.T.astype(np.float32)
+        approx = block_sq_norms[:, None] + train_sq_norms[None, :] - 2.0 * products
+        del products
+
+        if quantizer.integer_kernel:
+            sums = np.rint(approx).astype(np.int32)
+            del approx
+            rows, cols = np.nonzero(sums <= self._kth_by_counting(sums, k)[:, None])
+            exact = np.sqrt(sums[rows, cols] * quantizer.weights[0])
+        else:
+            eps = np.finfo(np.float32).eps
+            tol = 4 * (codes_block.shape[1] + 2) * eps * (block_sq_norms + train_sq_norms.max())
+            kth = np.partition(approx, k - 1, axis=1)[:, k - 1]
+            rows, cols = np.nonzero(approx <= (kth + 2 * tol)[:, None])
+            del approx
+            exact = np.sqrt(quantizer.squared_distances(codes_block[rows], train_codes[cols]))
+
+        block_dist, block_idx = self._top_k_candidates(rows, cols, exact, k)
+        return block_dist, block_idx + train_start
+
+    @staticmethod
+    def _kth_by_counting(sums, k):
+        # k-esimo valore più piccolo di ogni riga di una matrice di interi non negativi, trovato contando
+        # le occorrenze di ogni valore (un solo bincount) invece che con una selezione parziale.
+        # Se i valori possibili sono troppi rispetto alla matrice si usa np.partition.
+        limit = int(sums.max()) + 1
+        if len(sums) * limit > sums.size:
+            return np.partition(sums, k - 1, axis=1)[:, k - 1]
+        offsets = (np.arange(len(sums), dtype=np.int64) * limit)[:, None]
+        counts = np.bincount((sums + offsets).ravel(), minlength=len(sums) * limit).reshape(len(sums), limit)
+        return np.argmax(np.cumsum(counts, axis=1) >= k, axis=1)
+
+    def _kneighbors_precomputed(self, test_indices, k):
+        # Vicini letti dalla matrice delle distanze precalcolata, senza calcolare nuove distanze.
+        matrix = self.distance_cache.matrix
+        distances = np.empty((len(test_indices), k), dtype=matrix.dtype)
+        indices = np.empty((len(test_indices), k), dtype=np.intp)
+        test_rows, _ = self._block_shape()
+
+        for start in range(0, len(test_indices), test_rows):
+            block = matrix[test_indices[start:start + test_rows]][:, self.X_train]
+            kth = np.partition(block, k - 1, axis=1)[:, k - 1]
+            rows, cols = np.nonzero(block <= kth[:, None])
+            distances[start:start + test_rows], indices[start:start + test_rows] = \
+                self._top_k_candidates(rows, cols, block[rows, cols], k)
+
+        return distances, indices
+
+    @staticmethod
+    def _top_k_candidates(rows, cols, dist, k):
+        # Ordina i candidati per riga, distanza e indice di training e tiene i primi k di ogni riga.
+        order = np.lexsort((cols, dist, rows))
+        rows, cols, dist = rows[order], cols[order], dist[order]
+        rank = np.arange(len(rows)) - np.searchsorted(rows, rows)
+        keep = rank < k
 
-        return predicted_class, positive_fraction
\ No newline at end of file
+        return dist[keep].reshape(-1, k), cols[keep].reshape(-1, k)
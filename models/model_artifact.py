@@ -0,0 +1,142 @@
+import os
+import json
+import numpy as np
+import pandas as pd
+from models.m_knn import KNNClassifier
+from models.model_management import Modelling
+from models.quantization import FeatureQuantizer
+from data_cleaning.data_normalizer import Normalizer
+
+class ModelArtifact:
+
+    # Modello k-NN addestrato salvato su disco, pronto per l'inferenza senza ripetere import, pulizia,
+    # normalizzazione e fit. L'artefatto è una cartella con un'intestazione JSON (parametri del modello,
+    # ordine delle feature, parametri del normalizzatore, forma e tipo di ogni array) e un file .npy
+    # per ogni array: training set (o i suoi codici interi in modalità compatta), etichette, norme al quadrato
+    # ed eventuale indice ad albero.
+    # Al caricamento gli array vengono aperti in memory-map: l'avvio non legge i dati e più processi
+    # che caricano lo stesso artefatto condividono le stesse pagine tramite la cache del sistema operativo.
+
+    # Versione del formato, registrata nell'intestazione
+    FORMAT_VERSION = 1
+
+    HEADER_FILE = "header.json"
+
+    def __init__(self, model, feature_columns=None, normalizer=None):
+
+        # :param model: Modelling (o KNNClassifier) già addestrato.
+        # :param feature_columns: Ordine delle colonne delle feature usato in fit.
+        # :param normalizer: Normalizzatore (data_cleaning.Normalizer) da applicare ai nuovi dati grezzi.
+
+        self.model = model if isinstance(model, Modelling) else self._wrap(model)
+        self.feature_columns = list(feature_columns) if feature_columns is not None else None
+        self.normalizer = normalizer
+
+    @staticmethod
+    def _wrap(knn):
+        # Modelling attorno a un KNNClassifier esistente, senza ricrearlo.
+        modelling = Modelling.__new__(Modelling)
+        modelling.model = knn
+        return modelling
+
+    def save(self, path):
+
+        # Salva l'artefatto nella cartella indicata (creata se non esiste).
+        # :param path: Cartella di destinazione.
+
+        knn = self.model.get_model()
+        if knn.X_train is None:
+            raise ValueError("Il modello deve essere addestrato prima di essere salvato.")
+        if knn.distance_cache is not None:
+            raise ValueError("Un modello basato su una matrice delle distanze precalcolata non può essere salvato.")
+
+        os.makedirs(path, exist_ok=True)
+        arrays = {"X_train": knn.X_train, "y_train": knn.y_train, "train_sq_norms": knn._train_sq_norms}
+        tree_scalars = {}
+        if knn._tree is not None:
+            for name, value in knn._tree.nodes().items():
+                if isinstance(value, np.ndarray):
+                    arrays[f"tree_{name}"] = value
+                else:
+                    tree_scalars[name] = value
+
+        array_info = {}
+        for name, array in arrays.items():
+            array = np.ascontiguousarray(array)
+            np.save(os.path.join(path, f"{name}.npy"), array)
+            array_info[name] = {"dtype": array.dtype.str, "shape": list(array.shape)}
+
+        header = {
+            "format_version": self.FORMAT_VERSION,
+            "model_type": "knn",
+            "params": dict(k=knn.k, index=knn.index, leaf_size=knn.leaf_size, max_memory_mb=knn.max_memory_mb,
+                           block_size=knn.block_size, n_jobs=knn.n_jobs, compact=knn.compact,
+                           dtype=knn.dtype.name),
+            "feature_columns": self.feature_columns,
+            "normalizer": self.normalizer.to_dict() if self.normalizer is not None else None,
+            "tree": tree_scalars if knn._tree is not None else None,
+            "quantizer": knn._quantizer.to_dict() if knn._quantizer is not None else None,
+            "arrays": array_info,
+        }
+        # L'intestazione viene scritta per ultima: la sua presenza indica un artefatto completo
+        with open(os.path.join(path, self.HEADER_FILE), "w", encoding="utf-8") as header_file:
+            json.dump(header, header_file, indent=2)
+
+    @staticmethod
+    def load(path, mmap=True):
+
+        # Carica un artefatto salvato con save.
+        # :param path: Cartella dell'artefatto.
+        # :param mmap: Se True gli array vengono aperti in memory-map (sola lettura), altrimenti letti in memoria.
+        # :return: ModelArtifact con il modello pronto per predict.
+
+        with open(os.path.join(path, ModelArtifact.HEADER_FILE), encoding="utf-8") as header_file:
+            header = json.load(header_file)
+        if header.get("format_version") != ModelArtifact.FORMAT_VERSION or header.get("model_type") != "knn":
+            raise ValueError(f"Formato dell'artefatto non supportato: {path}")
+
+        arrays = {}
+        for name, info in header["arrays"].items():
+            array = np.load(os.path.join(path, f"{name}.npy"), mmap_mode="r" if mmap else None)
+            if array.dtype.str != info["dtype"] or list(array.shape) != info["shape"]:
+                raise ValueError(f"L'array {name} dell'artefatto non corrisponde all'intestazione.")
+            arrays[name] = array
+
+        knn = KNNClassifier(**header["params"])
+        knn.X_train = arrays["X_train"]
+        knn.y_train = arrays["y_train"]
+        knn._train_sq_norms = arrays["train_sq_norms"]
+        if header.get("quantizer") is not None:
+            knn._quantizer = FeatureQuantizer.from_dict(header["quantizer"])
+        if header["tree"] is not None:
+            nodes = dict(header["tree"])
+            nodes.update({name[len("tree_"):]: array for name, array in arrays.items() if name.startswith("tree_")})
+            knn._tree = KNNClassifier.INDEXES[knn.index].from_nodes(nodes, knn.X_train)
+
+        normalizer = Normalizer.from_dict(header["normalizer"]) if header["normalizer"] is not None else None
+        return ModelArtifact(knn, header["feature_columns"], normalizer)
+
+    def _features(self, data):
+
+        # Prepara i nuovi dati per il modello: normalizzazione con i parametri salvati e ordine delle feature.
+        # Un DataFrame viene riordinato secondo feature_columns; una matrice deve essere già in quell'ordine.
+
+        if isinstance(data, pd.DataFrame):
+            if self.normalizer is not None:
+                data = self.normalizer.transform(data)
+            if self.feature_columns is not None:
+                missing = [column for column in self.feature_columns if column not in data.columns]
+                if missing:
+                    raise ValueError(f"Colonne mancanti nei dati da classificare: {missing}")
+                data = data[self.feature_columns]
+            return data.to_numpy(dtype=float)
+
+        X = np.asarray(data, dtype=float)
+        return self.normalizer.transform(X) if self.normalizer is not None else X
+
+    def predict(self, data):
+
+        # Classifica nuovi dati grezzi (DataFrame o matrice) con il modello salvato.
+        # :return: (classi predette, probabilità della classe maligna).
+
+        return self.model.predict(self._features(data))
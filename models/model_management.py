@@ -5,14 +5,24 @@ class Modelling:
     # Classe che gestisce la creazione, l'addestramento e la predizione di modelli di machine learning.
     # Permette di astrarre il processo di training e inferenza dal tipo di modello specifico.
 
-    def __init__(self, model_type="knn", k=3):
+    def __init__(self, model_type="knn", k=3, index="brute", max_memory_mb=None, block_size=None, n_jobs=1,
+                 distance_cache=None, compact=False, dtype=np.float64):
       
         # Inizializza il gestore del modello con il tipo di modello specificato.
         # :param model_type: Tipo di modello (attualmente supporta solo 'knn').
         # :param k: Numero di vicini da considerare nel k-NN.
+        # :param index: Indice per la ricerca dei vicini ('brute', 'kdtree' o 'balltree').
+        # :param max_memory_mb: Memoria massima (MB) per i blocchi di distanze della ricerca brute-force.
+        # :param block_size: Numero di righe di test elaborate per blocco.
+        # :param n_jobs: Numero di processi per la predizione (-1 = tutti i core disponibili).
+        # :param distance_cache: PairwiseDistances precalcolata sul dataset da validare.
+        # :param compact: Se True, le feature su una griglia regolare vengono memorizzate come codici uint8/int16.
+        # :param dtype: Precisione di feature, distanze e punteggi del modello (np.float64 o np.float32).
 
         if model_type == "knn":
-            self.model = KNNClassifier(k=k)
+            self.model = KNNClassifier(k=k, index=index, max_memory_mb=max_memory_mb, block_size=block_size,
+                                       n_jobs=n_jobs, distance_cache=distance_cache, compact=compact,
+                                       dtype=dtype)
         else:
             raise ValueError("Modello non supportato. Attualmente disponibile solo k-NN.")
 
@@ -38,3 +48,11 @@ class Modelling:
         # :return: Oggetto del modello usato.
         
         return self.model
+
+    def close(self):
+
+        # Libera le risorse del modello (pool di processi e memoria condivisa della predizione parallela).
+
+        close = getattr(self.model, "close", None)
+        if close is not None:
+            close()
@@ -0,0 +1,173 @@
+import numpy as np
+
+class FeatureQuantizer:
+
+    # Quantizzazione senza perdita delle feature che assumono valori su una griglia regolare, come le feature
+    # citologiche intere da 1 a 10 (anche dopo la normalizzazione, che ne cambia solo scala e origine).
+    # Ogni colonna j viene rappresentata dai codici interi q = (x - offset[j]) / scale[j], salvati in uint8
+    # (fino a 256 livelli) o int16 (fino a 32768 livelli): 1 o 2 byte per valore invece degli 8 di float64.
+    # La distanza al quadrato tra due righe è sum_j scale[j]² * (qa_j - qb_j)²: le colonne con lo stesso passo
+    # formano un gruppo, i quadrati delle differenze si sommano in aritmetica intera dentro ogni gruppo e solo
+    # le somme dei gruppi vengono pesate in float. Con un solo passo comune (il caso delle feature citologiche)
+    # distanze uguali in aritmetica esatta restano uguali, e i pareggi si risolvono sempre per indice.
+    # In quel caso, con codici uint8, anche il prodotto matriciale in float32 sui codici è esatto
+    # (integer_kernel): anche i termini intermedi, cioè la somma delle due norme al quadrato (fino a
+    # 2 * d * 255²), restano interi rappresentabili esattamente in float32 (sotto 2**24).
+    # La ricerca in float sulle stesse feature può invece separare per arrotondamento due distanze uguali:
+    # la quantizzazione non perde valori, ma tra vicini a pari distanza può scegliere righe (e quindi
+    # predizioni) diverse da quelle della ricerca in float.
+
+    # Scostamento massimo, in frazioni del passo della griglia, perché un valore conti come punto della griglia
+    TOLERANCE = 1e-6
+
+    DTYPES = [np.uint8, np.int16]
+
+    def __init__(self, offset, scale, dtype):
+
+        # :param offset: Origine della griglia di ogni colonna.
+        # :param scale: Passo della griglia di ogni colonna.
+        # :param dtype: Tipo intero dei codici (np.uint8 o np.int16).
+
+        self.offset = np.asarray(offset, dtype=float)
+        self.scale = np.asarray(scale, dtype=float)
+        self.dtype = np.dtype(dtype)
+        self.weights = self.scale ** 2
+        # Colonne ordinate per passo e inizio di ogni gruppo di colonne con lo stesso passo
+        self._order = np.argsort(self.scale, kind="stable")
+        self._starts = np.flatnonzero(np.r_[True, np.diff(self.scale[self._order]) != 0])
+        self._group_weights = self.weights[self._order][self._starts]
+        # Se i pesi dei gruppi sono multipli interi del più piccolo (passi come 1, 2, 5 volte il minimo)
+        # anche la somma pesata dei gruppi resta intera, e i pareggi restano esatti con passi diversi
+        ratios = np.rint(self._group_weights / self._group_weights[0])
+        self._integer_ratios = (ratios.astype(np.int64)
+                                if np.allclose(ratios * self._group_weights[0], self._group_weights,
+                                               rtol=self.TOLERANCE, atol=0) else None)
+
+        self.integer_kernel = (len(self._starts) == 1 and self.dtype == np.uint8
+                               and 2 * len(self.scale) * 255 ** 2 < 2 ** 24)
+        # Pesi delle colonne nel prodotto matriciale: unitari con il kernel intero (il passo comune si applica
+        # solo alla distanza finale), altrimenti i quadrati dei passi
+        self.gemm_weights = (np.ones_like(self.scale) if self.integer_kernel else self.weights).astype(np.float32)
+
+    @staticmethod
+    def fit(X, max_levels=2 ** 15):
+
+        # Cerca la griglia di ogni colonna.
+        # :param X: Matrice delle feature (righe x colonne).
+        # :return: FeatureQuantizer, oppure None se qualche colonna non sta senza perdita su una griglia
+        #          di al più max_levels livelli (valori mancanti, valori continui, intervalli troppo ampi).
+
+        X = np.asarray(X, dtype=float)
+        if X.ndim != 2 or len(X) == 0 or not np.isfinite(X).all():
+            return None
+
+        offset = X.min(axis=0)
+        scale = np.ones(X.shape[1])
+        levels = 1
+        for j in range(X.shape[1]):
+            values = np.unique(X[:, j]) - offset[j]
+            if len(values) < 2:
+                continue
+            codes = np.rint(values / np.diff(values).min())
+            if codes[-1] >= max_levels:
+                return None
+            # Passo stimato ai minimi quadrati su tutti i livelli, più preciso della sola differenza minima
+            step = codes @ values / (codes @ codes)
+            if np.abs(codes * step - values).max() > FeatureQuantizer.TOLERANCE * step:
+                return None
+            scale[j] = step
+            levels = max(levels, int(codes[-1]) + 1)
+
+        # Passi uguali a meno dell'arrotondamento della stima diventano identici (stesso gruppo)
+        order = np.argsort(scale, kind="stable")
+        for previous, current in zip(order[:-1], order[1:]):
+            if scale[current] - scale[previous] <= FeatureQuantizer.TOLERANCE * 1e-3 * scale[current]:
+                scale[current] = scale[previous]
+
+        dtype = next(dtype for dtype in FeatureQuantizer.DTYPES if levels <= np.iinfo(dtype).max + 1)
+        return FeatureQuantizer(offset, scale, dtype)
+
+    def encode(self, X):
+
+        # Codici interi delle righe di X.
+        # :return: (codici, maschera delle righe rappresentate senza perdita). Le righe fuori dalla griglia
+        #          o dall'intervallo del tipo intero hanno codici non significativi.
+
+        X = np.asarray(X, dtype=float)
+        codes = np.rint((X - self.offset) / self.scale)
+        limits = np.iinfo(self.dtype)
+        exact = ((np.abs(self.offset + codes * self.scale - X) <= self.TOLERANCE * self.scale)
+                 & (codes >= limits.min) & (codes <= limits.max)).all(axis=1)
+        codes[~exact] = 0
+        return codes.astype(self.dtype), exact
+
+    def decode(self, codes):
+
+        # Valori float64 corrispondenti ai codici.
+
+        return self.offset + np.asarray(codes, dtype=float) * self.scale
+
+    def squared_distances(self, codes_a, codes_b):
+
+        # Distanze al quadrato tra coppie di righe (codes_a[i], codes_b[i]).
+
+        diff = codes_a.astype(np.int64) - codes_b.astype(np.int64)
+        group_sums = np.add.reduceat((diff * diff)[:, self._order], self._starts, axis=1)
+        if self._integer_ratios is not None:
+            return (group_sums @ self._integer_ratios) * self._group_weights[0]
+        return group_sums @ self._group_weights
+
+    def squared_norms(self, codes):
+
+        # Norme al quadrato dei codici pesate con gemm_weights (in float32, come la ricerca per blocchi).
+
+        codes = codes.astype(np.float32)
+        return (codes * codes) @ self.gemm_weights
+
+    def to_dict(self):
+        return {"offset": self.offset.tolist(), "scale": self.scale.tolist(), "dtype": self.dtype.str}
+
+    @staticmethod
+    def from_dict(params):
+        return FeatureQuantizer(params["offset"], params["scale"], params["dtype"])
+
+
+class QuantizedMatrix:
+
+    # Matrice di feature già quantizzata: i codici interi e il quantizzatore che li interpreta.
+    # Si comporta come una matrice per righe (len, shape, indicizzazione): Validation la usa al posto
+    # della matrice float64 e KNNClassifier la riceve in fit e kneighbors senza riconvertirla.
+    # np.asarray ne restituisce i valori decodificati in float64.
+
+    def __init__(self, codes, quantizer):
+        self.codes = codes
+        self.quantizer = quantizer
+
+    @staticmethod
+    def from_array(X):
+
+        # :return: QuantizedMatrix di X, oppure None se X non è quantizzabile senza perdita.
+
+        quantizer = FeatureQuantizer.fit(X)
+        if quantizer is None:
+            return None
+        codes, _ = quantizer.encode(X)
+        return QuantizedMatrix(codes, quantizer)
+
+    @property
+    def shape(self):
+        return self.codes.shape
+
+    @property
+    def nbytes(self):
+        return self.codes.nbytes
+
+    def __len__(self):
+        return len(self.codes)
+
+    def __getitem__(self, rows):
+        return QuantizedMatrix(self.codes[rows], self.quantizer)
+
+    def __array__(self, dtype=None, copy=None):
+        values = self.quantizer.decode(self.codes)
+        return values if dtype is None else values.astype(dtype)
@@ -0,0 +1,64 @@
+import mmap
+import numpy as np
+from multiprocessing import shared_memory
+
+class SharedArray:
+
+    # Array NumPy allocato in memoria condivisa (multiprocessing.shared_memory).
+    # Il processo che lo crea ne è il proprietario; i processi worker vi si collegano tramite "spec"
+    # (nome del blocco, forma e tipo), senza che l'array venga serializzato per ogni task.
+
+    def __init__(self, array):
+
+        # Copia l'array in un nuovo blocco di memoria condivisa.
+        # :param array: Array da condividere.
+
+        array = np.asarray(array)
+        self._shm = shared_memory.SharedMemory(create=True, size=max(array.nbytes, 1))
+        self.array = np.ndarray(array.shape, dtype=array.dtype, buffer=self._shm.buf)
+        self.array[...] = array
+        self.spec = (self._shm.name, array.shape, array.dtype.str)
+
+    def release(self):
+
+        # Rilascia il blocco condiviso. Se esistono ancora viste sull'array il blocco resta mappato
+        # finché non vengono liberate, ma il nome viene comunque rimosso dal sistema.
+
+        if self._shm is None:
+            return
+        self.array = None
+        try:
+            self._shm.close()
+        except BufferError:
+            pass
+        self._shm.unlink()
+        self._shm = None
+
+    @staticmethod
+    def attach(spec):
+
+        # Collega un processo worker a un array condiviso.
+        # :param spec: Tupla (nome, forma, dtype) ottenuta da SharedArray.spec.
+        # :return: (array, handle) — l'handle va mantenuto in vita finché si usa l'array.
+
+        if spec[0] == "file":
+            # Array mappato da file: il worker riapre lo stesso file in sola lettura
+            _, path, offset, shape, dtype = spec
+            return np.memmap(path, dtype=np.dtype(dtype), mode="r", offset=offset, shape=shape), None
+
+        name, shape, dtype = spec
+        shm = shared_memory.SharedMemory(name=name)
+        return np.ndarray(shape, dtype=np.dtype(dtype), buffer=shm.buf), shm
+
+    @staticmethod
+    def file_spec(array):
+
+        # Spec di un array aperto in memory-map da un file (np.load con mmap_mode). I worker riaprono
+        # lo stesso file e condividono le pagine tramite la cache del sistema operativo, senza copie.
+        # :return: Spec ("file", percorso, offset, forma, dtype) da passare ad attach, oppure None se
+        #          l'array non è l'intero contenuto di un file mappato.
+
+        if (isinstance(array, np.memmap) and isinstance(array.base, mmap.mmap) and array.filename
+                and array.flags.c_contiguous):
+            return ("file", array.filename, array.offset, array.shape, array.dtype.str)
+        return None
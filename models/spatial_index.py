@@ -0,0 +1,246 @@
+import numpy as np
+
+class BinaryTree:
+
+    # Classe base per gli indici spaziali ad albero binario (KD-tree e ball tree).
+    # L'albero viene costruito una sola volta sui dati di training e memorizzato in array piatti:
+    # ogni nodo copre l'intervallo idx_array[start:end] dei punti, e le foglie contengono al più leaf_size punti.
+    # Le classi derivate definiscono come si calcolano i limiti di un nodo e la distanza minima da un punto.
+
+    # Tolleranza relativa sul limite inferiore, così che gli arrotondamenti non escludano mai un vicino esatto
+    # (in float32 viene allargata in proporzione alla precisione del tipo)
+    _SLACK = 1e-9
+
+    # Righe di test visitate insieme: le coppie (riga, nodo) di ogni livello vengono valutate in blocco
+    QUERY_BLOCK = 128
+
+    # Numero massimo di coppie (riga, punto) di cui calcolare insieme le distanze esatte dei candidati
+    PAIR_CHUNK = 2 ** 18
+
+    # Il limite superiore iniziale di ogni riga viene dai punti di un nodo con almeno START_LEAVES foglie piene:
+    # più punti danno un limite più stretto e quindi più nodi scartati
+    START_LEAVES = 4
+
+    def __init__(self, data, leaf_size=20):
+
+        # Costruisce l'albero sui dati forniti.
+        # :param data: Matrice (n, d) dei punti di training; i dati float32 restano in float32.
+        # :param leaf_size: Numero massimo di punti in una foglia.
+
+        if leaf_size < 1:
+            raise ValueError("leaf_size deve essere un intero positivo.")
+
+        data = np.asarray(data)
+        self.data = data if data.dtype in (np.float32, np.float64) else data.astype(float)
+        self._slack = float(max(self._SLACK, 64 * np.finfo(self.data.dtype).eps))
+        self.leaf_size = leaf_size
+        self.idx_array = np.arange(len(self.data))
+
+        starts, ends, lefts, rights, bounds = [], [], [], [], []
+        stack = [(0, len(self.data), None, None)]
+
+        while stack:
+            start, end, parent, side = stack.pop()
+            node = len(starts)
+            if parent is not None:
+                (lefts if side == 0 else rights)[parent] = node
+
+            points = self.data[self.idx_array[start:end]]
+            starts.append(start)
+            ends.append(end)
+            lefts.append(-1)
+            rights.append(-1)
+            bounds.append(self._node_bounds(points))
+
+            if end - start > self.leaf_size:
+                # Divide il nodo a metà lungo la dimensione con la maggiore estensione
+                dim = np.argmax(points.max(axis=0) - points.min(axis=0))
+                mid = (end - start) // 2
+                order = np.argpartition(points[:, dim], mid)
+                self.idx_array[start:end] = self.idx_array[start:end][order]
+                stack.append((start + mid, end, node, 1))
+                stack.append((start, start + mid, node, 0))
+
+        self.node_start = np.array(starts)
+        self.node_end = np.array(ends)
+        self.node_left = np.array(lefts)
+        self.node_right = np.array(rights)
+        self._store_bounds(bounds)
+
+    def nodes(self):
+        # Struttura dell'albero senza i punti, da inviare ai processi che hanno già accesso ai dati.
+        return {name: value for name, value in vars(self).items() if name != "data"}
+
+    @classmethod
+    def from_nodes(cls, nodes, data):
+        # Ricostruisce l'albero dalla struttura restituita da nodes() e dai dati originali.
+        tree = cls.__new__(cls)
+        vars(tree).update(nodes)
+        vars(tree).setdefault("_slack", cls._SLACK)  # Strutture salvate prima della tolleranza per tipo
+        tree.data = data
+        return tree
+
+    def _node_bounds(self, points):
+        # Calcola i limiti geometrici dei punti di un nodo.
+        raise NotImplementedError
+
+    def _store_bounds(self, bounds):
+        # Memorizza i limiti di tutti i nodi in array.
+        raise NotImplementedError
+
+    def _min_dist(self, nodes, X):
+        # Limite inferiore della distanza tra ogni riga X[i] e qualsiasi punto del nodo nodes[i].
+        raise NotImplementedError
+
+    def _descent_dist(self, nodes, X):
+        # Distanza usata per scegliere il figlio verso cui scendere nella ricerca del nodo di partenza.
+        return self._min_dist(nodes, X)
+
+    def query(self, X, k):
+
+        # Trova i k vicini più vicini di ogni riga di X.
+        # :return: (distanze, indici) di forma (n, k), ordinati per distanza crescente e,
+        #          a parità di distanza, per indice crescente (come la ricerca brute-force).
+
+        X = np.asarray(X, dtype=self.data.dtype).reshape(-1, self.data.shape[1])
+        k = min(k, len(self.data))
+
+        distances = np.empty((len(X), k), dtype=self.data.dtype)
+        indices = np.empty((len(X), k), dtype=np.intp)
+        for start in range(0, len(X), self.QUERY_BLOCK):
+            stop = start + self.QUERY_BLOCK
+            distances[start:stop], indices[start:stop] = self._query_block(X[start:stop], k)
+
+        return distances, indices
+
+    def _query_block(self, X, k):
+
+        # Ricerca per un blocco di righe, senza cicli sulle singole righe né sui singoli nodi.
+        # 1) Limite superiore della k-esima distanza di ogni riga: distanze esatte dai punti del nodo più
+        #    profondo che, scendendo verso il figlio più vicino, contiene ancora abbastanza punti.
+        upper = self._kth_distance(X, self._descend(X, max(k, self.START_LEAVES * self.leaf_size)), k)
+
+        # 2) Visita per livelli delle coppie (riga, nodo): un nodo viene scartato per una riga se il suo
+        #    limite inferiore supera il limite superiore della riga, con poche operazioni per livello.
+        pair_rows, pair_nodes = np.arange(len(X)), np.zeros(len(X), dtype=np.intp)
+        leaf_rows, leaf_nodes = [], []
+        while len(pair_rows):
+            lower = self._min_dist(pair_nodes, X[pair_rows])
+            keep = lower * (1 - self._slack) <= upper[pair_rows]
+            pair_rows, pair_nodes = pair_rows[keep], pair_nodes[keep]
+
+            leaf = self.node_left[pair_nodes] == -1
+            leaf_rows.append(pair_rows[leaf])
+            leaf_nodes.append(pair_nodes[leaf])
+            pair_rows, pair_nodes = pair_rows[~leaf], pair_nodes[~leaf]
+            pair_rows = np.repeat(pair_rows, 2)
+            pair_nodes = np.column_stack((self.node_left[pair_nodes], self.node_right[pair_nodes])).ravel()
+
+        # 3) Distanze esatte dai punti delle foglie rimaste, con la stessa aritmetica della ricerca
+        #    brute-force: restano i punti non più lontani del limite superiore, tra cui i k vicini
+        rows, points, dist = self._candidates(X, np.concatenate(leaf_rows), np.concatenate(leaf_nodes), upper)
+
+        order = np.lexsort((points, dist, rows))
+        rows, points, dist = rows[order], points[order], dist[order]
+        keep = np.arange(len(rows)) - np.searchsorted(rows, rows) < k
+        return dist[keep].reshape(-1, k), points[keep].reshape(-1, k)
+
+    def _descend(self, X, size):
+
+        # Nodo di partenza di ogni riga: si scende verso il figlio più vicino finché contiene almeno size punti.
+
+        nodes = np.zeros(len(X), dtype=np.intp)
+        active = np.flatnonzero(self.node_left[nodes] != -1)
+        while len(active):
+            left, right = self.node_left[nodes[active]], self.node_right[nodes[active]]
+            closer = np.where(self._descent_dist(left, X[active]) <= self._descent_dist(right, X[active]),
+                              left, right)
+            deeper = self.node_end[closer] - self.node_start[closer] >= size
+            nodes[active[deeper]] = closer[deeper]
+            active = active[deeper]
+            active = active[self.node_left[nodes[active]] != -1]
+        return nodes
+
+    def _kth_distance(self, X, nodes, k):
+
+        # k-esima distanza esatta di ogni riga X[i] dai punti del nodo nodes[i] (che ne contiene almeno k).
+
+        rows, points = self._node_points(np.arange(len(X)), nodes)
+        dist = self._pair_distances(X, rows, points)
+        order = np.lexsort((dist, rows))
+        first = np.searchsorted(rows[order], np.arange(len(X)))
+        return dist[order][first + k - 1]
+
+    def _candidates(self, X, rows, nodes, upper):
+
+        # Coppie (riga, punto) dei nodi indicati con distanza esatta entro il limite superiore della riga.
+        # Le coppie vengono espanse a gruppi di PAIR_CHUNK punti, così la memoria resta limitata anche
+        # quando la potatura scarta pochi nodi.
+
+        lengths = self.node_end[nodes] - self.node_start[nodes]
+        bounds = np.searchsorted(np.cumsum(lengths), np.arange(self.PAIR_CHUNK, lengths.sum(), self.PAIR_CHUNK))
+        results = []
+        for chunk in np.split(np.arange(len(nodes)), np.unique(bounds)):
+            chunk_rows, points = self._node_points(rows[chunk], nodes[chunk])
+            dist = self._pair_distances(X, chunk_rows, points)
+            within = dist <= upper[chunk_rows]
+            results.append((chunk_rows[within], points[within], dist[within]))
+
+        return tuple(np.concatenate(parts) for parts in zip(*results))
+
+    def _node_points(self, rows, nodes):
+
+        # Coppie (riga, punto) per ogni punto di ogni nodo indicato.
+
+        starts = self.node_start[nodes]
+        lengths = self.node_end[nodes] - starts
+        positions = np.repeat(starts - (np.cumsum(lengths) - lengths), lengths) + np.arange(lengths.sum())
+        return np.repeat(rows, lengths), self.idx_array[positions]
+
+    def _pair_distances(self, X, rows, points):
+
+        # Distanze euclidee esatte tra le coppie (X[rows[i]], data[points[i]]).
+
+        diff = X[rows] - self.data[points]
+        return np.sqrt(np.add.reduce(diff * diff, axis=1))
+
+class KDTree(BinaryTree):
+
+    # KD-tree: ogni nodo è delimitato dal box allineato agli assi che contiene i suoi punti.
+
+    def _node_bounds(self, points):
+        return points.min(axis=0), points.max(axis=0)
+
+    def _store_bounds(self, bounds):
+        self.node_lower = np.array([lower for lower, _ in bounds])
+        self.node_upper = np.array([upper for _, upper in bounds])
+
+    def _min_dist(self, nodes, X):
+        gap = np.maximum(self.node_lower[nodes] - X, 0) + np.maximum(X - self.node_upper[nodes], 0)
+        return np.sqrt(np.einsum("ij,ij->i", gap, gap))
+
+class BallTree(BinaryTree):
+
+    # Ball tree: ogni nodo è delimitato dalla sfera centrata nel baricentro dei suoi punti.
+
+    def _node_bounds(self, points):
+        center = points.mean(axis=0)
+        radius = np.sqrt(np.max(np.sum((points - center) ** 2, axis=1)))
+        return center, radius
+
+    def _store_bounds(self, bounds):
+        self.node_center = np.array([center for center, _ in bounds])
+        self.node_radius = np.array([radius for _, radius in bounds])
+
+    def _min_dist(self, nodes, X):
+        diff = X - self.node_center[nodes]
+        dist = np.sqrt(np.einsum("ij,ij->i", diff, diff))
+        radius = self.node_radius[nodes]
+        # La differenza tra due distanze può perdere precisione: il margine resta proporzionale ai termini
+        return np.maximum(dist - radius - self._slack * (dist + radius), 0.0)
+
+    def _descent_dist(self, nodes, X):
+        # Le sfere dei due figli si sovrappongono e il limite inferiore è spesso nullo per entrambi:
+        # si scende verso il baricentro più vicino
+        diff = X - self.node_center[nodes]
+        return np.einsum("ij,ij->i", diff, diff)
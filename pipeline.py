@@ -0,0 +1,312 @@
+import argparse
+import json
+import os
+from data_cleaning import SelectionFile, ImportCache, DataCleaner, StreamingCleaner, SaveDB
+from data_cleaning import Preprocessing, MinMaxNormalizer, StandardNormalizer
+from models import Modelling, ModelArtifact
+from evaluation import Validation
+from utils import get_valid_int
+from utils import select_metrics
+
+#Esecuzione non interattiva della pipeline, guidata da argomenti da riga di comando o da un file di
+#configurazione JSON/YAML. Una configurazione può contenere più esecuzioni ("runs"), eseguite in sequenza
+#nello stesso processo: ogni dataset viene importato e pulito una sola volta e riutilizzato da tutte le
+#esecuzioni che lo richiedono.
+
+#Valori di default di ogni esecuzione
+DEFAULT_RUN = {
+    "name": None,
+    "file": None,
+    "cleaning": "media",
+    "save_cleaned": None,  #Nome del file in data/cleaned (None = non salvare)
+    "import_cache": None,  #Cartella della cache colonnare dei dataset importati (None = disattivata)
+    "dedup_by_id": False,  #Se True, 'Sample code number' fa parte della chiave dei duplicati
+    "chunksize": None,  #Se indicato, il file viene letto e pulito a blocchi di chunksize righe
+    "normalization": "normalizzazione min-max",
+    "save_scaled": None,  #Nome del file in data/scaled (None = non salvare)
+    "fold_normalization": False,  #Se True, il normalizzatore viene addestrato sul training di ogni fold
+    "k": 3,
+    "index": "brute",
+    "compact": False,  #Se True, le feature su una griglia regolare vengono memorizzate come codici uint8/int16
+    "dtype": "float64",  #Precisione di feature, distanze e punteggi ("float64" o "float32")
+    "num_folds": 5,
+    "metrics": "7",
+    "validation": "k_fold_cross_validation",
+    "validation_params": {},
+    "shuffle": False,
+    "stratified": False,
+    "seed": None,
+    "n_jobs": 1,  #Processi della validazione, che eseguono i fold in parallelo (-1 = tutti i core)
+    "model_jobs": 1,  #Processi della predizione del modello; il parallelismo è su un solo livello
+    "plot_mode": "headless",
+    "output_dir": "result",
+    "model_path": None,  #Cartella in cui salvare il modello addestrato sull'intero dataset (None = non salvare)
+}
+
+CLEANING_MODES = ["rimozione", "media", "moda", "mediana", "knn"]
+NORMALIZATION_METHODS = ["normalizzazione min-max", "standardizzazione", "nessuna"]
+VALIDATION_METHODS = ["k_fold_cross_validation", "leave_one_out", "leave_p_out", "k_sweep", "bootstrap",
+                      "random_subsampling", "stratified_shuffle_split", "precision_check"]
+DTYPES = ["float64", "float32"]
+
+FOLD_NORMALIZERS = {"normalizzazione min-max": MinMaxNormalizer, "standardizzazione": StandardNormalizer}
+
+EXCLUDED_COLUMNS = ['Sample code number', 'classtype_v1']
+TARGET_COLUMN = 'classtype_v1'
+
+
+class PipelineRunner:
+
+    #Esegue una o più configurazioni della pipeline senza alcun input dell'utente.
+    #I dataset puliti e normalizzati vengono memorizzati per (file, pulizia[, normalizzazione]),
+    #così le esecuzioni che condividono il dataset non lo reimportano.
+
+    def __init__(self):
+        self._cleaned = {}
+        self._scaled = {}
+
+    @staticmethod
+    def load_config(path):
+
+        #Legge un file di configurazione JSON o YAML.
+        #Il file può contenere una lista di esecuzioni oppure un dizionario con le impostazioni comuni
+        #e, opzionalmente, la lista "runs" delle esecuzioni che le sovrascrivono.
+
+        #:param path: Percorso del file (.json, .yaml o .yml).
+        #:return: Lista delle configurazioni complete, una per esecuzione.
+
+        with open(path, encoding="utf-8") as config_file:
+            if path.endswith((".yaml", ".yml")):
+                try:
+                    import yaml
+                except ImportError:
+                    raise ImportError("Per le configurazioni YAML è necessario il pacchetto PyYAML "
+                                      "(pip install pyyaml); in alternativa usa un file JSON.")
+                config = yaml.safe_load(config_file)
+            elif path.endswith(".json"):
+                config = json.load(config_file)
+            else:
+                raise ValueError("Formato di configurazione non supportato. Usa un file .json, .yaml o .yml")
+
+        return PipelineRunner.expand_config(config)
+
+    @staticmethod
+    def expand_config(config):
+
+        #Completa una configurazione con i valori di default e la valida.
+
+        #:param config: Dizionario (eventualmente con la lista "runs") o lista di esecuzioni.
+        #:return: Lista delle configurazioni complete, una per esecuzione.
+
+        if isinstance(config, list):
+            config = {"runs": config}
+        config = dict(config)
+        runs = config.pop("runs", None) or [{}]
+
+        expanded = []
+        for i, run in enumerate(runs):
+            unknown = (set(config) | set(run)) - set(DEFAULT_RUN)
+            if unknown:
+                raise ValueError(f"Opzioni di configurazione sconosciute: {sorted(unknown)}")
+
+            run_config = {**DEFAULT_RUN, **config, **run}
+            if run_config["name"] is None:
+                run_config["name"] = f"run_{i + 1}"
+            expanded.append(PipelineRunner._validate(run_config))
+        return expanded
+
+    @staticmethod
+    def _validate(config):
+
+        #Controlla una configurazione prima dell'esecuzione, così gli errori emergono subito e non
+        #dopo le esecuzioni precedenti.
+
+        if not config["file"]:
+            raise ValueError(f"[{config['name']}] Manca il percorso del dataset ('file').")
+        SelectionFile.get_importer(config["file"])  #Verifica che il formato sia supportato
+
+        config["cleaning"] = config["cleaning"].strip().lower()
+        if config["cleaning"] not in CLEANING_MODES:
+            raise ValueError(f"[{config['name']}] Modalità di pulizia non supportata: {config['cleaning']}. "
+                             f"Usa una tra {CLEANING_MODES}")
+
+        config["normalization"] = config["normalization"].strip().lower()
+        if config["normalization"] not in NORMALIZATION_METHODS:
+            raise ValueError(f"[{config['name']}] Normalizzazione non supportata: {config['normalization']}. "
+                             f"Usa una tra {NORMALIZATION_METHODS}")
+
+        if config["validation"] not in VALIDATION_METHODS:
+            raise ValueError(f"[{config['name']}] Validazione non supportata: {config['validation']}. "
+                             f"Usa una tra {VALIDATION_METHODS}")
+
+        if config["dtype"] not in DTYPES:
+            raise ValueError(f"[{config['name']}] Precisione non supportata: {config['dtype']}. Usa una tra {DTYPES}")
+
+        config["k"] = get_valid_int(None, min_value=1, value=config["k"])
+        config["num_folds"] = get_valid_int(None, min_value=2, value=config["num_folds"])
+        if config["chunksize"] is not None:
+            config["chunksize"] = get_valid_int(None, min_value=1, value=config["chunksize"])
+            if config["cleaning"] == "knn":
+                raise ValueError(f"[{config['name']}] La pulizia knn non è disponibile con la lettura a blocchi "
+                                 f"('chunksize').")
+        #Fold paralleli e predizione parallela insieme aprirebbero un pool di processi in ogni worker
+        if all(config[option] == -1 or config[option] > 1 for option in ["n_jobs", "model_jobs"]):
+            raise ValueError(f"[{config['name']}] Il parallelismo va scelto su un solo livello: 'n_jobs' "
+                             f"(fold della validazione) oppure 'model_jobs' (predizione del modello).")
+        config["metrics"] = select_metrics(config["metrics"])
+        return config
+
+    def cleaned_dataset(self, config):
+
+        #Restituisce il dataset importato e pulito, calcolandolo solo alla prima richiesta.
+
+        key = (os.path.abspath(config["file"]), config["cleaning"], config["dedup_by_id"])
+        if key not in self._cleaned and config["chunksize"] is not None:
+            #Pulizia a blocchi: in memoria resta solo il dataset pulito, con colonne float32
+            cleaner = StreamingCleaner(config["chunksize"], include_id=config["dedup_by_id"])
+            data = cleaner.clean(config["file"], config["cleaning"])
+            if data.empty:
+                raise ValueError(f"Il dataset {config['file']} è vuoto dopo la pulizia.")
+            SaveDB.save_dataset(data, save=config["save_cleaned"] is not None,
+                                output_filename=config["save_cleaned"])
+            self._cleaned[key] = data
+        elif key not in self._cleaned:
+            cache = ImportCache(config["import_cache"]) if config["import_cache"] else None
+            data = SelectionFile.import_data(config["file"], cache=cache)
+            if data.empty:
+                raise ValueError(f"Il dataset {config['file']} è vuoto.")
+            self._cleaned[key] = DataCleaner.clean_and_save(data, mode=config["cleaning"],
+                                                            save=config["save_cleaned"] is not None,
+                                                            output_filename=config["save_cleaned"],
+                                                            include_id=config["dedup_by_id"],
+                                                            raise_errors=True)
+        return self._cleaned[key]
+
+    def scaled_dataset(self, config):
+
+        #Restituisce il dataset pulito e normalizzato, calcolandolo solo alla prima richiesta.
+
+        #Con la normalizzazione per fold il dataset resta quello pulito: la normalizza la validazione
+        normalization = "nessuna" if config["fold_normalization"] else config["normalization"]
+        key = (os.path.abspath(config["file"]), config["cleaning"], config["dedup_by_id"], normalization)
+        if key not in self._scaled:
+            cleaned_data = self.cleaned_dataset(config)
+            if normalization == "nessuna":
+                data_scaled = cleaned_data
+            else:
+                data_scaled = Preprocessing.get_normalizer(cleaned_data, exclude_col=EXCLUDED_COLUMNS,
+                                                           method=normalization)
+            self._scaled[key] = Preprocessing.save_dataset(data_scaled, save=config["save_scaled"] is not None,
+                                                           output_filename=config["save_scaled"])
+        return self._scaled[key]
+
+    def run(self, config):
+
+        #Esegue una singola configurazione.
+
+        #:param config: Configurazione completa (vedi expand_config).
+        #:return: DataFrame con i risultati della validazione.
+
+        print(f"\n=== Esecuzione {config['name']} ===")
+        X, y = Preprocessing.split_features_target(self.scaled_dataset(config), target_col=TARGET_COLUMN,
+                                                   dtype=config["dtype"])
+
+        normalizer = None
+        if config["fold_normalization"] and config["normalization"] != "nessuna":
+            normalizer = FOLD_NORMALIZERS[config["normalization"]]()
+
+        model_m = Modelling(model_type="knn", k=config["k"], index=config["index"], n_jobs=config["model_jobs"],
+                            compact=config["compact"], dtype=config["dtype"])
+        validator = Validation(classifier=model_m, X=X, y=y, num_folds=config["num_folds"],
+                               selected_metrics=config["metrics"], n_jobs=config["n_jobs"],
+                               shuffle=config["shuffle"], stratified=config["stratified"], seed=config["seed"],
+                               plot_mode=config["plot_mode"], output_dir=config["output_dir"],
+                               normalizer=normalizer)
+
+        results_df = getattr(validator, config["validation"])(**config["validation_params"])
+
+        if config["model_path"] is not None:
+            self.save_model(config)
+        return results_df
+
+    def save_model(self, config):
+
+        #Addestra il modello sull'intero dataset pulito e lo salva come artefatto per l'inferenza,
+        #insieme all'ordine delle feature e ai parametri del normalizzatore da applicare ai nuovi dati grezzi.
+
+        cleaned_data = self.cleaned_dataset(config)
+        normalizer = None
+        if config["normalization"] != "nessuna":
+            normalizer = FOLD_NORMALIZERS[config["normalization"]]().fit(cleaned_data, EXCLUDED_COLUMNS)
+            cleaned_data = normalizer.transform(cleaned_data)
+
+        X, y = Preprocessing.split_features_target(cleaned_data, target_col=TARGET_COLUMN, dtype=config["dtype"])
+        model_m = Modelling(model_type="knn", k=config["k"], index=config["index"], n_jobs=config["model_jobs"],
+                            compact=config["compact"], dtype=config["dtype"])
+        model_m.train(X, y)
+        ModelArtifact(model_m, X.columns, normalizer).save(config["model_path"])
+        print(f"Modello salvato in {config['model_path']}")
+
+    def run_all(self, configs):
+
+        #Esegue in sequenza una lista di configurazioni nello stesso processo.
+
+        #:return: Lista di coppie (nome dell'esecuzione, DataFrame dei risultati).
+
+        return [(config["name"], self.run(config)) for config in configs]
+
+
+def parse_args(argv=None):
+
+    #Legge gli argomenti da riga di comando. Con --config le altre opzioni fanno da default comune
+    #per tutte le esecuzioni del file; senza, descrivono un'unica esecuzione.
+
+    parser = argparse.ArgumentParser(description="Esecuzione non interattiva del classificatore k-NN.")
+    parser.add_argument("--config", help="File di configurazione JSON o YAML con una o più esecuzioni.")
+    parser.add_argument("--file", help="Percorso del dataset.")
+    parser.add_argument("--cleaning", choices=CLEANING_MODES, help="Gestione dei valori mancanti.")
+    parser.add_argument("--dedup-by-id", dest="dedup_by_id", action="store_true", default=None,
+                        help="Considera 'Sample code number' nella ricerca dei duplicati.")
+    parser.add_argument("--chunksize", type=int, help="Legge e pulisce il dataset a blocchi di righe.")
+    parser.add_argument("--normalization", choices=NORMALIZATION_METHODS, help="Metodo di normalizzazione.")
+    parser.add_argument("--fold-normalization", dest="fold_normalization", action="store_true", default=None,
+                        help="Addestra il normalizzatore sulle righe di training di ogni fold.")
+    parser.add_argument("--k", type=int, help="Numero di vicini del k-NN.")
+    parser.add_argument("--compact", action="store_true", default=None,
+                        help="Memorizza le feature intere come codici uint8/int16.")
+    parser.add_argument("--dtype", choices=DTYPES, help="Precisione di feature, distanze e punteggi del modello.")
+    parser.add_argument("--folds", dest="num_folds", type=int, help="Numero di folds della K-Fold.")
+    parser.add_argument("--metrics", help="Metriche separate da virgola (numeri del menu o nomi).")
+    parser.add_argument("--n-jobs", dest="n_jobs", type=int, help="Processi che eseguono i fold in parallelo.")
+    parser.add_argument("--model-jobs", dest="model_jobs", type=int,
+                        help="Processi della predizione del modello (alternativa a --n-jobs).")
+    parser.add_argument("--validation", choices=VALIDATION_METHODS, help="Metodo di validazione.")
+    parser.add_argument("--output-dir", dest="output_dir", help="Cartella dei risultati e dei grafici.")
+    parser.add_argument("--model-path", dest="model_path", help="Cartella in cui salvare il modello addestrato.")
+    parser.add_argument("--import-cache", dest="import_cache",
+                        help="Cartella della cache colonnare dei dataset importati (default: disattivata).")
+    parser.add_argument("--save-cleaned", dest="save_cleaned", help="Nome del file del dataset pulito.")
+    parser.add_argument("--save-scaled", dest="save_scaled", help="Nome del file del dataset normalizzato.")
+    parser.add_argument("--plot-mode", dest="plot_mode", choices=["show", "headless", "off"],
+                        help="Modalità dei grafici.")
+    return parser.parse_args(argv)
+
+def main(argv=None):
+    args = vars(parse_args(argv))
+    config_path = args.pop("config")
+    options = {key: value for key, value in args.items() if value is not None}
+
+    if config_path:
+        configs = PipelineRunner.load_config(config_path)
+        #Le opzioni da riga di comando sovrascrivono quelle del file
+        configs = [PipelineRunner._validate({**config, **options}) for config in configs]
+    else:
+        configs = PipelineRunner.expand_config(options)
+
+    for name, results_df in PipelineRunner().run_all(configs):
+        print(f"\nRisultati dell'esecuzione {name}:")
+        print(results_df.to_string(index=False))
+
+
+if __name__ == "__main__":
+    main()
@@ -1,9 +1,11 @@
+import os
 import sys
+import tempfile
 import unittest
 from unittest.mock import patch
 import pandas as pd
 import numpy as np
-from data_cleaning.data_normalizer import StandardNormalizer, MinMaxNormalizer, Preprocessing
+from data_cleaning.data_normalizer import StandardNormalizer, MinMaxNormalizer, Preprocessing, Normalizer, ColumnStatistics
 
 
 class TestPreprocessing(unittest.TestCase):
@@ -41,6 +43,31 @@ class TestPreprocessing(unittest.TestCase):
                 self.assertAlmostEqual(norm_db[column].mean(), 0, places=6)
                 self.assertAlmostEqual(norm_db[column].std(), 1, places=6)
     
+    def test_fit_transform_with_saved_statistics(self):
+        # Le statistiche del fit vengono applicate a nuovi dati senza ricalcolarle, anche dopo il salvataggio
+        normalizer = StandardNormalizer().fit(self.data, self.exclude_col)
+        new_batch = pd.DataFrame({"A": [25, 50], "B": [2.5, 0.0], "C": [1, 2]})
+
+        with tempfile.TemporaryDirectory() as tmp:
+            path = os.path.join(tmp, "normalizer.json")
+            normalizer.save(path)
+            loaded = Normalizer.load(path)
+
+        self.assertIsInstance(loaded, StandardNormalizer)
+        transformed = loaded.transform(new_batch)
+        expected = (new_batch["A"] - self.data["A"].mean()) / self.data["A"].std()
+        pd.testing.assert_series_equal(transformed["A"], expected)
+        self.assertTrue(all(transformed["C"] == new_batch["C"]))
+
+        # Le statistiche di blocchi di righe disgiunti si uniscono come se fossero calcolate insieme
+        block = self.data[["A", "B"]].to_numpy(dtype=float)
+        merged = ColumnStatistics.from_array(block[:1]).merge(ColumnStatistics.from_array(block[1:]))
+        np.testing.assert_allclose(merged.std(), self.data[["A", "B"]].std().to_numpy())
+        np.testing.assert_array_equal(merged.minimum, block.min(axis=0))
+
+        with self.assertRaises(ValueError):
+            MinMaxNormalizer().transform(block)
+
     def test_invalid_method(self):
         with patch('builtins.input', return_value='invalid'):
             norm_db = Preprocessing.get_normalizer(self.data, exclude_col=self.exclude_col)
@@ -0,0 +1,107 @@
+import os
+import importlib.util
+import tempfile
+import unittest
+from unittest.mock import patch
+import numpy as np
+import pandas as pd
+from data_cleaning import SelectionFile, ImportCache
+from data_cleaning.file_importer import FileCSV, FileJSON
+
+class TestImportCache(unittest.TestCase):
+    # Test per la cache colonnare dei dataset importati
+
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.data = pd.DataFrame({
+            "Sample code number": [1, 2, 3, 4],
+            "Mitoses": [1.0, np.nan, 3.0, 1.0],
+            "Bland Chromatin": ["1", "?", None, "3"],
+            "classtype_v1": [2, 4, 2, 4],
+        })
+        self.default_cache = SelectionFile.cache
+        SelectionFile.cache = ImportCache(os.path.join(self.tmp.name, "cache"), max_entries=2)
+
+    def tearDown(self):
+        SelectionFile.cache = self.default_cache
+        self.tmp.cleanup()
+
+    def _write(self, name, data):
+        path = os.path.join(self.tmp.name, name)
+        if name.endswith(".json"):
+            data.to_json(path)
+        else:
+            data.to_csv(path, index=False)
+        return path
+
+    def test_cached_import_skips_parsing(self):
+        # Il secondo import legge dalla cache lo stesso DataFrame senza rieseguire il parser
+        for name, importer in [("dataset.csv", FileCSV), ("dataset.json", FileJSON)]:
+            path = self._write(name, self.data)
+            expected = SelectionFile.import_data(path)
+
+            with patch.object(importer, "importer", side_effect=AssertionError("parser non atteso")):
+                cached = SelectionFile.import_data(path)
+            pd.testing.assert_frame_equal(cached, expected)
+
+    def test_stale_and_excess_entries(self):
+        path = self._write("dataset.csv", self.data)
+        SelectionFile.import_data(path)
+
+        # Un file modificato viene reimportato
+        self._write("dataset.csv", self.data.iloc[:2])
+        self.assertEqual(len(SelectionFile.import_data(path)), 2)
+
+        # Un file solo "toccato" ha lo stesso contenuto: resta valida la voce in cache
+        os.utime(path, ns=(0, 0))
+        with patch.object(FileCSV, "importer", side_effect=AssertionError("parser non atteso")):
+            self.assertEqual(len(SelectionFile.import_data(path)), 2)
+
+        # Oltre max_entries le voci non più associate a un file vengono eliminate per prime
+        for i in range(3):
+            SelectionFile.import_data(self._write(f"other_{i}.csv", self.data.iloc[:i + 1]))
+        entries = SelectionFile.cache._read_index()["entries"]
+        self.assertEqual(len(entries), 2)
+
+    @unittest.skipUnless(importlib.util.find_spec("pyarrow"), "richiede pyarrow")
+    def test_unserializable_columns_with_pyarrow(self):
+        # Una colonna di testo e numeri mescolati (come "Bland Chromatin" grezza) non è rappresentabile in Parquet:
+        # l'import riesce comunque e nella cache non resta nessuna voce a metà
+        mixed = pd.DataFrame({"Bland Chromatin": ["1", "?", None, 3], "Mitoses": [1.0, 2.0, np.nan, 1.0]})
+        path = self._write("mixed.csv", self.data)
+        with patch.object(FileCSV, "importer", return_value=mixed):
+            pd.testing.assert_frame_equal(SelectionFile.import_data(path), mixed)
+        cache_dir = SelectionFile.cache.cache_dir
+        self.assertEqual(SelectionFile.cache._read_index()["entries"], {})
+        self.assertEqual([name for name in os.listdir(cache_dir) if name != ImportCache.INDEX_FILE], [])
+
+        # Se Parquet fallisce ma le colonne sono rappresentabili si usa il formato .npy
+        path = self._write("dataset.csv", self.data)
+        with patch.object(pd.DataFrame, "to_parquet", side_effect=TypeError("colonna non supportata")):
+            expected = SelectionFile.import_data(path)
+        entries = SelectionFile.cache._read_index()["entries"]
+        self.assertEqual([entry["format"] for entry in entries.values()], ["npy"])
+        with patch.object(FileCSV, "importer", side_effect=AssertionError("parser non atteso")):
+            pd.testing.assert_frame_equal(SelectionFile.import_data(path), expected)
+
+    def test_miss_hashes_file_once(self):
+        path = self._write("dataset.csv", self.data)
+        with patch.object(ImportCache, "_content_hash", wraps=ImportCache._content_hash) as content_hash:
+            SelectionFile.import_data(path)
+        self.assertEqual(content_hash.call_count, 1)
+
+    def test_cache_disabled_by_default(self):
+        # Senza una cache esplicita l'import non scrive nulla su disco
+        path = self._write("dataset.csv", self.data)
+        SelectionFile.cache = self.default_cache
+        self.assertIsNone(SelectionFile.cache)
+        with patch.object(ImportCache, "store", side_effect=AssertionError("cache non attesa")):
+            self.assertEqual(len(SelectionFile.import_data(path)), len(self.data))
+
+        # Una cache passata a import_data vale solo per quell'importazione
+        cache = ImportCache(os.path.join(self.tmp.name, "explicit"))
+        SelectionFile.import_data(path, cache=cache)
+        self.assertEqual(len(cache._read_index()["entries"]), 1)
+
+if __name__ == '__main__':
+    unittest.main()
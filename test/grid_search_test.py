@@ -0,0 +1,89 @@
+import os
+import tempfile
+import unittest
+from unittest.mock import patch
+import numpy as np
+import pandas as pd
+from data_cleaning import SelectionFile, ImportCache, GestioneValMancanti, MinMaxNormalizer, Preprocessing
+from models import Modelling
+from evaluation import Validation
+from grid_search import GridSearch, StageCache
+
+class TestGridSearch(unittest.TestCase):
+    # Test per la ricerca a griglia memoizzata
+
+    def setUp(self):
+        # Dataset sintetico con la stessa struttura del dataset originale
+        rng = np.random.default_rng(0)
+        n = 60
+        y = np.repeat([2, 4], n // 2)
+        self.data = pd.DataFrame({
+            "Sample code number": np.arange(n),
+            "A": rng.normal(size=n) + (y == 4) * 2,
+            "B": rng.normal(size=n),
+            "classtype_v1": y,
+        })
+        self.data.loc[[3, 40], "A"] = np.nan
+
+        self.tmp = tempfile.TemporaryDirectory()
+        self.file_path = os.path.join(self.tmp.name, "dataset.csv")
+        self.data.to_csv(self.file_path, index=False)
+
+        # Cache di import isolata nella cartella temporanea
+        self.default_cache = SelectionFile.cache
+        SelectionFile.cache = ImportCache(os.path.join(self.tmp.name, "import_cache"))
+
+    def tearDown(self):
+        SelectionFile.cache = self.default_cache
+        self.tmp.cleanup()
+
+    def test_grid_matches_k_sweep_and_shares_stages(self):
+        # Verifica che ogni combinazione coincida con il k-sweep e che import e pulizia avvengano una volta sola
+        metrics = ["Accuracy", "Auc"]
+        grid = GridSearch(self.file_path, cleaning_modes=["media", "mediana"], k_values=[1, 3, 5],
+                          fold_values=[3, 4], selected_metrics=metrics)
+
+        with patch.object(SelectionFile, "import_data", wraps=SelectionFile.import_data) as import_data, \
+                patch.object(GestioneValMancanti, "get_mode", wraps=GestioneValMancanti.get_mode) as get_mode:
+            results_df = grid.run(save_results=False)
+
+        self.assertEqual(import_data.call_count, 1)
+        self.assertEqual(get_mode.call_count, 2)
+        self.assertEqual(len(results_df), 2 * 2 * 3 * 2)
+        self.assertTrue(np.all(np.diff(results_df["Accuracy"]) <= 0))
+        self.assertEqual(list(results_df["rank"]), list(range(1, len(results_df) + 1)))
+
+        cleaned = GestioneValMancanti.get_mode("mediana", self.data)
+        scaled = MinMaxNormalizer.normalize(cleaned, ['Sample code number', 'classtype_v1'])
+        X, y = Preprocessing.split_features_target(scaled, target_col='classtype_v1')
+        expected = Validation(Modelling(model_type="knn", k=5), X, y, num_folds=4, selected_metrics=metrics,
+                              save_results=False, plot_mode="off").k_sweep(5)
+
+        rows = results_df[(results_df["cleaning"] == "mediana") & (results_df["num_folds"] == 4) &
+                          (results_df["normalization"] == "normalizzazione min-max")].sort_values("k")
+        expected = expected[expected["k"].isin([1, 3, 5])]
+        np.testing.assert_allclose(rows[metrics].to_numpy(), expected[metrics].to_numpy())
+
+        # Una seconda ricerca con la stessa cache non ripete alcuno stadio
+        with patch.object(SelectionFile, "import_data") as import_data:
+            GridSearch(self.file_path, cleaning_modes=["media"], k_values=[3], fold_values=[3],
+                       selected_metrics=metrics, cache=grid.cache).run(save_results=False)
+        import_data.assert_not_called()
+
+    def test_stage_cache_eviction_and_disk(self):
+        # Verifica l'eliminazione LRU in memoria e il recupero dalla copia su disco
+        cache = StageCache(max_entries=2, cache_dir=os.path.join(self.tmp.name, "cache"), max_disk_entries=2)
+        cache.put(("a",), 1)
+        cache.put(("b",), 2)
+        cache.lookup(("a",))
+        cache.put(("c",), 3)
+        self.assertEqual(list(cache._entries), [("a",), ("c",)])  # "b" è il meno usato di recente
+
+        # Su disco restano al massimo due voci; una nuova cache le ritrova
+        self.assertEqual(len(os.listdir(cache.cache_dir)), 2)
+        disk_cache = StageCache(cache_dir=cache.cache_dir)
+        self.assertEqual(disk_cache.lookup(("c",)), (True, 3))
+        self.assertEqual(disk_cache.memoize(("d",), lambda: 4), 4)
+
+if __name__ == '__main__':
+    unittest.main()
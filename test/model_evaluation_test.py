@@ -1,8 +1,12 @@
+import os
+import tempfile
 import unittest
 import numpy as np
-from models import Modelling
+import pandas as pd
+from models import Modelling, PairwiseDistances
+from data_cleaning import MinMaxNormalizer
 from evaluation import Validation
-from evaluation import ModelEvaluationMetrics
+from evaluation import ModelEvaluationMetrics, roc_curve, roc_auc
 
 class TestModelValidation(unittest.TestCase):
     # Test per la validazione K-Fold del modello
@@ -32,7 +36,10 @@ class TestModelValidation(unittest.TestCase):
         model_manager = Modelling(model_type="knn", k=3) 
         
         # Inizializziamo la classe di validazione con il modello corretto
-        validator = Validation(classifier=model_manager, X=self.X_test, y=self.y_test, num_folds=3)
+        output_dir = tempfile.TemporaryDirectory()
+        self.addCleanup(output_dir.cleanup)
+        validator = Validation(classifier=model_manager, X=self.X_test, y=self.y_test, num_folds=3,
+                               output_dir=output_dir.name)
         
         # Definiamo un set predefinito di metriche per evitare errori
         selected_metrics = {"Accuracy", "Error_rate", "Sensitivity", "Specificity", "Geometric_mean", "Auc"}
@@ -60,6 +67,205 @@ class TestModelValidation(unittest.TestCase):
 
 
         
+    def test_parallel_folds_match_serial(self):
+        # Verifica che l'esecuzione parallela dei fold produca gli stessi risultati di quella seriale
+        selected_metrics = ["Accuracy", "Sensitivity", "Specificity"]
+        serial = Validation(classifier=Modelling(k=3), X=self.X_test, y=self.y_test, num_folds=4,
+                            save_results=False, plot_mode="off", selected_metrics=selected_metrics)
+        parallel = Validation(classifier=Modelling(k=3), X=self.X_test, y=self.y_test, num_folds=4,
+                              save_results=False, plot_mode="off", selected_metrics=selected_metrics, n_jobs=2)
+
+        serial_df = serial.k_fold_cross_validation()
+        parallel_df = parallel.k_fold_cross_validation()
+
+        pd.testing.assert_frame_equal(serial_df, parallel_df)
+        self.assertIsNotNone(parallel.classifier.get_model().X_train)
+
+    def test_nested_parallel_prediction(self):
+        # Fold in parallelo con un modello che predice in parallelo: i fold di test superano BLOCK_SIZE righe,
+        # ma i worker predicono in un solo processo invece di aprire un pool annidato
+        rng = np.random.default_rng(3)
+        X = rng.normal(size=(1200, 4))
+        y = np.where(X[:, 0] + rng.normal(scale=0.5, size=1200) > 0, 4, 2)
+        selected_metrics = ["Accuracy", "Sensitivity"]
+
+        def validations(n_jobs):
+            return Validation(classifier=Modelling(k=5, n_jobs=n_jobs), X=X, y=y, num_folds=4, save_results=False,
+                              plot_mode="off", selected_metrics=selected_metrics, n_jobs=n_jobs)
+
+        serial, parallel = validations(1), validations(2)
+        self.addCleanup(parallel.classifier.close)
+        pd.testing.assert_frame_equal(parallel.k_fold_cross_validation(), serial.k_fold_cross_validation())
+        pd.testing.assert_frame_equal(parallel.bootstrap(n_iterations=4, seed=0),
+                                      serial.bootstrap(n_iterations=4, seed=0))
+        pd.testing.assert_frame_equal(parallel.random_subsampling(n_repeats=2, test_size=0.25, seed=0),
+                                      serial.random_subsampling(n_repeats=2, test_size=0.25, seed=0))
+        # Il modello del processo principale mantiene la propria predizione parallela
+        self.assertEqual(parallel.classifier.get_model().n_jobs, 2)
+
+    def test_k_sweep_matches_single_k(self):
+        # Verifica che il k-sweep dia, per ogni k, le stesse metriche medie di una K-Fold con quel k
+        selected_metrics = ["Accuracy", "Sensitivity"]
+        sweep_df = Validation(classifier=Modelling(k=1), X=self.X_test, y=self.y_test, num_folds=4,
+                              save_results=False, plot_mode="off", selected_metrics=selected_metrics).k_sweep(k_max=5)
+
+        self.assertEqual(list(sweep_df["k"]), [1, 2, 3, 4, 5])
+
+        classifier = Modelling(k=3)
+        fold_metrics = []
+        for start, end in [(0, 5), (5, 10), (10, 15), (15, 20)]:
+            classifier.train(np.delete(self.X_test, range(start, end), axis=0), np.delete(self.y_test, range(start, end)))
+            y_pred, _ = classifier.predict(self.X_test[start:end])
+            fold_metrics.append(ModelEvaluationMetrics.evaluate(self.y_test[start:end], y_pred, selected_metrics))
+
+        for metric in selected_metrics:
+            self.assertAlmostEqual(sweep_df.loc[2, metric], np.mean([m[metric] for m in fold_metrics]))
+
+    def test_distance_cache_matches_features(self):
+        # Verifica che la K-Fold con la matrice delle distanze precalcolata dia gli stessi risultati
+        selected_metrics = ["Accuracy", "Geometric_mean"]
+        cache = PairwiseDistances(self.X_test, dtype=np.float64)
+
+        expected_df = Validation(classifier=Modelling(k=3), X=self.X_test, y=self.y_test, num_folds=4,
+                                 save_results=False, plot_mode="off",
+                                 selected_metrics=selected_metrics).k_fold_cross_validation()
+        cached_df = Validation(classifier=Modelling(k=3, distance_cache=cache), X=self.X_test, y=self.y_test,
+                               num_folds=4, save_results=False,
+                               plot_mode="off", selected_metrics=selected_metrics).k_fold_cross_validation()
+
+        pd.testing.assert_frame_equal(expected_df, cached_df)
+
+    def test_leave_one_out_matches_refitting(self):
+        # Verifica che la Leave-One-Out vettorizzata coincida con n addestramenti separati
+        X = np.vstack([self.X_test, self.X_test[:5]])  # Duplicati per verificare i pareggi a distanza zero
+        y = np.concatenate([self.y_test, self.y_test[:5]])
+        selected_metrics = ["Accuracy", "Sensitivity", "Specificity"]
+
+        results_df = Validation(classifier=Modelling(k=3), X=X, y=y, save_results=False,
+                                plot_mode="off", selected_metrics=selected_metrics).leave_one_out()
+
+        y_pred = []
+        for i in range(len(X)):
+            classifier = Modelling(k=3)
+            classifier.train(np.delete(X, i, axis=0), np.delete(y, i))
+            y_pred.append(classifier.predict(X[i:i + 1])[0][0])
+        expected = ModelEvaluationMetrics.evaluate(y, np.array(y_pred), selected_metrics)
+
+        self.assertEqual(results_df.loc[0, "fold"], "LOO")
+        for metric in selected_metrics:
+            self.assertAlmostEqual(results_df.loc[0, metric], expected[metric])
+
+    def test_float32_precision_check(self):
+        # Verifica la validazione in float32 e il confronto dei vicini con quelli in float64
+        rng = np.random.default_rng(0)
+        X = rng.normal(size=(200, 4))  # Valori continui: nessun pareggio tra distanze
+        y = np.where(X[:, 0] + rng.normal(scale=0.5, size=200) > 0, 4, 2)
+        selected_metrics = ["Accuracy", "Auc"]
+
+        validator = Validation(classifier=Modelling(k=5, dtype=np.float32), X=X, y=y, save_results=False,
+                               plot_mode="off", selected_metrics=selected_metrics)
+        self.assertEqual(validator.X.dtype, np.float32)
+        results_df = validator.leave_one_out()
+        expected = Validation(classifier=Modelling(k=5), X=X, y=y, save_results=False,
+                              plot_mode="off", selected_metrics=selected_metrics).leave_one_out()
+        np.testing.assert_allclose(results_df[selected_metrics].to_numpy(dtype=float),
+                                   expected[selected_metrics].to_numpy(dtype=float))
+
+        report = validator.precision_check()
+        self.assertEqual(report.loc[0, "rows"], 200)
+        self.assertEqual(report.loc[0, "neighbor_set_mismatches"], 0)
+        self.assertEqual(report.loc[0, "prediction_mismatches"], 0)
+        self.assertLess(report.loc[0, "max_distance_error"], 1e-5)
+
+        # Righe a distanze uguali in aritmetica esatta: l'arrotondamento può cambiare i pareggi, mai le distanze
+        report = Validation(classifier=Modelling(k=5), X=rng.integers(1, 11, size=(200, 4)) / 9, y=y,
+                            save_results=False, plot_mode="off").precision_check(k=3)
+        self.assertEqual(report.loc[0, "k"], 3)
+        self.assertLess(report.loc[0, "max_distance_error"], 1e-5)
+
+        # Il riferimento in float64 non dipende dalla precisione con cui è costruita la validazione
+        X_ties = rng.integers(1, 11, size=(200, 4)) / 9
+        reports = [Validation(classifier=Modelling(k=5, dtype=dtype), X=X_ties, y=y, save_results=False,
+                              plot_mode="off").precision_check() for dtype in [np.float64, np.float32]]
+        pd.testing.assert_frame_equal(reports[1], reports[0])
+
+    def test_stratified_shuffled_folds(self):
+        # Verifica che i fold stratificati e mescolati siano una partizione del dataset, riproducibile col seme
+        validator = Validation(classifier=Modelling(k=3), X=self.X_test, y=self.y_test, num_folds=4,
+                               save_results=False, plot_mode="off", shuffle=True, stratified=True, seed=7)
+        folds = validator._fold_indices()
+
+        np.testing.assert_array_equal(np.sort(np.concatenate(folds)), np.arange(len(self.X_test)))
+        for test_idx in folds:
+            # Le 10 righe per classe si distribuiscono in fold da 2 o 3 righe per classe
+            self.assertTrue(set(np.bincount(self.y_test[test_idx])[[2, 4]]) <= {2, 3})
+
+        same_seed = Validation(classifier=Modelling(k=3), X=self.X_test, y=self.y_test, num_folds=4,
+                               save_results=False, plot_mode="off", shuffle=True, stratified=True,
+                               seed=7)._fold_indices()
+        for fold, other in zip(folds, same_seed):
+            np.testing.assert_array_equal(fold, other)
+
+    def test_bootstrap_out_of_bag(self):
+        # Verifica che il Bootstrap valuti ogni campione sulle righe out-of-bag come un modello riaddestrato
+        selected_metrics = ["Accuracy", "Error_rate"]
+        results_df = Validation(classifier=Modelling(k=3), X=self.X_test, y=self.y_test, save_results=False,
+                                plot_mode="off", selected_metrics=selected_metrics).bootstrap(n_iterations=20, seed=0)
+
+        self.assertEqual(list(results_df["fold"][-2:]), ["Mean", ".632"])
+        self.assertEqual(len(results_df), 22)
+
+        # Stessi campioni generati dal Bootstrap: il modello viene addestrato sul campione ordinato
+        samples = np.random.default_rng(0).integers(0, len(self.X_test), size=(20, len(self.X_test)))
+        for i, sample in enumerate(samples):
+            sample = np.sort(sample)
+            oob = np.setdiff1d(np.arange(len(self.X_test)), sample)
+            classifier = Modelling(k=3)
+            classifier.train(self.X_test[sample], self.y_test[sample])
+            y_pred, _ = classifier.predict(self.X_test[oob])
+            expected = ModelEvaluationMetrics.evaluate(self.y_test[oob], y_pred, selected_metrics)
+            self.assertAlmostEqual(results_df.loc[i, "Accuracy"], expected["Accuracy"])
+
+    def test_repeated_random_splits(self):
+        # Verifica Random Subsampling e Stratified Shuffle Split: righe di riepilogo e proporzioni di classe
+        validator = Validation(classifier=Modelling(k=3), X=self.X_test, y=self.y_test, save_results=False,
+                               plot_mode="off", selected_metrics=["Accuracy"])
+
+        results_df = validator.random_subsampling(n_repeats=10, test_size=0.25, seed=0)
+        self.assertEqual(len(results_df), 12)
+        self.assertEqual(list(results_df["fold"][-2:]), ["Mean", "Std"])
+        self.assertAlmostEqual(results_df["Accuracy"].iloc[-2], results_df["Accuracy"].iloc[:10].mean())
+
+        test_sets = validator._shuffle_split_indices(n_repeats=10, test_size=0.5, seed=0, stratified=True)
+        for test_idx in test_sets:
+            self.assertEqual(len(set(test_idx)), 10)
+            self.assertEqual(np.sum(self.y_test[test_idx] == 4), 5)
+
+        results_df = validator.stratified_shuffle_split(n_repeats=10, test_size=0.5, seed=0)
+        self.assertEqual(list(results_df["fold"][-2:]), ["Mean", "Std"])
+
+    def test_leave_p_out(self):
+        # Verifica l'enumerazione esatta degli split e il passaggio al campionamento oltre il budget
+        validator = Validation(classifier=Modelling(k=3), X=self.X_test, y=self.y_test, save_results=False,
+                               plot_mode="off", selected_metrics=["Accuracy"])
+
+        results_df = validator.leave_p_out(p=2, max_splits=500)
+        self.assertEqual(results_df.attrs["n_splits"], 190)  # C(20, 2)
+
+        # Split (0, 1): stesso risultato di un modello addestrato sulle altre 18 righe
+        classifier = Modelling(k=3)
+        classifier.train(self.X_test[2:], self.y_test[2:])
+        y_pred, _ = classifier.predict(self.X_test[:2])
+        expected = ModelEvaluationMetrics.evaluate(self.y_test[:2], y_pred, ["Accuracy"])
+        self.assertAlmostEqual(results_df.loc[0, "Accuracy"], expected["Accuracy"])
+
+        # Elaborati a blocchi di pochi split, i risultati restano identici
+        validator.LPO_BLOCK_ELEMENTS = 50
+        pd.testing.assert_frame_equal(validator.leave_p_out(p=2, max_splits=500), results_df)
+
+        results_df = validator.leave_p_out(p=3, max_splits=50, seed=0)
+        self.assertEqual(results_df.attrs["n_splits"], 50)
+
     def test_metric_calculations(self):
         # Verifica il calcolo delle metriche di valutazione
         y_true = np.array([2, 2, 4, 4, 2])
@@ -83,6 +289,96 @@ class TestModelValidation(unittest.TestCase):
         self.assertIn("auc", metrics_lower)
         self.assertTrue(0 <= metrics_lower["auc"] <= 1)  # AUC deve essere tra 0 e 1
 
+    def test_headless_and_disabled_plots(self):
+        # Verifica che i grafici headless in background vengano salvati e che con "off" non vengano prodotti
+        selected_metrics = ["Accuracy", "Auc"]
+        output_dir = tempfile.TemporaryDirectory()
+        self.addCleanup(output_dir.cleanup)
+        images = [os.path.join(output_dir.name, name) for name in ["confusion_matrix.png", "roc_auc_curve.png"]]
+
+        validator = Validation(classifier=Modelling(model_type="knn", k=3), X=self.X_test, y=self.y_test,
+                               num_folds=3, selected_metrics=selected_metrics, save_results=False,
+                               plot_mode="off", output_dir=output_dir.name)
+        validator.k_fold_cross_validation()
+        self.assertFalse(any(os.path.exists(image) for image in images))
+
+        validator = Validation(classifier=Modelling(model_type="knn", k=3), X=self.X_test, y=self.y_test,
+                               num_folds=3, selected_metrics=selected_metrics, save_results=False,
+                               plot_mode="headless", background_plots=True, output_dir=output_dir.name)
+        validator.k_fold_cross_validation()
+        validator.wait_for_plots()
+        self.assertTrue(all(os.path.exists(image) for image in images))
+
+        # Modalità non valida e grafici in background con finestra interattiva
+        with self.assertRaises(ValueError):
+            Validation(classifier=Modelling(model_type="knn", k=3), X=self.X_test, y=self.y_test, plot_mode="gui")
+        with self.assertRaises(ValueError):
+            Validation(classifier=Modelling(model_type="knn", k=3), X=self.X_test, y=self.y_test,
+                       background_plots=True)
+
+    def test_fold_normalization_matches_refit(self):
+        # Verifica che il normalizzatore di ogni fold coincida con quello addestrato sulle sole righe di training
+        rng = np.random.default_rng(3)
+        X = rng.normal(size=(40, 3)) * [1, 10, 100]
+        y = np.where(X[:, 0] + rng.normal(size=40) > 0, 4, 2)
+        validator = Validation(classifier=Modelling(model_type="knn", k=3), X=X, y=y, num_folds=4,
+                               selected_metrics=["Accuracy"], save_results=False, plot_mode="off",
+                               shuffle=True, seed=0, normalizer=MinMaxNormalizer())
+        results_df = validator.k_fold_cross_validation()
+
+        for i, test_idx in enumerate(validator._fold_indices()):
+            train_idx = np.setdiff1d(np.arange(40), test_idx)
+            normalizer = MinMaxNormalizer().fit(X[train_idx])
+            model = Modelling(model_type="knn", k=3)
+            model.train(normalizer.transform(X[train_idx]), y[train_idx])
+            y_pred, _ = model.predict(normalizer.transform(X[test_idx]))
+            self.assertAlmostEqual(results_df["Accuracy"][i], np.mean(y_pred == y[test_idx]))
+
+        # I metodi con un'unica ricerca dei vicini sull'intero dataset non possono normalizzare per fold
+        with self.assertRaises(ValueError):
+            validator.leave_one_out()
+
+    def test_batch_metrics_match_single_evaluation(self):
+        # Verifica che la valutazione in blocco coincida con la valutazione di ogni vettore separatamente
+        rng = np.random.default_rng(0)
+        y_true = rng.choice([2, 4], size=30)
+        y_preds = rng.choice([2, 4], size=(8, 30))
+        selected_metrics = ["Accuracy", "Error_rate", "Sensitivity", "Specificity", "Geometric_mean", "Auc"]
+
+        batch_metrics = ModelEvaluationMetrics.evaluate_batch(y_true, y_preds, selected_metrics)
+
+        for i, y_pred in enumerate(y_preds):
+            metrics = ModelEvaluationMetrics.evaluate(y_true, y_pred, selected_metrics)
+            for metric in selected_metrics:
+                self.assertEqual(batch_metrics[metric][i], metrics[metric])
+
+        # Sensibilità e specificità mediate sulle classi presenti, calcolate a mano
+        metrics = ModelEvaluationMetrics.evaluate(np.array([2, 2, 4, 4, 2]), np.array([2, 2, 4, 4, 4]),
+                                                  ["Sensitivity", "Specificity"])
+        self.assertAlmostEqual(metrics["Sensitivity"], (2 / 3 + 1) / 2)
+        self.assertAlmostEqual(metrics["Specificity"], (1 + 2 / 3) / 2)
+
+    def test_roc_auc_matches_pairwise_ranking(self):
+        # Verifica che l'AUC esatta coincida con la frazione di coppie (positivo, negativo) ordinate
+        # correttamente, contando mezzo punto per i pareggi (statistica di Mann-Whitney)
+        rng = np.random.default_rng(1)
+        y_true = rng.choice([2, 4], size=60)
+        y_scores = rng.integers(0, 6, size=60) / 5  # punteggi con molti pareggi, come nel voto k-NN
+
+        positives, negatives = y_scores[y_true == 4], y_scores[y_true == 2]
+        pairs = positives[:, None] - negatives[None, :]
+        expected = (np.sum(pairs > 0) + 0.5 * np.sum(pairs == 0)) / pairs.size
+        self.assertAlmostEqual(roc_auc(y_true, y_scores, positive_label=4), expected)
+
+        # La curva parte da (0, 0), arriva a (1, 1) e ha un punto per ogni soglia distinta
+        fpr, tpr, thresholds = roc_curve(y_true, y_scores, positive_label=4)
+        self.assertEqual((fpr[0], tpr[0], fpr[-1], tpr[-1]), (0, 0, 1, 1))
+        self.assertEqual(len(thresholds), len(np.unique(y_scores)) + 1)
+
+        # Con i punteggi, evaluate usa l'AUC esatta
+        metrics = ModelEvaluationMetrics.evaluate(y_true, np.where(y_scores >= 0.5, 4, 2), ["Auc"], y_scores)
+        self.assertAlmostEqual(metrics["Auc"], expected)
+
 if __name__ == '__main__':
     unittest.main()
 
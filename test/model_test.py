@@ -1,6 +1,10 @@
+import os
+import tempfile
 import unittest
 import numpy as np
-from models import Modelling
+import pandas as pd
+from models import Modelling, ModelArtifact, FeatureQuantizer, QuantizedMatrix
+from data_cleaning import StandardNormalizer
 from evaluation import Validation
 from evaluation import ModelEvaluationMetrics
 
@@ -74,4 +78,225 @@ class TestKNNModel(unittest.TestCase):
         classified_predictions = [4 if p >= 0.5 else 2 for p in probability_preds]
         
         #Controlliamo che le predizioni finali siano solo 2 o 4
-        self.assertTrue(all(p in [2, 4] for p in classified_predictions), f"Final classified predictions contain unexpected values: {classified_predictions}")
\ No newline at end of file
+        self.assertTrue(all(p in [2, 4] for p in classified_predictions), f"Final classified predictions contain unexpected values: {classified_predictions}")
+
+    def test_batch_prediction_matches_single_row(self):
+        """Verifica che la predizione vettorizzata coincida con il calcolo riga per riga (anche con pareggi)"""
+        rng = np.random.default_rng(0)
+        X_train = rng.integers(1, 5, size=(300, 9)) / 9
+        y_train = rng.choice([2, 4], size=300)
+        X_test = rng.integers(1, 5, size=(600, 9)) / 9
+
+        knn = Modelling(k=5)
+        knn.train(X_train, y_train)
+        predictions, probabilities = knn.predict(X_test)
+
+        for x, pred, prob in zip(X_test, predictions, probabilities):
+            distances = np.linalg.norm(X_train - x, axis=1)
+            k_nearest_labels = y_train[np.argsort(distances, kind="stable")[:5]]
+            expected_prob = np.sum(k_nearest_labels == 4) / 5
+            self.assertEqual(prob, expected_prob)
+            self.assertEqual(pred, 4 if expected_prob >= 0.5 else 2)
+
+    def test_tree_indexes_match_brute_force(self):
+        """Verifica che KD-tree e ball tree restituiscano gli stessi vicini della ricerca brute-force"""
+        rng = np.random.default_rng(1)
+        X_train = rng.integers(1, 11, size=(500, 10)) / 9
+        y_train = rng.choice([2, 4], size=500)
+        X_test = np.vstack([X_train[:50], rng.integers(1, 11, size=(50, 10)) / 9])
+
+        brute = Modelling(k=7, index="brute")
+        brute.train(X_train, y_train)
+        expected_dist, expected_idx = brute.get_model().kneighbors(X_test)
+
+        for index in ["kdtree", "balltree"]:
+            model = Modelling(k=7, index=index)
+            model.train(X_train, y_train)
+            dist, idx = model.get_model().kneighbors(X_test)
+            np.testing.assert_array_equal(idx, expected_idx)
+            np.testing.assert_array_equal(dist, expected_dist)
+
+    def test_invalid_index(self):
+        """Verifica che un indice non supportato generi un errore"""
+        with self.assertRaises(ValueError):
+            Modelling(k=3, index="octree")
+
+    def test_memory_bounded_prediction(self):
+        """Verifica che la ricerca a blocchi con memoria limitata dia gli stessi risultati di quella standard"""
+        rng = np.random.default_rng(2)
+        X_train = rng.integers(1, 5, size=(400, 6)) / 3
+        y_train = rng.choice([2, 4], size=400)
+        X_test = rng.integers(1, 5, size=(300, 6)) / 3
+
+        knn = Modelling(k=5)
+        knn.train(X_train, y_train)
+        bounded = Modelling(k=5, max_memory_mb=0.01, block_size=32)
+        bounded.train(X_train, y_train)
+
+        expected_pred, expected_prob = knn.predict(X_test)
+        pred, prob = bounded.predict(X_test)
+        np.testing.assert_array_equal(pred, expected_pred)
+        np.testing.assert_array_equal(prob, expected_prob)
+
+    def test_parallel_prediction(self):
+        """Verifica che la predizione multi-processo restituisca gli stessi risultati nell'ordine originale"""
+        rng = np.random.default_rng(3)
+        X_train = rng.integers(1, 5, size=(500, 6)) / 3
+        y_train = rng.choice([2, 4], size=500)
+        X_test = rng.integers(1, 5, size=(700, 6)) / 3
+
+        knn = Modelling(k=5)
+        parallel = Modelling(k=5, n_jobs=2)
+        pools = []
+        # Un nuovo fit (come tra i fold di una validazione) riusa lo stesso pool con il nuovo training set
+        for rows in [slice(None), slice(100, None)]:
+            knn.train(X_train[rows], y_train[rows])
+            parallel.train(X_train[rows], y_train[rows])
+
+            expected_pred, expected_prob = knn.predict(X_test)
+            pred, prob = parallel.predict(X_test)
+            np.testing.assert_array_equal(pred, expected_pred)
+            np.testing.assert_array_equal(prob, expected_prob)
+            pools.append(parallel.get_model()._pool)
+
+        self.assertIs(pools[0], pools[1])
+        parallel.close()
+        self.assertIsNone(parallel.get_model()._pool)
+
+    def test_compact_prediction_matches_float(self):
+        """Verifica che la ricerca sui codici interi dia gli stessi vicini della ricerca in float64"""
+        rng = np.random.default_rng(5)
+        # Feature intere da 1 a 10 normalizzate min-max (passo comune) e con passi diversi per colonna
+        for steps in [np.ones(6), np.array([1, 1, 2, 2, 5, 1])]:
+            X_train = (rng.integers(1, 11, size=(600, 6)) - 1) / 9 * steps
+            y_train = rng.choice([2, 4], size=600)
+            X_test = (rng.integers(1, 11, size=(200, 6)) - 1) / 9 * steps
+            X_test[:5] += 0.01  # Righe fuori dalla griglia: ricerca in float
+
+            knn = Modelling(k=7)
+            knn.train(X_train, y_train)
+            compact = Modelling(k=7, compact=True, max_memory_mb=0.01, block_size=32)
+            compact.train(X_train, y_train)
+            self.assertEqual(compact.get_model().X_train.dtype, np.uint8)
+
+            expected_dist, _ = knn.get_model().kneighbors(X_test)
+            dist, idx = compact.get_model().kneighbors(X_test)
+            np.testing.assert_allclose(dist, expected_dist, atol=1e-12)
+
+            # Sulla griglia le distanze sono esatte: i pareggi si risolvono sempre per indice
+            squared = (((X_test[5:, None, :] - X_train[None, :, :]) * 9) ** 2).sum(axis=2).round(6)
+            order = np.lexsort((np.broadcast_to(np.arange(len(X_train)), squared.shape), squared), axis=1)
+            np.testing.assert_array_equal(idx[5:], order[:, :7])
+
+        # Valori continui: il quantizzatore rifiuta i dati e il modello resta in float
+        self.assertIsNone(FeatureQuantizer.fit(rng.normal(size=(50, 3))))
+        with self.assertWarns(UserWarning):
+            Modelling(k=3, compact=True).train(rng.normal(size=(50, 3)), rng.choice([2, 4], size=50))
+        quantized = QuantizedMatrix.from_array(X_train)
+        np.testing.assert_allclose(np.asarray(quantized), X_train, atol=1e-12)
+        self.assertEqual(quantized[:10].shape, (10, 6))
+
+    def test_compact_predict_on_scaled_grid(self):
+        """Verifica che predict in modalità compatta cambi rispetto al float solo per i pareggi al k-esimo vicino"""
+        rng = np.random.default_rng(8)
+        k = 5
+        X = rng.integers(1, 11, size=(700, 9)).astype(float)
+        X = (X - X.min(axis=0)) / (X.max(axis=0) - X.min(axis=0))  # Normalizzazione min-max: passo comune 1/9
+        y = rng.choice([2, 4], size=700)
+        X_train, y_train, X_test = X[:200], y[:200], X[200:]
+
+        knn = Modelling(k=k)
+        knn.train(X_train, y_train)
+        compact = Modelling(k=k, compact=True)
+        compact.train(X_train, y_train)
+        self.assertEqual(compact.get_model().X_train.dtype, np.uint8)
+        pred, scores = knn.predict(X_test)
+        compact_pred, compact_scores = compact.predict(X_test)
+
+        # Distanze in aritmetica esatta sui livelli interi: senza pareggio tra il k-esimo vicino e il successivo
+        # l'insieme dei vicini è unico e la predizione deve coincidere
+        squared = np.sort((((X_test[:, None, :] - X_train[None, :, :]) * 9).round() ** 2).sum(axis=2), axis=1)
+        untied = squared[:, k - 1] < squared[:, k]
+        self.assertTrue(untied.any() and not untied.all())
+        np.testing.assert_array_equal(compact_pred[untied], pred[untied])
+        np.testing.assert_allclose(compact_scores[untied], scores[untied])
+        # Con un pareggio cambia al più la scelta tra vicini alla stessa distanza
+        np.testing.assert_allclose(compact.get_model().kneighbors(X_test)[0], knn.get_model().kneighbors(X_test)[0],
+                                   atol=1e-12)
+
+    def test_integer_kernel_bound(self):
+        """Verifica il kernel intero vicino al limite di 2**24 per le norme al quadrato in float32"""
+        rng = np.random.default_rng(7)
+        # 2 * d * 255² < 2**24 vale fino a d = 129: con i valori agli estremi i termini sono al limite
+        for d, integer_kernel in [(129, True), (130, False)]:
+            levels = np.array([0, 1, 254, 255])
+            X_train = levels[rng.integers(0, 4, size=(300, d))].astype(float)
+            X_train[0], X_train[1] = 0, 255
+            y_train = rng.choice([2, 4], size=300)
+            X_test = np.vstack([np.zeros(d), np.full(d, 255.0), levels[rng.integers(0, 4, size=(40, d))]])
+
+            compact = Modelling(k=5, compact=True)
+            compact.train(X_train, y_train)
+            self.assertEqual(compact.get_model().X_train.dtype, np.uint8)
+            self.assertEqual(compact.get_model()._quantizer.integer_kernel, integer_kernel)
+
+            # Riferimento esatto in aritmetica intera, pareggi risolti per indice
+            diff = X_test[:, None, :].astype(np.int64) - X_train[None, :, :].astype(np.int64)
+            squared = (diff * diff).sum(axis=2)
+            order = np.lexsort((np.broadcast_to(np.arange(len(X_train)), squared.shape), squared), axis=1)[:, :5]
+            dist, idx = compact.get_model().kneighbors(X_test)
+            np.testing.assert_array_equal(idx, order)
+            np.testing.assert_allclose(dist, np.sqrt(np.take_along_axis(squared, order, axis=1)), rtol=1e-12)
+
+    def test_float32_prediction(self):
+        """Verifica che il modello in float32 lavori in singola precisione e trovi gli stessi vicini senza pareggi"""
+        rng = np.random.default_rng(6)
+        X_train = rng.normal(size=(500, 5))
+        y_train = rng.choice([2, 4], size=500)
+        X_test = rng.normal(size=(100, 5))
+
+        knn = Modelling(k=5)
+        knn.train(X_train, y_train)
+        expected_dist, expected_idx = knn.get_model().kneighbors(X_test)
+
+        for index in ["brute", "kdtree", "balltree"]:
+            single = Modelling(k=5, index=index, dtype=np.float32, max_memory_mb=0.01)
+            single.train(X_train, y_train)
+            self.assertEqual(single.get_model().X_train.dtype, np.float32)
+
+            dist, idx = single.get_model().kneighbors(X_test)
+            self.assertEqual(dist.dtype, np.float32)
+            np.testing.assert_array_equal(idx, expected_idx)
+            np.testing.assert_allclose(dist, expected_dist, rtol=1e-5)
+            self.assertEqual(single.predict(X_test)[1].dtype, np.float32)
+
+        with self.assertRaises(ValueError):
+            Modelling(k=3, dtype=np.int32)
+
+    def test_model_artifact_round_trip(self):
+        """Verifica che il modello salvato e ricaricato in memory-map predica come l'originale"""
+        rng = np.random.default_rng(4)
+        data = pd.DataFrame(rng.normal(size=(300, 3)) * [1, 10, 100], columns=["a", "b", "c"])
+        y_train = rng.choice([2, 4], size=300)
+        new_data = pd.DataFrame(rng.normal(size=(50, 3)) * [1, 10, 100], columns=["a", "b", "c"])
+
+        for index, compact, dtype in [("brute", False, np.float64), ("kdtree", False, np.float64),
+                                      ("balltree", False, np.float32), ("brute", True, np.float64)]:
+            if compact:
+                data, new_data = data.round(), new_data.round()
+            normalizer = StandardNormalizer().fit(data)
+            knn = Modelling(k=5, index=index, compact=compact, dtype=dtype)
+            knn.train(normalizer.transform(data).to_numpy(), y_train)
+            expected_pred, expected_prob = knn.predict(normalizer.transform(new_data).to_numpy())
+
+            with tempfile.TemporaryDirectory() as tmp:
+                path = os.path.join(tmp, "model")
+                ModelArtifact(knn, data.columns, normalizer).save(path)
+                artifact = ModelArtifact.load(path)
+
+                self.assertIsInstance(artifact.model.get_model().X_train, np.memmap)
+                # Le colonne dei nuovi dati vengono riordinate secondo l'ordine salvato
+                pred, prob = artifact.predict(new_data[["c", "a", "b"]])
+                np.testing.assert_array_equal(pred, expected_pred)
+                np.testing.assert_array_equal(prob, expected_prob)
+                del artifact
@@ -0,0 +1,98 @@
+import json
+import os
+import tempfile
+import unittest
+from unittest.mock import patch
+import numpy as np
+import pandas as pd
+from data_cleaning import SelectionFile, ImportCache
+from pipeline import PipelineRunner
+from utils import select_metrics
+
+class TestPipelineRunner(unittest.TestCase):
+    # Test per l'esecuzione non interattiva della pipeline
+
+    def setUp(self):
+        # Dataset sintetico con la stessa struttura del dataset originale
+        rng = np.random.default_rng(0)
+        n = 60
+        y = np.repeat([2, 4], n // 2)
+        self.data = pd.DataFrame({
+            "Sample code number": np.arange(n),
+            "A": rng.normal(size=n) + (y == 4) * 3,
+            "B": rng.normal(size=n),
+            "classtype_v1": y,
+        })
+        self.data.loc[[3, 40], "A"] = np.nan
+
+        self.tmp = tempfile.TemporaryDirectory()
+        self.file_path = os.path.join(self.tmp.name, "dataset.csv")
+        self.data.to_csv(self.file_path, index=False)
+
+        # Cache di import isolata nella cartella temporanea
+        self.default_cache = SelectionFile.cache
+        SelectionFile.cache = ImportCache(os.path.join(self.tmp.name, "import_cache"))
+
+    def tearDown(self):
+        SelectionFile.cache = self.default_cache
+        self.tmp.cleanup()
+
+    def test_runs_share_cleaned_dataset(self):
+        # Verifica che più esecuzioni importino il dataset una volta sola e producano i risultati richiesti
+        config = {
+            "file": self.file_path,
+            "plot_mode": "off",
+            "output_dir": self.tmp.name,
+            "metrics": ["Accuracy", "Auc"],
+            "runs": [{"k": 3}, {"k": 5, "normalization": "standardizzazione"},
+                     {"name": "loo", "validation": "leave_one_out"}],
+        }
+        config_path = os.path.join(self.tmp.name, "config.json")
+        with open(config_path, "w") as config_file:
+            json.dump(config, config_file)
+
+        configs = PipelineRunner.load_config(config_path)
+        self.assertEqual([c["name"] for c in configs], ["run_1", "run_2", "loo"])
+
+        with patch("builtins.input", side_effect=AssertionError("input() non deve essere chiamato")), \
+                patch.object(SelectionFile, "import_data", wraps=SelectionFile.import_data) as import_data:
+            results = PipelineRunner().run_all(configs)
+
+        self.assertEqual(import_data.call_count, 1)
+        self.assertEqual(len(results), 3)
+        for _, results_df in results:
+            self.assertTrue({"Accuracy", "Auc"}.issubset(results_df.columns))
+        self.assertTrue(os.path.exists(os.path.join(self.tmp.name, "validation_results.csv")))
+        self.assertTrue(os.path.exists(os.path.join(self.tmp.name, "loo_results.csv")))
+
+    def test_invalid_config(self):
+        # Verifica che le configurazioni non valide vengano rifiutate prima dell'esecuzione
+        with self.assertRaises(ValueError):
+            PipelineRunner.expand_config({"file": self.file_path, "cleaning": "interpolazione"})
+        with self.assertRaises(ValueError):
+            PipelineRunner.expand_config({"file": self.file_path, "k": 0})
+        with self.assertRaises(ValueError):
+            PipelineRunner.expand_config({"file": self.file_path, "numero_vicini": 3})
+        with self.assertRaises(ValueError):
+            PipelineRunner.expand_config({"k": 3})
+        with self.assertRaises(ValueError):
+            PipelineRunner.expand_config({"file": self.file_path, "n_jobs": 2, "model_jobs": -1})
+
+    def test_cleaning_error_stops_run(self):
+        # Un errore della pulizia interrompe l'esecuzione invece di addestrare il modello sui dati grezzi
+        config = PipelineRunner.expand_config({"file": self.file_path, "plot_mode": "off",
+                                               "output_dir": self.tmp.name, "metrics": ["Accuracy"]})[0]
+        with patch("data_cleaning.data_cleaner.GestioneValMancanti.get_mode",
+                   side_effect=ValueError("pulizia non riuscita")):
+            with self.assertRaisesRegex(ValueError, "pulizia non riuscita"):
+                PipelineRunner().run(config)
+
+    def test_select_metrics_from_choices(self):
+        # Verifica la selezione non interattiva delle metriche, per numero o per nome
+        self.assertEqual(select_metrics("1, auc"), ["Accuracy", "Auc"])
+        self.assertEqual(len(select_metrics(["7"])), 6)
+        with self.assertRaises(ValueError):
+            select_metrics(["8"])
+
+if __name__ == '__main__':
+    unittest.main()
@@ -1,8 +1,11 @@
+import os
+import tempfile
 import unittest
 import pandas as pd
 import numpy as np
 from unittest.mock import patch
-from data_cleaning.data_cleaner import DataCleaner, GestioneValMancanti, RimuoviDuplicati
+from data_cleaning.data_cleaner import DataCleaner, GestioneValMancanti, RimuoviDuplicati, ValoriMancanti
+from data_cleaning.data_cleaner import StreamingCleaner, QuantileSketch, ModeSketch, StreamingDeduplicator
 
 class TestDataCleaner(unittest.TestCase):
     def setUp(self):
@@ -46,6 +49,32 @@ class TestDataCleaner(unittest.TestCase):
         expected_median_A = np.median(cleaned_data['A'].values)
         self.assertEqual(expected_median_A, np.median(cleaned_data['A'].values))
 
+    def test_sostituzione_con_knn(self):
+        cleaned_data = GestioneValMancanti.get_mode('knn', self.data, n_neighbors=2)
+        self.assertFalse(cleaned_data.isnull().values.any())
+
+        # Confronto con una ricerca dei vicini riga per riga sulle sole feature osservate
+        rng = np.random.default_rng(3)
+        values = rng.integers(1, 11, size=(300, 4)).astype(float)
+        values[rng.random(values.shape) < 0.1] = np.nan
+        values[0] = np.nan  # Nessuna feature osservata: media delle righe complete
+        data = pd.DataFrame(values, columns=['A', 'B', 'C', 'D'])
+        data['classtype_v1'] = rng.choice([2.0, 4.0], size=len(data))
+        filled = ValoriMancanti.sostituisci_con_knn(data, k=3)
+
+        missing = np.isnan(values)
+        donors = values[~missing.any(axis=1)]
+        mean, std = donors.mean(axis=0), donors.std(axis=0, ddof=1)
+        scaled, scaled_donors = (values - mean) / std, (donors - mean) / std
+        expected = values.copy()
+        for i in np.flatnonzero(missing.any(axis=1)):
+            observed = ~missing[i]
+            distances = np.sqrt(((scaled_donors[:, observed] - scaled[i, observed]) ** 2).sum(axis=1))
+            neighbors = np.lexsort((np.arange(len(donors)), distances))[:3]
+            expected[i, missing[i]] = donors[neighbors][:, missing[i]].mean(axis=0) if observed.any() else mean[missing[i]]
+        np.testing.assert_allclose(filled[['A', 'B', 'C', 'D']].to_numpy(), expected)
+        pd.testing.assert_series_equal(filled['classtype_v1'], data['classtype_v1'])
+
     def test_rimozione_duplicati(self):
         duplicated_data = pd.concat([self.data, self.data])  # Duplico i dati
         cleaned_data = RimuoviDuplicati.dup_remove(duplicated_data)
@@ -60,5 +89,106 @@ class TestDataCleaner(unittest.TestCase):
         with self.assertRaises(ValueError):
             GestioneValMancanti.get_mode('invalid_mode', self.data)
 
+class TestStreamingCleaner(unittest.TestCase):
+    # Test per la pulizia a blocchi e per le statistiche combinabili
+
+    def setUp(self):
+        rng = np.random.default_rng(0)
+        n = 200
+        self.data = pd.DataFrame({
+            'A': rng.integers(1, 11, size=n).astype(object),
+            'B': rng.integers(1, 11, size=n).astype(float),
+            'classtype_v1': rng.choice([2.0, 4.0], size=n),
+            'Sample code number': np.arange(n),
+        })
+        self.data.loc[rng.choice(n, 20, replace=False), 'A'] = '?'  # Valori non numerici come nel dataset originale
+        self.data.loc[rng.choice(n, 20, replace=False), 'B'] = np.nan
+        self.data.loc[[5, 77], 'classtype_v1'] = np.nan
+        self.data.loc[150:160, ['A', 'B', 'classtype_v1']] = self.data.loc[10:20, ['A', 'B', 'classtype_v1']].to_numpy()
+
+        self.tmp = tempfile.TemporaryDirectory()
+        self.file_path = os.path.join(self.tmp.name, 'dataset.csv')
+        self.data.to_csv(self.file_path, index=False)
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def test_streaming_matches_in_memory(self):
+        # Con blocchi più piccoli del file il risultato coincide con la pulizia in memoria
+        for mode in ['rimozione', 'media', 'moda', 'mediana']:
+            expected = GestioneValMancanti.get_mode(mode, pd.read_csv(self.file_path))
+            cleaned = StreamingCleaner(chunksize=30).clean(self.file_path, mode)
+            pd.testing.assert_frame_equal(cleaned, expected, check_dtype=False, rtol=1e-6)
+            self.assertTrue((cleaned.dtypes == np.float32).all())
+
+        output_path = os.path.join(self.tmp.name, 'cleaned.csv')
+        rows = StreamingCleaner(chunksize=30).clean_to_file(self.file_path, 'media', output_path)
+        self.assertEqual(rows, len(pd.read_csv(output_path)))
+        with self.assertRaises(ValueError):
+            StreamingCleaner().clean(self.file_path, 'invalid_mode')
+
+    def test_streaming_dedup(self):
+        # Duplicati rimossi tra blocchi e tra file, anche con impronte che collidono se verify=True
+        rng = np.random.default_rng(2)
+        block = rng.integers(0, 3, size=(600, 3)).astype(float)
+        block[rng.random(block.shape) < 0.1] = np.nan
+        expected = ~pd.DataFrame(block).duplicated().to_numpy()
+        for verify in [False, True]:
+            deduplicator = StreamingDeduplicator(verify)
+            keep = np.concatenate([deduplicator.keep_mask(part) for part in np.array_split(block, 7)])
+            np.testing.assert_array_equal(keep, expected)
+
+        fingerprints = StreamingDeduplicator.fingerprints
+        with patch.object(StreamingDeduplicator, 'fingerprints',
+                          staticmethod(lambda rows: fingerprints(rows) & np.uint64(3))):
+            deduplicator = StreamingDeduplicator(verify=True)
+            keep = np.concatenate([deduplicator.keep_mask(part) for part in np.array_split(block, 7)])
+        np.testing.assert_array_equal(keep, expected)
+
+        # Più file: le righe del secondo file già presenti nel primo vengono scartate
+        second_path = os.path.join(self.tmp.name, 'dataset_2.csv')
+        self.data.iloc[::-1].to_csv(second_path, index=False)
+        output_path = os.path.join(self.tmp.name, 'merged.csv')
+        for include_id in [False, True]:
+            expected = GestioneValMancanti.get_mode('rimozione', self.data, include_id)
+            cleaned = StreamingCleaner(chunksize=30, include_id=include_id).clean([self.file_path, second_path],
+                                                                                 'rimozione')
+            pd.testing.assert_frame_equal(cleaned.reset_index(drop=True), expected.reset_index(drop=True),
+                                          check_dtype=False)
+
+            rows = RimuoviDuplicati.dup_remove_files([self.file_path, second_path], output_path,
+                                                     include_id=include_id, chunksize=30)
+            numeric = pd.read_csv(self.file_path).apply(pd.to_numeric, errors='coerce')
+            if not include_id:
+                numeric = numeric.drop(columns=['Sample code number'])
+            self.assertEqual(rows, len(RimuoviDuplicati.dup_remove(numeric)))
+
+        # Con il codice del campione nella chiave le righe uguali di pazienti diversi restano
+        self.assertGreater(len(GestioneValMancanti.get_mode('media', self.data, include_id=True)),
+                           len(GestioneValMancanti.get_mode('media', self.data)))
+
+    def test_sketches(self):
+        # Mediana e moda esatte con pochi valori distinti, approssimate (e combinabili) oltre la capacità
+        values = np.array([3.0, 1.0, np.nan, 3.0, 2.0, 1.0, 3.0, 4.0])
+        self.assertEqual(QuantileSketch().update(values).median(), pd.Series(values).median())
+        self.assertEqual(ModeSketch().update(values).mode(), pd.Series(values).mode().iloc[0])
+
+        rng = np.random.default_rng(1)
+        values = rng.normal(size=50000)
+        left = QuantileSketch(capacity=256, max_distinct=500).update(values[:20000])
+        right = QuantileSketch(capacity=256, max_distinct=500).update(values[20000:])
+        merged = left.merge(right)
+        self.assertFalse(merged.exact)
+        self.assertLess(abs((values < merged.median()).mean() - 0.5), 0.02)
+
+        # Un valore molto frequente resta la moda anche dopo la riduzione dei contatori
+        values = np.concatenate([np.full(2000, 7.0), rng.normal(size=20000)])
+        rng.shuffle(values)
+        sketch = ModeSketch(capacity=50)
+        for block in np.array_split(values, 10):
+            sketch = sketch.merge(ModeSketch(capacity=50).update(block))
+        self.assertFalse(sketch.exact)
+        self.assertEqual(sketch.mode(), 7.0)
+
 if __name__ == '__main__':
     unittest.main(argv=['first-arg-is-ignored'], exit=False)
\ No newline at end of file
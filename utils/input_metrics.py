@@ -1,4 +1,18 @@
-def select_metrics():
+METRIC_OPTIONS = {
+    "1": "Accuracy",
+    "2": "Error_rate",
+    "3": "Sensitivity",
+    "4": "Specificity",
+    "5": "Geometric_mean",
+    "6": "Auc"
+}
+
+def select_metrics(choices=None):
+    # Se choices viene passato (es. da configurazione), le metriche vengono selezionate senza chiedere nulla:
+    # sono accettati sia i numeri del menu sia i nomi delle metriche; le scelte non valide sollevano ValueError.
+    if choices is not None:
+        return _metrics_from_choices(choices)
+
     print("\nSeleziona le metriche da valutare (inserisci i numeri separati da virgola):")
     print("1 - Accuracy Rate")
     print("2 - Error Rate")
@@ -8,14 +22,7 @@ def select_metrics():
     print("6 - Area Under the Curve")
     print("7 - Tutte le metriche")
 
-    metric_options = {
-        "1": "Accuracy",
-        "2": "Error_rate",
-        "3": "Sensitivity",
-        "4": "Specificity",
-        "5": "Geometric_mean",
-        "6": "Auc"
-    }
+    metric_options = METRIC_OPTIONS
 
     while True:  # Continua a chiedere finché l'input non è valido
         choices = input("Scelta: ").split(",")
@@ -43,3 +50,21 @@ def select_metrics():
             print("Riprova inserendo una selezione valida.")
         else:
             return selected_metrics  # Restituisce solo metriche valide
+
+def _metrics_from_choices(choices):
+    # Converte una lista di scelte (numeri del menu o nomi delle metriche) nelle metriche corrispondenti.
+    if isinstance(choices, str):
+        choices = choices.split(",")
+
+    names = {name.lower(): name for name in METRIC_OPTIONS.values()}
+    selected_metrics = []
+    for choice in choices:
+        choice = str(choice).strip()
+        if choice == "7" or choice.lower() in ("all", "tutte"):
+            return list(METRIC_OPTIONS.values())
+        metric = METRIC_OPTIONS.get(choice, names.get(choice.lower()))
+        if metric is None:
+            raise ValueError(f"Metrica non valida: '{choice}'. Usa i numeri da 1 a 7 o i nomi {list(names.values())}.")
+        if metric not in selected_metrics:
+            selected_metrics.append(metric)
+    return selected_metrics
@@ -1,11 +1,19 @@
-def get_valid_int(prompt, min_value=1):
+def get_valid_int(prompt, min_value=1, value=None):
     """
     Chiede all'utente un numero intero valido maggiore o uguale a min_value.
 
     :param prompt: Messaggio da visualizzare all'utente.
     :param min_value: Valore minimo accettabile (default=1).
+    :param value: Valore già noto (es. da configurazione): viene validato senza chiedere nulla
+                  e, se non valido, solleva ValueError.
     :return: Numero intero valido inserito dall'utente.
     """
+    if value is not None:
+        value = int(value)
+        if value < min_value:
+            raise ValueError(f"Il valore deve essere almeno {min_value}.")
+        return value
+
     while True:
         try:
             value = int(input(prompt))